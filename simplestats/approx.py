@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+#
+#  approx.py
+#  simplestats
+#
+
+"""
+Approximate frequency distributions for streams whose number of distinct
+samples is too large to count exactly.
+"""
+
+import sys
+import struct
+import heapq
+
+from array import array
+from hashlib import md5
+from math import ceil, e, log
+from operator import itemgetter
+
+from freq import FreqDist, sopen
+
+_count_type = 'l'
+_sketch_magic = 'CMS1'
+_sketch_header = struct.Struct('<4sBIIIQ')
+
+
+def _key_bytes(sample):
+    """
+    Returns the bytes a sample is hashed by: byte strings as they are, and
+    anything else as UTF-8 text, so u'caf\xe9' and 'caf\xc3\xa9' agree.
+    """
+    if isinstance(sample, str):
+        return sample
+    return unicode(sample).encode('utf8')
+
+
+class CountMinFreqDist(object):
+    """
+    An approximate frequency distribution backed by a Count-Min sketch,
+    using conservative update. Counts are never under-estimated, and the
+    memory used depends only on the width and depth of the sketch, not on
+    the number of distinct samples seen.
+
+        >>> x = CountMinFreqDist(width=64, depth=4)
+        >>> x.inc('a', 3)
+        >>> x.inc('b')
+        >>> x.count('a')
+        3
+        >>> x.prob('b')
+        0.25
+        >>> x.prob('unknown')
+        0.0
+    """
+    def __init__(self, width=2048, depth=4, seed=0):
+        if width < 1 or depth < 1:
+            raise ValueError("width and depth must both be positive")
+
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self._seed_prefix = struct.pack('<I', seed)
+        self._table = array(_count_type, [0]) * (width * depth)
+        self._total = 0
+
+    @staticmethod
+    def from_error(epsilon, delta, seed=0):
+        """
+        An alternative constructor which sizes the sketch so that counts
+        over-estimate by at most epsilon * total with probability at least
+        1 - delta.
+        """
+        width = int(ceil(e / epsilon))
+        depth = int(ceil(log(1.0 / delta)))
+        return CountMinFreqDist(width, depth, seed)
+
+    def total():
+        doc = "The total count."  # noqa
+
+        def fget(self):
+            return self._total
+        return locals()
+    total = property(**total())
+
+    def error_bound(self):
+        """
+        Returns the amount by which any count may be over-estimated, which
+        holds with probability 1 - exp(-depth).
+        """
+        return e * self._total / float(self.width)
+
+    #------------------------------------------------------------------------#
+
+    def _cells(self, sample):
+        "Returns the table index of the sample's cell in each row."
+        data = self._seed_prefix + _key_bytes(sample)
+        h1, h2 = struct.unpack('<QQ', md5(data).digest())
+        h2 |= 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width
+                for row in xrange(self.depth)]
+
+    def inc(self, sample, n=1):
+        if n < 0:
+            raise ValueError("can't decrement an approximate count")
+
+        table = self._table
+        cells = self._cells(sample)
+
+        # Conservative update: only raise the cells which would otherwise
+        # fall below the new estimate.
+        target = min([table[i] for i in cells]) + n
+        for i in cells:
+            if table[i] < target:
+                table[i] = target
+
+        self._total += n
+
+    def count(self, sample):
+        """Return the (over-)estimated frequency count of the sample."""
+        table = self._table
+        return min([table[i] for i in self._cells(sample)])
+
+    __getitem__ = count
+
+    def prob(self, sample):
+        """Returns the estimated MLE probability of this sample."""
+        c = self.count(sample)
+        if c > 0:
+            return c / float(self._total)
+        else:
+            return 0.0
+
+    def log_prob(self, sample):
+        """Returns the estimated log MLE probability of this sample."""
+        return log(self.count(sample) / float(self._total))
+
+    #------------------------------------------------------------------------#
+
+    def merge(self, rhs_dist):
+        """
+        Adds the counts from another sketch of the same shape and seed.
+        """
+        if (rhs_dist.width, rhs_dist.depth, rhs_dist.seed) != \
+                (self.width, self.depth, self.seed):
+            raise ValueError("can only merge sketches of the same shape")
+
+        table = self._table
+        for i, count in enumerate(rhs_dist._table):
+            if count:
+                table[i] += count
+        self._total += rhs_dist._total
+
+    #------------------------------------------------------------------------#
+
+    def dumps(self):
+        "Returns a compact binary serialization of this sketch."
+        table = self._table
+        if sys.byteorder == 'big':
+            table = array(_count_type, table)
+            table.byteswap()
+
+        header = _sketch_header.pack(_sketch_magic, table.itemsize,
+                                     self.width, self.depth, self.seed,
+                                     self._total)
+        return header + table.tostring()
+
+    @staticmethod
+    def loads(data):
+        "Rebuilds a sketch from the output of dumps()."
+        magic, itemsize, width, depth, seed, total = \
+            _sketch_header.unpack_from(data)
+        if magic != _sketch_magic:
+            raise ValueError("not a serialized count-min sketch")
+
+        dist = CountMinFreqDist(width, depth, seed)
+        if itemsize != dist._table.itemsize:
+            raise ValueError("sketch was serialized with %d-byte counts"
+                             % itemsize)
+
+        table = array(_count_type)
+        table.fromstring(data[_sketch_header.size:])
+        if sys.byteorder == 'big':
+            table.byteswap()
+        if len(table) != width * depth:
+            raise ValueError("truncated count-min sketch")
+
+        dist._table = table
+        dist._total = total
+        return dist
+
+    def dump(self, filename):
+        """
+        Dump the sketch to the given filename in its binary format.
+        """
+        o_stream = sopen(filename, 'wb', encoding=None)
+        o_stream.write(self.dumps())
+        o_stream.close()
+        return
+
+    def load(self, filename):
+        """
+        Loads a dumped sketch from the given filename, adding its counts to
+        this one. Can be done for more than one file.
+        """
+        i_stream = sopen(filename, 'rb', encoding=None)
+        data = i_stream.read()
+        i_stream.close()
+
+        self.merge(CountMinFreqDist.loads(data))
+        return
+
+    @staticmethod
+    def from_file(filename):
+        """
+        An alternative constructor which rebuilds a sketch from a file.
+        """
+        i_stream = sopen(filename, 'rb', encoding=None)
+        data = i_stream.read()
+        i_stream.close()
+
+        return CountMinFreqDist.loads(data)
+
+
+#----------------------------------------------------------------------------#
+
+class SpaceSavingFreqDist(FreqDist):
+    """
+    A frequency distribution which only tracks the most frequent samples,
+    using the Space-Saving algorithm. At most capacity samples are kept;
+    when a new sample arrives and the distribution is full, it replaces the
+    sample with the smallest count and inherits that count as its error.
+    Any monitored count over-estimates the true count by at most
+    error(sample), which is never more than total / capacity.
+
+        >>> x = SpaceSavingFreqDist(capacity=2)
+        >>> x.inc('a', 3)
+        >>> x.inc('b')
+        >>> x.inc('c')
+        >>> sorted(x.items())
+        [('a', 3), ('c', 2)]
+        >>> x.error('c')
+        1
+        >>> x.prob('a')
+        0.6
+    """
+    def __init__(self, capacity=1000):
+        FreqDist.__init__(self)
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self._errors = {}
+
+        # A stream summary: the set of samples with each count, and a heap
+        # of those counts which may contain stale entries.
+        self._buckets = {}
+        self._bucket_heap = []
+
+    def _move(self, sample, old_count, new_count):
+        "Moves a sample between count buckets."
+        buckets = self._buckets
+        if old_count is not None:
+            bucket = buckets[old_count]
+            bucket.discard(sample)
+            if not bucket:
+                del buckets[old_count]
+
+        if new_count is not None:
+            bucket = buckets.get(new_count)
+            if bucket is None:
+                bucket = buckets[new_count] = set()
+                heap = self._bucket_heap
+                if len(heap) > 2 * len(buckets) + 16:
+                    # Too many stale entries, rebuild the heap.
+                    heap[:] = buckets.keys()
+                    heapq.heapify(heap)
+                else:
+                    heapq.heappush(heap, new_count)
+            bucket.add(sample)
+
+    def _min_count(self):
+        "Returns the smallest monitored count."
+        heap = self._bucket_heap
+        buckets = self._buckets
+        while heap[0] not in buckets:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def _floor(self):
+        """
+        Returns the largest count an unmonitored sample could have had.
+        """
+        if len(self) < self.capacity:
+            return 0
+        return self._min_count()
+
+    #------------------------------------------------------------------------#
+
+    def inc(self, sample, n=1):
+        if n < 1:
+            raise ValueError("can only increment by a positive amount")
+
+        count = self.get(sample)
+        if count is not None:
+            self[sample] = count + n
+            self._move(sample, count, count + n)
+
+        else:
+            error = 0
+            if len(self) >= self.capacity:
+                # Full, so evict a sample with the smallest count.
+                error = self._min_count()
+                victim = iter(self._buckets[error]).next()
+                self._move(victim, error, None)
+                del self[victim]
+                del self._errors[victim]
+
+            self[sample] = error + n
+            self._errors[sample] = error
+            self._move(sample, None, error + n)
+
+        self._total += n
+        self._version += 1
+
+    def decrement(self, sample, n=1):
+        raise ValueError("Space-Saving counts don't support removal")
+
+    def remove_sample(self, sample):
+        raise ValueError("Space-Saving counts don't support removal")
+
+    #------------------------------------------------------------------------#
+
+    def error(self, sample):
+        """
+        Returns the maximum amount by which the sample's count may be
+        over-estimated. For unmonitored samples, this is the largest count
+        they could have.
+        """
+        return self._errors.get(sample, self._floor())
+
+    def guaranteed_count(self, sample):
+        "Returns a lower bound on the true count of the sample."
+        return self.get(sample, 0) - self._errors.get(sample, 0)
+
+    def error_bound(self):
+        "Returns the maximum over-estimate of any count."
+        return self._floor()
+
+    def heavy_hitters(self, phi):
+        """
+        Returns a list of (sample, count) pairs for every sample which may
+        make up more than phi of the total count, most frequent first. Every
+        sample which truly does so is guaranteed to be included.
+        """
+        threshold = phi * self._total
+        return sorted(
+            ((k, v) for (k, v) in self.iteritems() if v > threshold),
+            key=itemgetter(1),
+            reverse=True,
+        )
+
+    #------------------------------------------------------------------------#
+
+    def merge(self, rhs_dist):
+        """
+        Merges another distribution into this one, keeping the error
+        guarantees. The other distribution may be an exact FreqDist or
+        another SpaceSavingFreqDist, for example from another shard.
+        """
+        lhs_floor = self._floor()
+        if isinstance(rhs_dist, SpaceSavingFreqDist):
+            rhs_floor = rhs_dist._floor()
+            rhs_errors = rhs_dist._errors
+        else:
+            rhs_floor = 0
+            rhs_errors = {}
+
+        lhs_errors = self._errors
+        counts = {}
+        errors = {}
+        for sample in set(self).union(rhs_dist):
+            counts[sample] = self.get(sample, lhs_floor) + \
+                rhs_dist.get(sample, rhs_floor)
+            errors[sample] = lhs_errors.get(sample, lhs_floor) + \
+                rhs_errors.get(sample, rhs_floor)
+
+        total = self._total + rhs_dist.total
+        self.clear()
+        self._errors = {}
+        self._buckets = {}
+        self._bucket_heap = []
+
+        for sample, count in heapq.nlargest(self.capacity,
+                                            counts.iteritems(),
+                                            key=itemgetter(1)):
+            self[sample] = count
+            self._errors[sample] = errors[sample]
+            self._move(sample, None, count)
+
+        self._total = total
+        self._version += 1
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+#  assoc.py
+#  simplestats
+#
+
+"""
+Association measures between conditions and samples, for finding
+collocations in a ConditionalFreqDist.
+
+Each (condition, sample) cell is scored from its 2x2 contingency table:
+the cell count, the condition's total, the sample's total and the grand
+total. The marginals are computed once, then every cell is scored in a
+single pass over the counts.
+"""
+
+import heapq
+
+from math import log, sqrt
+from operator import itemgetter
+
+
+def pmi(o11, r1, c1, n):
+    "Pointwise mutual information, in nats."
+    return log(o11 * float(n) / (r1 * c1))
+
+
+def _g_term(observed, expected):
+    if observed <= 0:
+        return 0.0
+    return observed * log(observed / expected)
+
+
+def log_likelihood(o11, r1, c1, n):
+    "Dunning's log-likelihood ratio, G squared."
+    n = float(n)
+    r2 = n - r1
+    c2 = n - c1
+    o12 = r1 - o11
+    o21 = c1 - o11
+    o22 = r2 - o21
+    return 2.0 * (
+        _g_term(o11, r1 * c1 / n) + _g_term(o12, r1 * c2 / n) +
+        _g_term(o21, r2 * c1 / n) + _g_term(o22, r2 * c2 / n)
+    )
+
+
+def chi_square(o11, r1, c1, n):
+    "Pearson's chi-square statistic for the 2x2 table."
+    r2 = n - r1
+    c2 = n - c1
+    denominator = float(r1) * r2 * c1 * c2
+    if not denominator:
+        return 0.0
+    o12 = r1 - o11
+    o21 = c1 - o11
+    o22 = r2 - o21
+    return n * float(o11 * o22 - o12 * o21) ** 2 / denominator
+
+
+def t_score(o11, r1, c1, n):
+    "The t-score of the observed count against its expectation."
+    return (o11 - r1 * c1 / float(n)) / sqrt(o11)
+
+
+measures = {
+    'pmi': pmi,
+    'log_likelihood': log_likelihood,
+    'chi_square': chi_square,
+    't_score': t_score,
+}
+
+#----------------------------------------------------------------------------#
+
+
+def _iter_tables(cfd, min_count):
+    """
+    Iterates over (condition, sample, o11, r1, c1, n) for every cell with
+    at least min_count counts.
+    """
+    condition_totals = cfd.to_condition_dist()
+    sample_totals = cfd.to_sample_dist()
+    n = condition_totals.total
+
+    for condition, condition_dist in cfd.iteritems():
+        r1 = condition_totals[condition]
+        for sample, o11 in condition_dist.iteritems():
+            if o11 >= min_count and o11 > 0:
+                yield condition, sample, o11, r1, sample_totals[sample], n
+
+
+def _get_measure(measure):
+    if callable(measure):
+        return measure
+    try:
+        return measures[measure]
+    except KeyError:
+        raise ValueError("unknown association measure: %r" % (measure,))
+
+
+def iter_scores(cfd, measure='pmi', min_count=1):
+    """
+    Iterates over ((condition, sample), score) pairs for every cell with at
+    least min_count counts. The measure may be any of the names in
+    measures, or a function of (o11, r1, c1, n).
+    """
+    score = _get_measure(measure)
+    for condition, sample, o11, r1, c1, n in _iter_tables(cfd, min_count):
+        yield (condition, sample), score(o11, r1, c1, n)
+
+
+def scores(cfd, measure='pmi', min_count=1):
+    """
+    Returns a dictionary mapping each (condition, sample) cell to its
+    score.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('new', 'york', 3)
+        >>> x.inc('new', 'car')
+        >>> x.inc('old', 'car', 4)
+        >>> round(scores(x)[('new', 'york')], 4)
+        0.6931
+    """
+    return dict(iter_scores(cfd, measure, min_count))
+
+
+def all_scores(cfd, min_count=1):
+    """
+    Returns a dictionary mapping each cell to a dictionary of its score
+    under every measure, from a single pass over the counts.
+    """
+    result = {}
+    named = measures.items()
+    for condition, sample, o11, r1, c1, n in _iter_tables(cfd, min_count):
+        result[condition, sample] = dict(
+            (name, f(o11, r1, c1, n)) for (name, f) in named
+        )
+    return result
+
+
+def top_k(cfd, k, measure='pmi', min_count=1):
+    """
+    Returns the k highest scoring ((condition, sample), score) pairs, best
+    first, without sorting every cell.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('new', 'york', 3)
+        >>> x.inc('new', 'car')
+        >>> x.inc('old', 'car', 4)
+        >>> [cell for (cell, score) in top_k(x, 2)]
+        [('new', 'york'), ('old', 'car')]
+    """
+    return heapq.nlargest(k, iter_scores(cfd, measure, min_count),
+                          key=itemgetter(1))
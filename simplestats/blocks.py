@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+#
+#  blocks.py
+#  simplestats
+#
+
+"""
+A block-compressed file format which supports seeking and parallel
+decompression.
+
+Files are a sequence of independent gzip members, so any gzip reader can
+still decompress them serially. Each member carries an extra header field
+giving its compressed and uncompressed sizes, which lets a reader build a
+block index by skipping from header to header. Blocks are cut at line
+boundaries, so every block decompresses to whole lines.
+
+Though similar in spirit, this is not BGZF as written by bgzip: the size
+field is our own 'SB' subfield rather than BGZF's 'BC', and BGZF files
+are not recognised by is_block_file().
+"""
+
+import zlib
+import struct
+import multiprocessing
+
+from bisect import bisect_right
+from multiprocessing.dummy import Pool
+
+_default_block_size = 1 << 20
+
+# gzip header: magic, deflate, FEXTRA flag, mtime, xfl, unknown OS, xlen;
+# then our extra subfield 'SB' holding the member and uncompressed sizes.
+_header = struct.Struct('<BBBBIBBH2sHII')
+_trailer = struct.Struct('<II')
+_extra_id = 'SB'
+_extra_len = 8
+
+
+def _compress_block(data, level=6):
+    "Compresses data into a single gzip member with our size field."
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    member_size = _header.size + len(body) + _trailer.size
+    header = _header.pack(0x1f, 0x8b, 8, 4, 0, 0, 255,
+                          4 + _extra_len, _extra_id, _extra_len,
+                          member_size, len(data))
+    trailer = _trailer.pack(zlib.crc32(data) & 0xffffffff,
+                            len(data) & 0xffffffff)
+    return header + body + trailer
+
+
+def _inflate(member):
+    "Decompresses a single gzip member written by _compress_block()."
+    data = zlib.decompress(member[_header.size:-_trailer.size],
+                           -zlib.MAX_WBITS)
+    crc, size = _trailer.unpack(member[-_trailer.size:])
+    if crc != zlib.crc32(data) & 0xffffffff:
+        raise IOError("CRC check failed on compressed block")
+    return data
+
+
+def is_block_file(filename):
+    "Returns True if the file starts with a block-compressed member."
+    i_stream = open(filename, 'rb')
+    header = i_stream.read(_header.size)
+    i_stream.close()
+
+    if len(header) < _header.size:
+        return False
+
+    fields = _header.unpack(header)
+    return fields[:4] == (0x1f, 0x8b, 8, 4) and fields[8] == _extra_id
+
+
+class BlockWriter(object):
+    """
+    A write-only file object which compresses its output in independent
+    blocks of roughly block_size bytes, cut at line boundaries.
+    """
+    def __init__(self, filename, mode='wb', block_size=_default_block_size,
+                 level=6):
+        if 'a' in mode:
+            mode = 'ab'
+        else:
+            mode = 'wb'
+
+        self._stream = open(filename, mode)
+        self.block_size = block_size
+        self.level = level
+        self._buffer = []
+        self._buffered = 0
+        self.closed = False
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode('ascii')
+
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.block_size:
+            self._flush_blocks()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def _flush_blocks(self, final=False):
+        data = ''.join(self._buffer)
+        start = 0
+        while len(data) - start >= self.block_size:
+            end = data.rfind('\n', start, start + self.block_size) + 1
+            if end <= start:
+                # A single very long line, so keep it whole.
+                end = data.find('\n', start + self.block_size) + 1
+                if end <= start:
+                    break
+            self._stream.write(_compress_block(data[start:end], self.level))
+            start = end
+
+        data = data[start:]
+        if final and data:
+            self._stream.write(_compress_block(data, self.level))
+            data = ''
+
+        self._buffer = [data]
+        self._buffered = len(data)
+
+    def flush(self):
+        self._flush_blocks(final=True)
+        self._stream.flush()
+
+    def close(self):
+        if not self.closed:
+            self._flush_blocks(final=True)
+            self._stream.close()
+            self.closed = True
+
+
+class BlockReader(object):
+    """
+    A read-only file object over a block-compressed file. Reading ahead
+    decompresses the following blocks in parallel, and seek() jumps
+    directly to the block containing an uncompressed offset.
+    """
+    def __init__(self, filename, workers=None):
+        self._stream = open(filename, 'rb')
+        self._build_index()
+
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = workers
+        self._pool = Pool(workers) if workers > 1 else None
+
+        self._block = ''
+        self._block_pos = 0
+        self._next_block = 0
+        self._pending = []
+        self.closed = False
+
+    def _build_index(self):
+        "Finds the file offset and uncompressed offset of every block."
+        offsets = []
+        starts = []
+        sizes = []
+        stream = self._stream
+        offset = 0
+        start = 0
+        while True:
+            stream.seek(offset)
+            header = stream.read(_header.size)
+            if not header:
+                break
+
+            fields = _header.unpack(header) \
+                if len(header) == _header.size else None
+            if fields is None or fields[8] != _extra_id:
+                raise IOError("not a block-compressed file")
+
+            member_size, data_size = fields[10:]
+            offsets.append(offset)
+            starts.append(start)
+            sizes.append(member_size)
+            offset += member_size
+            start += data_size
+
+        self._offsets = offsets
+        self._starts = starts
+        self._sizes = sizes
+        self.size = start
+
+    def __len__(self):
+        "Returns the number of blocks in the file."
+        return len(self._offsets)
+
+    def _read_member(self, i):
+        self._stream.seek(self._offsets[i])
+        return self._stream.read(self._sizes[i])
+
+    def _schedule(self):
+        "Starts decompressing blocks ahead of the current one."
+        limit = max(2 * self.workers, 1)
+        while len(self._pending) < limit and \
+                self._next_block + len(self._pending) < len(self._offsets):
+            member = self._read_member(self._next_block + len(self._pending))
+            if self._pool is not None:
+                self._pending.append(self._pool.apply_async(_inflate,
+                                                            (member,)))
+            else:
+                self._pending.append(member)
+
+    def _load_next_block(self):
+        "Makes the next block current, returning False at end of file."
+        self._schedule()
+        if not self._pending:
+            return False
+
+        result = self._pending.pop(0)
+        if self._pool is not None:
+            self._block = result.get()
+        else:
+            self._block = _inflate(result)
+        self._block_pos = 0
+        self._next_block += 1
+        return True
+
+    #------------------------------------------------------------------------#
+
+    def iter_blocks(self):
+        """
+        Returns an iterator over the remaining uncompressed data, one
+        block at a time. Each block holds only whole lines.
+        """
+        if self._block_pos < len(self._block):
+            yield self._block[self._block_pos:]
+        self._block = ''
+        self._block_pos = 0
+
+        while self._load_next_block():
+            block = self._block
+            self._block = ''
+            yield block
+
+    def read(self, size=-1):
+        chunks = []
+        while size < 0 or size > 0:
+            if self._block_pos >= len(self._block):
+                if not self._load_next_block():
+                    break
+
+            if size < 0:
+                chunk = self._block[self._block_pos:]
+            else:
+                chunk = self._block[self._block_pos:self._block_pos + size]
+                size -= len(chunk)
+            self._block_pos += len(chunk)
+            chunks.append(chunk)
+
+        return ''.join(chunks)
+
+    def readline(self, size=-1):
+        if self._block_pos >= len(self._block):
+            if not self._load_next_block():
+                return ''
+
+        end = self._block.find('\n', self._block_pos) + 1
+        if end <= 0:
+            end = len(self._block)
+        if size >= 0:
+            end = min(end, self._block_pos + size)
+
+        line = self._block[self._block_pos:end]
+        self._block_pos = end
+        return line
+
+    def __iter__(self):
+        for block in self.iter_blocks():
+            for line in block.splitlines(True):
+                yield line
+
+    def tell(self):
+        "Returns the current uncompressed offset."
+        if self._next_block == 0:
+            return 0
+        return self._starts[self._next_block - 1] + self._block_pos
+
+    def seek(self, offset, whence=0):
+        "Seeks to an uncompressed offset in the file."
+        if whence == 1:
+            offset += self.tell()
+        elif whence == 2:
+            offset += self.size
+
+        self._discard_pending()
+        self._block = ''
+        self._block_pos = 0
+        self._next_block = max(bisect_right(self._starts, offset) - 1, 0)
+        if self._next_block < len(self._offsets):
+            self._load_next_block()
+            self._block_pos = offset - self._starts[self._next_block - 1]
+
+    def _discard_pending(self):
+        for result in self._pending:
+            if self._pool is not None:
+                result.wait()
+        self._pending = []
+
+    def close(self):
+        if not self.closed:
+            self._discard_pending()
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+            self._stream.close()
+            self.closed = True
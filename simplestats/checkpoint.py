@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+#
+#  checkpoint.py
+#  simplestats
+#
+
+"""
+Distributions which can be checkpointed to disk cheaply and often.
+
+Each distribution has a base file, in the usual dump format, and a delta
+log beside it named with a '.delta' suffix. A checkpoint appends only the
+counts changed since the last one to the log, followed by a blank line
+which marks it as complete. Counts are logged as absolute values, so
+replaying a checkpoint twice is harmless, and a checkpoint torn by a crash
+mid-write is simply ignored on recovery.
+
+Compaction writes a new base file beside the old one, then retires the log
+by renaming it, which commits the compaction, before swapping the new base
+in. Recovery finishes any compaction which was committed, and discards any
+which was not, so the old log is never replayed over the new base.
+"""
+
+import os
+
+from freq import FreqDist, ConditionalFreqDist, _parse_columns, \
+        _escape_spaces
+
+_delta_suffix = '.delta'
+_retired_suffix = '.old'
+
+
+def delta_name(filename):
+    "Returns the name of the delta log for the given base file."
+    return filename + _delta_suffix
+
+
+def _tmp_name(filename):
+    "Returns the name a base file is compacted to before being swapped in."
+    root, extension = os.path.splitext(filename)
+    return root + '.tmp' + extension
+
+
+def _retired_name(filename):
+    "Returns the name of the delta log once retired by a compaction."
+    return delta_name(filename) + _retired_suffix
+
+
+def _fsync_file(filename):
+    "Syncs a file written elsewhere to disk."
+    o_stream = open(filename, 'ab')
+    try:
+        os.fsync(o_stream.fileno())
+    finally:
+        o_stream.close()
+
+
+def _fsync_dir(dirname):
+    """
+    Syncs a directory to disk, so that renames within it are durable.
+    Platforms which can't open directories are skipped.
+    """
+    try:
+        fd = os.open(dirname or os.curdir, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Checkpointed(object):
+    "Checkpointing shared by the distributions below."
+    _n_columns = None
+
+    def _init_checkpoints(self, filename, compact_every):
+        self.filename = filename
+        self.compact_every = compact_every
+        self._dirty = set()
+        self._n_checkpoints = 0
+
+    def checkpoint(self):
+        """
+        Appends the counts changed since the last checkpoint to the delta
+        log, and syncs it to disk. Compacts instead once compact_every
+        checkpoints have been logged.
+        """
+        if self.compact_every is not None and \
+                self._n_checkpoints + 1 >= self.compact_every:
+            self.compact()
+            return
+
+        lines = []
+        for fields in self._dirty_counts():
+            fields = [_escape_spaces(unicode(f)) for f in fields[:-1]] + \
+                [unicode(fields[-1])]
+            lines.append(u' '.join(fields) + u'\n')
+        lines.append(u'\n')
+
+        o_stream = open(delta_name(self.filename), 'ab')
+        try:
+            o_stream.write(u''.join(lines).encode('utf8'))
+            o_stream.flush()
+            os.fsync(o_stream.fileno())
+        finally:
+            o_stream.close()
+
+        self._dirty.clear()
+        self._n_checkpoints += 1
+
+    def compact(self):
+        """
+        Rewrites the base file from the current counts, atomically, and
+        removes the delta log.
+        """
+        tmp_filename = _tmp_name(self.filename)
+        retired_filename = _retired_name(self.filename)
+        dirname = os.path.dirname(self.filename)
+        self.dump(tmp_filename, sort=False)
+        _fsync_file(tmp_filename)
+
+        # Retiring the log commits the new base; a crash from here on is
+        # finished by recover().
+        if os.path.exists(delta_name(self.filename)):
+            os.rename(delta_name(self.filename), retired_filename)
+        else:
+            open(retired_filename, 'wb').close()
+        _fsync_dir(dirname)
+
+        self._finish_compaction()
+        self._dirty.clear()
+        self._n_checkpoints = 0
+
+    def _finish_compaction(self):
+        """
+        Swaps in the new base file of a committed compaction, then removes
+        the retired log.
+        """
+        tmp_filename = _tmp_name(self.filename)
+        dirname = os.path.dirname(self.filename)
+        if os.path.exists(tmp_filename):
+            os.rename(tmp_filename, self.filename)
+            _fsync_dir(dirname)
+        os.remove(_retired_name(self.filename))
+
+    def _settle_compaction(self):
+        "Finishes or discards any compaction interrupted by a crash."
+        if os.path.exists(_retired_name(self.filename)):
+            self._finish_compaction()
+        elif os.path.exists(_tmp_name(self.filename)):
+            # Never committed, so the old base and log still hold.
+            os.remove(_tmp_name(self.filename))
+
+    def recover(self):
+        """
+        Replaces the current counts with those from the base file and every
+        complete checkpoint in the delta log.
+        """
+        self._settle_compaction()
+        self._clear_counts()
+        if os.path.exists(self.filename):
+            self.load(self.filename)
+
+        self._n_checkpoints = 0
+        filename = delta_name(self.filename)
+        if os.path.exists(filename):
+            i_stream = open(filename, 'rb')
+            lines = []
+            offset = 0
+            for line in i_stream:
+                if line != '\n':
+                    lines.append(line)
+                    continue
+
+                if lines:
+                    text = ''.join(lines).decode('utf8')
+                    columns = _parse_columns(text, self._n_columns)
+                    self._apply_counts(*columns)
+                offset += sum(map(len, lines)) + 1
+                lines = []
+                self._n_checkpoints += 1
+            i_stream.close()
+
+            if lines:
+                # The last checkpoint was torn mid-write, so drop it, lest
+                # the next one be appended to it.
+                o_stream = open(filename, 'r+b')
+                o_stream.truncate(offset)
+                o_stream.close()
+
+        self._dirty.clear()
+        return self
+
+    def has_changes(self):
+        "Returns True if there are counts not yet checkpointed."
+        return bool(self._dirty)
+
+
+class CheckpointedFreqDist(_Checkpointed, FreqDist):
+    """
+    A FreqDist which tracks which counts have changed, so that checkpoints
+    need only write those.
+
+        >>> import os, tempfile
+        >>> filename = os.path.join(tempfile.mkdtemp(), 'counts')
+        >>> x = CheckpointedFreqDist(filename)
+        >>> x.inc('a', 3)
+        >>> x.checkpoint()
+        >>> x.inc('b')
+        >>> x.checkpoint()
+        >>> y = CheckpointedFreqDist.open(filename)
+        >>> y[u'a'], y.total
+        (3, 4)
+    """
+    _n_columns = 2
+
+    def __init__(self, filename, compact_every=None):
+        """
+        Checkpoints to the given base filename, compacting after every
+        compact_every checkpoints if given.
+        """
+        FreqDist.__init__(self)
+        self._init_checkpoints(filename, compact_every)
+
+    @staticmethod
+    def open(filename, compact_every=None):
+        "Recovers a distribution from its base file and delta log."
+        dist = CheckpointedFreqDist(filename, compact_every)
+        return dist.recover()
+
+    def inc(self, sample, n=1):
+        FreqDist.inc(self, sample, n)
+        self._dirty.add(sample)
+
+    def decrement(self, sample, n=1):
+        FreqDist.decrement(self, sample, n)
+        self._dirty.add(sample)
+
+    def remove_sample(self, sample):
+        self._dirty.add(sample)
+        return FreqDist.remove_sample(self, sample)
+
+    def _dirty_counts(self):
+        get = self.get
+        for sample in self._dirty:
+            yield sample, get(sample, 0)
+
+    def _clear_counts(self):
+        self.clear()
+        self._total = 0
+        self._version += 1
+
+    def _apply_counts(self, samples, counts):
+        get = self.get
+        for sample, count in zip(samples, counts):
+            self._total += count - get(sample, 0)
+            if count:
+                self[sample] = count
+            else:
+                self.pop(sample, None)
+        self._version += 1
+
+
+class CheckpointedConditionalFreqDist(_Checkpointed, ConditionalFreqDist):
+    """
+    A ConditionalFreqDist which tracks which counts have changed, so that
+    checkpoints need only write those. Counts changed directly on the inner
+    distributions are not tracked.
+    """
+    _n_columns = 3
+
+    def __init__(self, filename, compact_every=None):
+        """
+        Checkpoints to the given base filename, compacting after every
+        compact_every checkpoints if given.
+        """
+        ConditionalFreqDist.__init__(self)
+        self._init_checkpoints(filename, compact_every)
+
+    @staticmethod
+    def open(filename, compact_every=None):
+        "Recovers a distribution from its base file and delta log."
+        cfd = CheckpointedConditionalFreqDist(filename, compact_every)
+        return cfd.recover()
+
+    def inc(self, condition, sample, n=1):
+        """Increments a count of (sample|condition)."""
+        ConditionalFreqDist.inc(self, condition, sample, n)
+        self._dirty.add((condition, sample))
+
+    def _dirty_counts(self):
+        for condition, sample in self._dirty:
+            condition_dist = self.get(condition)
+            if condition_dist is None:
+                count = 0
+            else:
+                count = condition_dist.get(sample, 0)
+            yield condition, sample, count
+
+    def _clear_counts(self):
+        self.clear()
+        self._version += 1
+
+    def _apply_counts(self, conditions, samples, counts):
+        self._version += 1
+        for condition, sample, count in zip(conditions, samples, counts):
+            condition_dist = self.get(condition)
+            if condition_dist is None:
+                if not count:
+                    continue
+                condition_dist = self[condition] = FreqDist()
+            condition_dist._total += count - condition_dist.get(sample, 0)
+            if count:
+                condition_dist[sample] = count
+            else:
+                condition_dist.pop(sample, None)
+                if not condition_dist:
+                    del self[condition]
+            condition_dist._version += 1
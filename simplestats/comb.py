@@ -64,6 +64,21 @@ def iunique_pairs(input_list):
     return UniquePairsIterator(input_list)
 
 
+def _isqrt(n):
+    "Returns the integer square root of a non-negative integer."
+    if n < 0:
+        raise ValueError("square root of a negative number")
+    if n == 0:
+        return 0
+    x = int(n ** 0.5)
+    # Correct any rounding in the float estimate.
+    while x * x > n:
+        x = (x + n // x) // 2
+    while (x + 1) * (x + 1) <= n:
+        x += 1
+    return x
+
+
 class UniquePairsIterator(object):
     """
     An interator over pairings which also has a length method.
@@ -73,21 +88,53 @@ class UniquePairsIterator(object):
     3
     >>> list(x)
     [(1, 2), (1, 3), (2, 3)]
+
+    Pairs are ordered, and can be accessed at random by their position k
+    in that order, so that the pair space can be divided up without
+    stepping through it. The start and stop positions limit iteration to
+    a contiguous range of pairs.
+
+    >>> x = UniquePairsIterator('abcd')
+    >>> x.pair_at(4), x.rank(1, 3)
+    (('b', 'd'), 4)
+    >>> list(x[4:])
+    [('b', 'd'), ('c', 'd')]
+    >>> [len(chunk) for chunk in x.split(4)]
+    [2, 2, 1, 1]
     """
-    def __init__(self, input_list):
-        self.i = 0
-        self.j = 1
+    def __init__(self, input_list, start=0, stop=None):
         self.input_list = sorted(input_list)
         self.list_len = len(input_list)
 
         if self.list_len < 2:
             raise ValueError("input must be of length at least 2")
 
+        self._set_range(start, stop)
+
+    def _set_range(self, start, stop):
+        n_pairs = self.list_len * (self.list_len - 1) // 2
+        if stop is None or stop > n_pairs:
+            stop = n_pairs
+        self.start = max(0, min(start, stop))
+        self.stop = stop
+        self._k = self.start
+        if self._k < self.stop:
+            self.i, self.j = self.pair_indices(self._k)
+
+    def _sub(self, start, stop):
+        "Returns an iterator over a range of pairs, sharing our items."
+        sub = object.__new__(self.__class__)
+        sub.input_list = self.input_list
+        sub.list_len = self.list_len
+        sub._set_range(start, stop)
+        return sub
+
     def next(self):
-        if self.i == self.list_len - 1 and self.j >= self.list_len:
+        if self._k >= self.stop:
             raise StopIteration
 
         item = self.input_list[self.i], self.input_list[self.j]
+        self._k += 1
         self.j += 1
         if self.j >= self.list_len:
             self.i += 1
@@ -96,7 +143,7 @@ class UniquePairsIterator(object):
         return item
 
     def __len__(self):
-        return self.list_len * (self.list_len - 1) / 2
+        return self.stop - self.start
 
     def __iter__(self):
         return self
@@ -104,6 +151,78 @@ class UniquePairsIterator(object):
     def __repr__(self):
         return '<UniquePairsIterator: %d items>' % len(self)
 
+    #------------------------------------------------------------------------#
+
+    def rank(self, i, j):
+        """
+        Returns the position of the pair of the i-th and j-th (sorted)
+        items, counted over all pairs regardless of start and stop.
+        """
+        n = self.list_len
+        if not 0 <= i < j < n:
+            raise IndexError("need 0 <= i < j < %d" % n)
+        return i * (2 * n - i - 1) // 2 + (j - i - 1)
+
+    def pair_indices(self, k):
+        """
+        Returns the indices (i, j) of the pair at position k, counted over
+        all pairs regardless of start and stop, in constant time.
+        """
+        n = self.list_len
+        if not 0 <= k < n * (n - 1) // 2:
+            raise IndexError("pair index out of range")
+
+        # Row i starts at position i * (2n - i - 1) / 2; solve for the
+        # last row starting at or before k.
+        b = 2 * n - 1
+        i = (b - _isqrt(b * b - 8 * k)) // 2
+        while i * (2 * n - i - 1) // 2 > k:
+            i -= 1
+        while (i + 1) * (2 * n - i - 2) // 2 <= k:
+            i += 1
+
+        j = k - i * (2 * n - i - 1) // 2 + i + 1
+        return i, j
+
+    def pair_at(self, k):
+        "Returns the pair at position k, as for pair_indices()."
+        i, j = self.pair_indices(k)
+        return self.input_list[i], self.input_list[j]
+
+    def __getitem__(self, key):
+        """
+        Returns the k-th pair of this iterator's range, or for a slice, an
+        iterator over the sliced range.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("slices must be contiguous")
+            return self._sub(self.start + start,
+                             self.start + max(start, stop))
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("pair index out of range")
+        return self.pair_at(self.start + key)
+
+    def split(self, n_chunks):
+        """
+        Divides this iterator's range into n_chunks contiguous iterators,
+        as even in size as possible, which can be consumed independently.
+        """
+        if n_chunks < 1:
+            raise ValueError("need at least one chunk")
+        size, extra = divmod(len(self), n_chunks)
+        chunks = []
+        start = self.start
+        for c in xrange(n_chunks):
+            stop = start + size + (c < extra)
+            chunks.append(self._sub(start, stop))
+            start = stop
+        return chunks
+
 
 def unique_tuples(xs, k=2):
     return list(itertools.combinations(xs, k))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+#  decay.py
+#  simplestats
+#
+
+"""
+Frequency distributions whose counts decay exponentially over time, for
+spotting trends in a stream.
+"""
+
+from math import log
+
+from freq import FreqDist, sopen, _iter_text_blocks, _escape_spaces, \
+        _unescape_spaces, _symbol_sep
+
+# Once the scale falls below this, counts are renormalized, which keeps
+# stored counts well within the range of a float.
+_min_scale = 1e-100
+_header = u'#decayed half_life=%r\n'
+
+
+class DecayedFreqDist(object):
+    """
+    A frequency distribution whose counts halve every half_life units of
+    time. Rather than touching every count as time passes, counts are
+    stored relative to a global scale factor, so that inc(), count() and
+    prob() take constant time however often decay() is called. Stored
+    counts are only rescaled, all at once, when the scale grows too small.
+
+        >>> x = DecayedFreqDist(half_life=1.0)
+        >>> x.inc('old', 4)
+        >>> x.decay(2.0)
+        >>> x.inc('new', 3)
+        >>> x.count('old')
+        1.0
+        >>> x.prob('new')
+        0.75
+    """
+    def __init__(self, half_life):
+        if half_life <= 0:
+            raise ValueError("half_life must be positive")
+        self.half_life = float(half_life)
+        self._counts = {}
+        self._scale = 1.0
+        self._total = 0.0
+
+    def total():
+        doc = "The total decayed count."  # noqa
+
+        def fget(self):
+            return self._total * self._scale
+        return locals()
+    total = property(**total())
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, sample):
+        return sample in self._counts
+
+    def __iter__(self):
+        return iter(self._counts)
+
+    def iterkeys(self):
+        return iter(self._counts)
+
+    def keys(self):
+        return self._counts.keys()
+
+    def iteritems(self):
+        "Iterates over (sample, decayed count) pairs."
+        scale = self._scale
+        for sample, count in self._counts.iteritems():
+            yield sample, count * scale
+
+    def items(self):
+        return list(self.iteritems())
+
+    #------------------------------------------------------------------------#
+
+    def inc(self, sample, n=1):
+        n = n / self._scale
+        counts = self._counts
+        counts[sample] = counts.get(sample, 0.0) + n
+        self._total += n
+
+    def decay(self, elapsed=1.0):
+        "Decays every count by the given amount of elapsed time."
+        self._scale *= 0.5 ** (elapsed / self.half_life)
+        if self._scale < _min_scale:
+            self._renormalize()
+
+    def _renormalize(self):
+        "Folds the scale into the stored counts."
+        scale = self._scale
+        counts = self._counts
+        for sample in counts:
+            counts[sample] *= scale
+        self._total *= scale
+        self._scale = 1.0
+
+    def prune(self, min_count):
+        """
+        Removes samples whose decayed count has fallen below min_count,
+        since counts only ever approach zero. Returns the number removed.
+        """
+        threshold = min_count / self._scale
+        counts = self._counts
+        removed = [k for (k, v) in counts.iteritems() if v < threshold]
+        for sample in removed:
+            self._total -= counts.pop(sample)
+        if not counts:
+            self._total = 0.0
+        return len(removed)
+
+    #------------------------------------------------------------------------#
+
+    def count(self, sample):
+        """Return the decayed count of the sample."""
+        return self._counts.get(sample, 0.0) * self._scale
+
+    __getitem__ = count
+
+    def prob(self, sample):
+        """Returns the MLE probability of this sample."""
+        c = self._counts.get(sample, 0.0)
+        if c > 0:
+            return c / self._total
+        else:
+            return 0.0
+
+    def log_prob(self, sample):
+        """Returns the log MLE probability of this sample."""
+        return log(self._counts.get(sample, 0.0) / self._total)
+
+    def candidates(self):
+        """
+        Returns a list of (sample, log_prob) pairs, using the log MLE
+        probability of each sample.
+        """
+        log_total = log(self._total)
+        return [(k, log(v) - log_total) for (k, v) in
+                self._counts.iteritems() if v > 0]
+
+    def top(self, n):
+        "Returns the n samples with the highest decayed counts."
+        return [k for (k, v) in sorted(self._counts.iteritems(),
+                                       key=lambda x: x[1], reverse=True)[:n]]
+
+    def to_freq_dist(self):
+        "Returns a FreqDist of the current decayed counts."
+        return FreqDist(self.iteritems())
+
+    #------------------------------------------------------------------------#
+
+    def merge(self, rhs_dist):
+        """
+        Adds the current counts of another distribution, decayed or not.
+        """
+        scale = self._scale
+        counts = self._counts
+        added = 0.0
+        for sample, count in rhs_dist.iteritems():
+            count = count / scale
+            counts[sample] = counts.get(sample, 0.0) + count
+            added += count
+        self._total += added
+
+    def dump(self, filename):
+        """
+        Dump the current decayed counts to the given filename, after a
+        header line giving the half life, most frequent first.
+        """
+        o_stream = sopen(filename, 'w')
+        o_stream.write(_header % self.half_life)
+        for sample, count in sorted(self.iteritems(), key=lambda x: x[1],
+                                    reverse=True):
+            sample = _escape_spaces(unicode(sample))
+            print >> o_stream, u'%s %r' % (sample, count)
+        o_stream.close()
+
+    def load(self, filename):
+        """
+        Loads counts from the given filename, adding them to the current
+        counts. Can be done for more than one file.
+        """
+        self.merge(_DecayedFile(filename))
+
+    @staticmethod
+    def from_file(filename):
+        """
+        An alternative constructor which builds the distribution from a
+        file, with the half life given in its header.
+        """
+        dumped = _DecayedFile(filename)
+        dist = DecayedFreqDist(dumped.half_life)
+        dist.merge(dumped)
+        return dist
+
+
+class _DecayedFile(object):
+    "Reads a file written by DecayedFreqDist.dump()."
+    def __init__(self, filename):
+        self.filename = filename
+        i_stream = sopen(filename, 'r')
+        line = i_stream.readline()
+        i_stream.close()
+
+        prefix = _header.split('%')[0]
+        if not line.startswith(prefix):
+            raise ValueError("not a decayed distribution: %s" % filename)
+        self.half_life = float(line[len(prefix):])
+
+    def iteritems(self):
+        first = True
+        for text in _iter_text_blocks(self.filename):
+            # Only split on newlines, since samples may hold other unicode
+            # line breaks.
+            if text.endswith(u'\n'):
+                text = text[:-1]
+            lines = text.split(u'\n')
+            if first:
+                lines = lines[1:]
+                first = False
+            for line in lines:
+                sample, count = line.split(_symbol_sep)
+                yield _unescape_spaces(sample), float(count)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+#  dense.py
+#  simplestats
+#
+
+"""
+A frequency distribution for small non-negative integer samples, such as
+status codes or label indices, stored as a flat array of counts.
+"""
+
+from array import array
+from math import log
+
+from freq import FreqDist, sopen, _iter_text_blocks, _parse_columns
+
+_count_type = 'l'
+
+
+class DenseFreqDist(object):
+    """
+    A frequency distribution over the integers 0..size-1, with the count of
+    each sample kept at its index in an array. There is no hashing, and
+    memory depends only on the size of the sample space.
+
+        >>> x = DenseFreqDist(4)
+        >>> x.inc_many([0, 2, 2, 3])
+        >>> x.inc(2)
+        >>> x.count(2)
+        3
+        >>> list(x.probs())
+        [0.2, 0.0, 0.6, 0.2]
+        >>> sorted(x.to_freq_dist().items())
+        [(0, 1), (2, 3), (3, 1)]
+    """
+    def __init__(self, size, growable=False):
+        """
+        Counts samples in range(size). If growable is set, the range grows
+        to fit larger samples; otherwise they raise an IndexError.
+        """
+        self.growable = growable
+        self._counts = array(_count_type, [0]) * size
+        self._total = 0
+
+    def total():
+        doc = "The total count."  # noqa
+
+        def fget(self):
+            return self._total
+        return locals()
+    total = property(**total())
+
+    def size():
+        doc = "The number of possible samples."  # noqa
+
+        def fget(self):
+            return len(self._counts)
+        return locals()
+    size = property(**size())
+
+    def __len__(self):
+        "Returns the number of samples with a non-zero count."
+        return len(self._counts) - self._counts.count(0)
+
+    def __contains__(self, sample):
+        return 0 <= sample < len(self._counts) and self._counts[sample] != 0
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def iterkeys(self):
+        for sample, count in enumerate(self._counts):
+            if count:
+                yield sample
+
+    def iteritems(self):
+        for sample, count in enumerate(self._counts):
+            if count:
+                yield sample, count
+
+    def items(self):
+        return list(self.iteritems())
+
+    #------------------------------------------------------------------------#
+
+    def grow(self, size):
+        "Extends the range of samples to range(size)."
+        extra = size - len(self._counts)
+        if extra > 0:
+            self._counts.extend(array(_count_type, [0]) * extra)
+
+    def _check_range(self, lo, hi):
+        if lo < 0:
+            raise IndexError("sample %d is negative" % lo)
+        if hi >= len(self._counts):
+            if not self.growable:
+                raise IndexError("sample %d is out of range" % hi)
+            self.grow(max(hi + 1, 2 * len(self._counts)))
+
+    def inc(self, sample, n=1):
+        self._check_range(sample, sample)
+        self._counts[sample] += n
+        self._total += n
+
+    def inc_many(self, samples):
+        """
+        Increments each of the given samples by one. Counts are accumulated
+        in a plain list before being added to the array in one pass, which
+        is much faster than incrementing them one at a time.
+        """
+        if not isinstance(samples, (list, tuple, array)):
+            samples = list(samples)
+        if not samples:
+            return
+
+        self._check_range(min(samples), max(samples))
+        local = [0] * len(self._counts)
+        for sample in samples:
+            local[sample] += 1
+
+        counts = self._counts
+        for sample, count in enumerate(local):
+            if count:
+                counts[sample] += count
+        self._total += len(samples)
+
+    def decrement(self, sample, n=1):
+        if self.count(sample) < n:
+            raise ValueError("can't reduce a count below zero")
+        self._counts[sample] -= n
+        self._total -= n
+
+    def merge(self, rhs_dist):
+        "Adds the counts of another dense or dict-based distribution."
+        if isinstance(rhs_dist, DenseFreqDist):
+            items = rhs_dist.items()
+            if items:
+                self._check_range(items[0][0], items[-1][0])
+            counts = self._counts
+            for sample, count in items:
+                counts[sample] += count
+            self._total += rhs_dist._total
+            return
+
+        for sample, count in rhs_dist.iteritems():
+            self.inc(sample, count)
+
+    #------------------------------------------------------------------------#
+
+    def count(self, sample):
+        """Return the frequency count of the sample."""
+        if 0 <= sample < len(self._counts):
+            return self._counts[sample]
+        return 0
+
+    __getitem__ = count
+
+    def prob(self, sample):
+        """Returns the MLE probability of this sample."""
+        c = self.count(sample)
+        if c > 0:
+            return c / float(self._total)
+        else:
+            return 0.0
+
+    def log_prob(self, sample):
+        """Returns the log MLE probability of this sample."""
+        return log(self.count(sample) / float(self._total))
+
+    def probs(self, samples=None):
+        """
+        Returns an array of the probabilities of the given samples, or of
+        every sample in range if none are given.
+        """
+        total = float(self._total or 1)
+        if samples is None:
+            return array('d', [c / total for c in self._counts])
+
+        count = self.count
+        return array('d', [count(s) / total for s in samples])
+
+    def candidates(self):
+        """
+        Returns a list of (sample, log_prob) pairs, using the log MLE
+        probability of each sample.
+        """
+        total = float(self._total)
+        return [(k, log(v / total)) for (k, v) in self.iteritems()]
+
+    #------------------------------------------------------------------------#
+
+    def to_freq_dist(self):
+        "Returns a dict-based FreqDist with the same counts."
+        return FreqDist(self.iteritems())
+
+    @staticmethod
+    def from_freq_dist(dist, size=None):
+        """
+        An alternative constructor which copies the counts of a dict-based
+        FreqDist, whose samples must be non-negative integers. The size
+        defaults to just fit the largest sample.
+        """
+        if size is None:
+            size = max(dist.iterkeys()) + 1 if dist else 0
+        dense = DenseFreqDist(size)
+        dense.merge(dist)
+        return dense
+
+    def dump(self, filename):
+        """
+        Dump the non-zero counts to the given filename, in the same format
+        as FreqDist.dump(), most frequent first.
+        """
+        o_stream = sopen(filename, 'w')
+        for sample, count in sorted(self.iteritems(), key=lambda x: x[1],
+                                    reverse=True):
+            print >> o_stream, "%d %d" % (sample, count)
+        o_stream.close()
+
+    def load(self, filename):
+        """
+        Loads counts from the given filename. Can be done for more than
+        one file.
+        """
+        for text in _iter_text_blocks(filename):
+            samples, counts = _parse_columns(text, 2)
+            samples = map(int, samples)
+            self._check_range(min(samples), max(samples))
+            for sample, count in zip(samples, counts):
+                self._counts[sample] += count
+            self._total += sum(counts)
+
+    @staticmethod
+    def from_file(filename, size=0):
+        """
+        An alternative constructor which builds the distribution from a
+        file, growing it to fit the samples found.
+        """
+        dist = DenseFreqDist(size, growable=True)
+        dist.load(filename)
+        return dist
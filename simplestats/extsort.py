@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+#  extsort.py
+#  simplestats
+#
+
+"""
+Sorting sequences which are too large to sort in memory.
+"""
+
+import heapq
+import tempfile
+import cPickle as pickle
+
+from sequences import groups_of_n_iter
+
+_batch_size = 1000
+
+
+class _Reversed(object):
+    "Wraps a sort key so that it orders in reverse."
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def external_sorted(iterable, key=None, reverse=False, run_size=100000,
+                    tmp_dir=None):
+    """
+    As for sorted(), but returns an iterator, and holds at most run_size
+    items in memory at a time. Larger inputs are split into sorted runs
+    which are spilled to temporary files, then merged. Like sorted(), the
+    sort is stable.
+
+        >>> list(external_sorted([3, 1, 2, 5, 4], run_size=2))
+        [1, 2, 3, 4, 5]
+        >>> list(external_sorted(['bb', 'a', 'cc', 'd'], key=len,
+        ...                      reverse=True, run_size=3))
+        ['bb', 'cc', 'a', 'd']
+    """
+    runs = []
+    try:
+        for run in groups_of_n_iter(run_size, iterable):
+            run.sort(key=key, reverse=reverse)
+            if not runs and len(run) < run_size:
+                # Everything fits in memory, so skip spilling.
+                for item in run:
+                    yield item
+                return
+
+            runs.append(_spill(run, tmp_dir))
+            del run
+
+        for item in _merge(runs, key, reverse):
+            yield item
+
+    finally:
+        for run_file in runs:
+            run_file.close()
+
+
+def _spill(items, tmp_dir):
+    "Writes a sorted run to a temporary file, returning the file."
+    run_file = tempfile.TemporaryFile(dir=tmp_dir)
+    pickler = pickle.Pickler(run_file, pickle.HIGHEST_PROTOCOL)
+    for i in xrange(0, len(items), _batch_size):
+        pickler.dump(items[i:i + _batch_size])
+        pickler.clear_memo()
+    run_file.seek(0)
+    return run_file
+
+
+def _iter_run(run_file):
+    "Reads back a run written by _spill()."
+    unpickler = pickle.Unpickler(run_file)
+    while True:
+        try:
+            batch = unpickler.load()
+        except EOFError:
+            break
+        for item in batch:
+            yield item
+
+
+def _merge(runs, key, reverse):
+    """
+    Merges the sorted runs. Ties are broken by run order, which keeps the
+    merge stable since earlier runs hold earlier items.
+    """
+    if key is None:
+        key = lambda x: x
+    if reverse:
+        wrap = lambda x: _Reversed(key(x))
+    else:
+        wrap = key
+
+    heap = []
+    iterators = [_iter_run(run_file) for run_file in runs]
+    for i, iterator in enumerate(iterators):
+        for item in iterator:
+            heap.append((wrap(item), i, item))
+            break
+    heapq.heapify(heap)
+
+    while heap:
+        sort_key, i, item = heap[0]
+        yield item
+
+        for next_item in iterators[i]:
+            heapq.heapreplace(heap, (wrap(next_item), i, next_item))
+            break
+        else:
+            heapq.heappop(heap)
@@ -9,10 +9,18 @@
 
 import sys
 import bz2
+import struct
+import random
 import gzip
 import codecs
 
+from array import array
 from math import log
+from itertools import izip, groupby
+
+from blocks import BlockReader, BlockWriter, is_block_file
+from extsort import external_sorted
+from sampling import AliasTable
 
 
 class FreqDist(dict):
@@ -32,6 +40,14 @@ class FreqDist(dict):
         >>> x.prob('unknown')
         0.0
     """
+    # A counter bumped on every update, used to invalidate cached values.
+    _version = 0
+    _cache_version = None
+    _candidates = None
+    _log_probs = None
+    _alias_version = None
+    _alias_table = None
+
     def __init__(self, pairSeq=None):
         """
         Can optionally be given a sequence of (sample, count) pairs to load
@@ -55,9 +71,11 @@ class FreqDist(dict):
     def inc(self, sample, n=1):
         self.__setitem__(sample, self.get(sample, 0) + n)
         self._total += n
+        self._version += 1
 
     def decrement(self, sample, n=1):
         count = self[sample]
+        self._version += 1
 
         if count < n:
             raise ValueError("can't reduce a count below zero")
@@ -82,6 +100,7 @@ class FreqDist(dict):
         count = self[sample]
         del self[sample]
         self._total -= count
+        self._version += 1
 
         return count
 
@@ -101,27 +120,70 @@ class FreqDist(dict):
 
     def log_prob(self, sample):
         """Returns the log MLE probability of this sample."""
+        if self._cache_version == self._version:
+            value = self._log_probs.get(sample)
+            if value is not None:
+                return value
+
         return log(self.get(sample, 0) / float(self._total))
 
     def candidates(self):
         """
         Returns a list of (sample, log_prob) pairs, using the log MLE
-        probability of each sample.
+        probability of each sample. The result is cached until the
+        distribution is next updated.
+        """
+        if self._cache_version != self._version:
+            self._candidates = [
+                (k, log(v / float(self._total)))
+                for (k, v) in self.iteritems()
+            ]
+            self._log_probs = dict(self._candidates)
+            self._cache_version = self._version
+
+        return list(self._candidates)
+
+    def sample(self, k=None, rng=None):
         """
-        return [
-            (k, log(v / float(self._total)))
-            for (k, v) in self.iteritems()
-        ]
+        Draws a sample at random from this distribution, or a list of k
+        samples if k is given. The alias table used is built on first use,
+        and rebuilt only after the distribution is updated. A
+        random.Random instance may be given as rng.
+        """
+        if self._alias_version != self._version:
+            self._alias_table = AliasTable(self.iterkeys(), self.itervalues())
+            self._alias_version = self._version
+
+        if rng is None:
+            rng = random
+        if k is None:
+            return self._alias_table.draw(rng)
+        return self._alias_table.draws(k, rng)
+
+    def freeze(self):
+        """
+        Returns an immutable copy of this distribution, with its counts
+        and log probabilities precomputed into compact arrays.
+        """
+        from frozen import FrozenFreqDist
+        return FrozenFreqDist(self)
 
-    def dump(self, filename):
+    def dump(self, filename, sort=True, run_size=None):
         """
         Dump the current counts to the given filename. Note that symbols
         are coerced to strings, so arbitrary objects may not be
         reconstructed identically.
+
+        Counts are written most frequent first, unless sort is False. If
+        run_size is given, at most that many counts are sorted in memory at
+        a time, spilling to temporary files as needed.
         """
+        items = self.iteritems()
+        if sort:
+            items = _sorted(items, lambda x: x[1], True, run_size)
+
         o_stream = sopen(filename, 'w')
-        for key, count in sorted(self.iteritems(), key=lambda x: x[1],
-                                 reverse=True):
+        for key, count in items:
             key = _escape_spaces(unicode(key))
             print >> o_stream, "%s %d" % (key, count)
         o_stream.close()
@@ -134,16 +196,26 @@ class FreqDist(dict):
         Loads counts from the given filename. Can be done for more than
         one file.
         """
-        i_stream = sopen(filename, 'r')
-        for line in i_stream:
-            key, count = line.rstrip().split(_symbol_sep)
-            key = _unescape_spaces(key)
-            count = int(count)
-            self.inc(key, count)
-        i_stream.close()
+        for text in _iter_text_blocks(filename):
+            keys, counts = _parse_columns(text, 2)
+            self._inc_many(keys, counts)
 
         return
 
+    def _inc_many(self, samples, counts):
+        "Increments each sample by the matching count, as a batch."
+        if self.inc.im_func is not FreqDist.inc.im_func:
+            # Subclasses may keep extra state up to date in inc().
+            for sample, count in izip(samples, counts):
+                self.inc(sample, count)
+            return
+
+        get = self.get
+        for sample, count in izip(samples, counts):
+            self[sample] = get(sample, 0) + count
+        self._total += sum(counts)
+        self._version += 1
+
     #------------------------------------------------------------------------#
 
     @staticmethod
@@ -158,8 +230,24 @@ class FreqDist(dict):
     #------------------------------------------------------------------------#
 
     def merge(self, rhs_dist):
-        for sample, count in rhs_dist.iteritems():
-            self.inc(sample, count)
+        "Adds the counts of another distribution to this one."
+        if isinstance(rhs_dist, dict):
+            self._inc_many(rhs_dist.keys(), rhs_dist.values())
+        else:
+            for sample, count in rhs_dist.iteritems():
+                self.inc(sample, count)
+        self._version += 1
+
+    #------------------------------------------------------------------------#
+
+    def __reduce__(self):
+        """
+        Pickles the counts packed into a single array, rather than as a
+        dictionary of individually pickled ints, leaving out any caches.
+        """
+        return _rebuild_freq_dist, (self.__class__, self.keys(),
+                                    _pack_counts(self.values()),
+                                    _picklable_state(self))
 
 
 class DefaultFreqDist(FreqDist):
@@ -204,7 +292,53 @@ class DefaultFreqDist(FreqDist):
 class ConditionalFreqDist(dict):
     """
     A model for P(Sample|Condition) for a number of conditions.
+
+    If track_marginals is set, distributions over conditions and over
+    samples are kept up to date on every inc(), so that to_condition_dist()
+    and to_sample_dist() needn't re-aggregate every count. Likewise, if
+    track_inverse is set, the P(condition|sample) model returned by
+    invert() is maintained as counts arrive. Counts changed directly on the
+    inner distributions bypass this tracking, and the version counter.
+
+        >>> x = ConditionalFreqDist(track_marginals=True)
+        >>> x.inc('Lunch', 'Sandwich', 3)
+        >>> x.inc('Dinner', 'Soup')
+        >>> x.condition_prob('Lunch')
+        0.75
+        >>> x.sample_prob('Soup')
+        0.25
     """
+    # A counter bumped on every update, used to invalidate cached values.
+    _version = 0
+    _condition_dist = None
+    _sample_dist = None
+    _inverse = None
+
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the same arguments as dict(), plus the track_marginals and
+        track_inverse keyword arguments. Any tracked models are seeded from
+        the initial contents.
+        """
+        track_marginals = kwargs.pop('track_marginals', False)
+        track_inverse = kwargs.pop('track_inverse', False)
+        dict.__init__(self, *args, **kwargs)
+
+        if track_marginals:
+            self._condition_dist = FreqDist()
+            self._sample_dist = FreqDist()
+
+        if track_inverse:
+            self._inverse = ConditionalFreqDist()
+
+        if track_marginals or track_inverse:
+            for condition, sample, count in self.itercounts():
+                if track_marginals:
+                    self._condition_dist.inc(condition, count)
+                    self._sample_dist.inc(sample, count)
+                if track_inverse:
+                    self._inverse.inc(sample, condition, count)
+
     def inc(self, condition, sample, n=1):
         """Increments a count of (sample|condition)."""
         condition_dist = self.get(condition)
@@ -212,6 +346,14 @@ class ConditionalFreqDist(dict):
             condition_dist = self.setdefault(condition, FreqDist())
 
         condition_dist.inc(sample, n)
+        self._version += 1
+
+        if self._condition_dist is not None:
+            self._condition_dist.inc(condition, n)
+            self._sample_dist.inc(sample, n)
+
+        if self._inverse is not None:
+            self._inverse.inc(sample, condition, n)
         return
 
     def prob(self, condition, sample):
@@ -249,6 +391,18 @@ class ConditionalFreqDist(dict):
             # Hit, return candidates.
             return conditionModel.candidates()
 
+    def sample(self, condition, k=None, rng=None):
+        """
+        Draws a sample at random given the condition, or a list of k
+        samples if k is given. An exception is raised for unseen
+        conditions.
+        """
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            raise UnknownSymbolError(condition)
+
+        return condition_dist.sample(k, rng)
+
     #------------------------------------------------------------------------#
 
     def itercounts(self):
@@ -266,21 +420,63 @@ class ConditionalFreqDist(dict):
     def invert(self):
         """
         Returns a P(condition|sample) model based off the same counts as
-        here.
+        here. If the inverse is being tracked, the maintained model is
+        returned directly, and should not be modified.
         """
+        if self._inverse is not None:
+            return self._inverse
+
         newModel = ConditionalFreqDist()
         for condition, sample, count in self.itercounts():
             newModel.inc(sample, condition, count)
 
         return newModel
 
-    def dump(self, filename):
+    def freeze(self):
+        """
+        Returns an immutable, compact copy of this model for read-heavy
+        use.
+        """
+        from frozen import FrozenConditionalFreqDist
+        return FrozenConditionalFreqDist(self)
+
+    def __reduce__(self):
+        """
+        Pickles the counts as flat lists of conditions and samples, with
+        the counts and row lengths packed into arrays.
+        """
+        conditions = self.keys()
+        condition_dists = self.values()
+        if [d for d in condition_dists if type(d) is not FreqDist]:
+            # Keep any special distributions as they are.
+            return _rebuild_cfd, (self.__class__, conditions, None,
+                                  condition_dists, None,
+                                  _picklable_state(self))
+
+        samples = []
+        counts = []
+        for condition_dist in condition_dists:
+            samples.extend(condition_dist.iterkeys())
+            counts.extend(condition_dist.itervalues())
+
+        return _rebuild_cfd, (self.__class__, conditions,
+                              _pack_counts(map(len, condition_dists)),
+                              samples, _pack_counts(counts),
+                              _picklable_state(self))
+
+    def dump(self, filename, sort=True, run_size=None):
         """
-        Dump this model to a filename.
+        Dump this model to a filename. Unless sort is False, counts are
+        ordered by condition, then most frequent first. If run_size is
+        given, at most that many counts are sorted in memory at a time.
         """
+        counts = self.itercounts()
+        if sort:
+            counts = _sorted(counts, lambda x: (x[0], -x[2], x[1]), False,
+                             run_size)
+
         o_stream = sopen(filename, 'w')
-        for condition, sample, count in sorted(self.itercounts(),
-                key=lambda x: (x[0], -x[2], x[1])):
+        for condition, sample, count in counts:
             condition = _escape_spaces(unicode(condition))
             sample = _escape_spaces(unicode(sample))
             print >> o_stream, u"%s %s %d" % (
@@ -292,14 +488,28 @@ class ConditionalFreqDist(dict):
         """
         Load counts for this model from a filename.
         """
-        i_stream = sopen(filename, 'r')
-        for line in i_stream:
-            condition, sample, count = line.rstrip().split(_symbol_sep)
-            condition = _unescape_spaces(condition)
-            sample = _unescape_spaces(sample)
-            count = int(count)
-            self.inc(condition, sample, count)
-        i_stream.close()
+        batched = self.inc.im_func is ConditionalFreqDist.inc.im_func and \
+            self._condition_dist is None and self._inverse is None
+        self._version += 1
+
+        for text in _iter_text_blocks(filename):
+            conditions, samples, counts = _parse_columns(text, 3)
+            if not batched:
+                for condition, sample, count in izip(conditions, samples,
+                                                     counts):
+                    self.inc(condition, sample, count)
+                continue
+
+            # Dumps are sorted by condition, so insert a run at a time.
+            start = 0
+            for condition, run in groupby(conditions):
+                end = start + len(list(run))
+                condition_dist = self.get(condition)
+                if condition_dist is None:
+                    condition_dist = self.setdefault(condition, FreqDist())
+                condition_dist._inc_many(samples[start:end],
+                                         counts[start:end])
+                start = end
         return
 
     #------------------------------------------------------------------------#
@@ -318,6 +528,9 @@ class ConditionalFreqDist(dict):
 
     def to_condition_dist(self):
         """Generates a frequency distribution of conditions."""
+        if self._condition_dist is not None:
+            return FreqDist(self._condition_dist.iteritems())
+
         dist = FreqDist()
         for condition, condition_dist in self.iteritems():
             dist.inc(condition, sum(condition_dist.itervalues()))
@@ -328,18 +541,57 @@ class ConditionalFreqDist(dict):
 
     def to_sample_dist(self):
         """Generates a freqency distribution of samples."""
+        if self._sample_dist is not None:
+            return FreqDist(self._sample_dist.iteritems())
+
         dist = FreqDist()
         for condition, condition_dist in self.iteritems():
             dist.merge(condition_dist)
 
         return dist
 
+    def condition_prob(self, condition):
+        """
+        Returns P(condition), the share of all counts which fall under the
+        given condition.
+        """
+        if self._condition_dist is not None:
+            return self._condition_dist.prob(condition)
+
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            return 0.0
+
+        total = sum(d.total for d in self.itervalues())
+        return condition_dist.total / float(total)
+
+    def sample_prob(self, sample):
+        """Returns P(sample), marginalising over all conditions."""
+        if self._sample_dist is not None:
+            return self._sample_dist.prob(sample)
+
+        count = 0
+        total = 0
+        for condition_dist in self.itervalues():
+            count += condition_dist.get(sample, 0)
+            total += condition_dist.total
+
+        if count > 0:
+            return count / float(total)
+        else:
+            return 0.0
+
 #----------------------------------------------------------------------------#
 
 def smooth_by_adding_one(freq_dist):
-    # XXX this type of smoothing has a particular name (Bell smoothing?)
+    """
+    Adds one to every count in place. See smoothing.LaplaceView for a
+    version which leaves the distribution untouched.
+    """
     for sample in freq_dist.iterkeys():
         freq_dist[sample] += 1
+    freq_dist._total += len(freq_dist)
+    freq_dist._version += 1
     return
 
 
@@ -388,10 +640,187 @@ def _contains_escape(value):
     """
     return _space_replacement in value
 
+def _sorted(items, key, reverse, run_size):
+    "Sorts in memory, or externally if run_size is given."
+    if run_size is None:
+        return sorted(items, key=key, reverse=reverse)
+    return external_sorted(items, key=key, reverse=reverse,
+                           run_size=run_size)
+
+# Cached values, which aren't worth pickling.
+_cache_attributes = ('_cache_version', '_candidates', '_log_probs',
+                     '_alias_version', '_alias_table')
+
+def _picklable_state(obj):
+    return dict((k, v) for (k, v) in obj.__dict__.iteritems()
+                if k not in _cache_attributes)
+
+# struct formats for array items of each size, used to read arrays packed
+# on platforms with another byte order or item size.
+_int_formats = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+_float_formats = {4: 'f', 8: 'd'}
+
+def _pack_array(values):
+    """
+    Packs an array into a string, recording its item size and byte order
+    so that it can be unpacked on any platform.
+    """
+    return (values.typecode, values.itemsize, sys.byteorder,
+            values.tostring())
+
+def _unpack_items(packed):
+    "Returns the values of a packed array as a tuple, on any platform."
+    typecode, itemsize, byteorder, data = packed
+    if typecode in 'fd':
+        item_format = _float_formats[itemsize]
+    else:
+        item_format = _int_formats[itemsize]
+    return struct.unpack('%s%d%s' % ('<' if byteorder == 'little' else '>',
+                                     len(data) // itemsize, item_format),
+                         data)
+
+def _unpack_array(packed):
+    """
+    Unpacks an array packed by _pack_array(). Raises OverflowError if its
+    values don't fit this platform's array type.
+    """
+    typecode, itemsize, byteorder, data = packed
+    values = array(typecode)
+    if itemsize == values.itemsize and byteorder == sys.byteorder:
+        values.fromstring(data)
+    else:
+        values.extend(_unpack_items(packed))
+    return values
+
+def _pack_counts(counts):
+    """
+    Packs integer counts into a string, using the narrowest array type
+    which holds them, or leaves them be if we can't.
+    """
+    if not counts:
+        return counts
+    try:
+        lo = min(counts)
+        hi = max(counts)
+        for typecode in 'bhil':
+            packed = array(typecode)
+            limit = 1 << (8 * packed.itemsize - 1)
+            if -limit <= lo and hi < limit:
+                packed.extend(counts)
+                return _pack_array(packed)
+    except TypeError:
+        pass
+    return counts
+
+def _unpack_counts(packed):
+    if isinstance(packed, tuple):
+        try:
+            return _unpack_array(packed)
+        except OverflowError:
+            # Packed where longs are wider, so keep Python integers.
+            return list(_unpack_items(packed))
+    return packed
+
+def _rebuild_freq_dist(cls, samples, packed_counts, state):
+    "Unpickles a FreqDist pickled by FreqDist.__reduce__()."
+    dist = cls.__new__(cls)
+    dict.update(dist, izip(samples, _unpack_counts(packed_counts)))
+    dist.__dict__.update(state)
+    return dist
+
+def _rebuild_cfd(cls, conditions, packed_lengths, samples, packed_counts,
+                 state):
+    "Unpickles a model pickled by ConditionalFreqDist.__reduce__()."
+    cfd = cls.__new__(cls)
+    if packed_lengths is None:
+        dict.update(cfd, izip(conditions, samples))
+    else:
+        counts = _unpack_counts(packed_counts)
+        start = 0
+        for condition, length in izip(conditions,
+                                      _unpack_counts(packed_lengths)):
+            end = start + length
+            condition_dist = FreqDist(izip(samples[start:end],
+                                           counts[start:end]))
+            dict.__setitem__(cfd, condition, condition_dist)
+            start = end
+    cfd.__dict__.update(state)
+    return cfd
+
+_load_chunk_size = 1 << 22
+
+def _iter_text_blocks(filename, encoding='utf8'):
+    """
+    Returns an iterator over the contents of the given file as unicode
+    strings made up of whole lines, decoding large blocks at a time.
+    """
+    i_stream = sopen(filename, 'rb', encoding=None)
+    if isinstance(i_stream, BlockReader):
+        chunks = i_stream.iter_blocks()
+    else:
+        chunks = iter(lambda: i_stream.read(_load_chunk_size), '')
+
+    remainder = ''
+    for chunk in chunks:
+        end = chunk.rfind('\n') + 1
+        if end == 0:
+            remainder += chunk
+            continue
+
+        yield (remainder + chunk[:end]).decode(encoding)
+        remainder = chunk[end:]
+
+    if remainder:
+        yield remainder.decode(encoding)
+
+    i_stream.close()
+
+def _parse_columns(text, n_columns):
+    """
+    Splits lines of space-separated fields into a list per column, with
+    spaces unescaped, and with the last column converted to counts.
+
+    >>> _parse_columns(u'dog_^_cat 3\\ncow 1\\n', 2)
+    [[u'dog cat', u'cow'], [3, 1]]
+    """
+    if not text.endswith(u'\n'):
+        text += u'\n'
+    n_lines = text.count(u'\n')
+
+    # Keep each line's end as a field of its own, so that a single split
+    # gives every field and we can check each line had n_columns of them.
+    width = n_columns + 1
+    fields = text.replace(u'\n', u' \n ').split(_symbol_sep)
+    fields.pop()
+
+    if len(fields) != width * n_lines or \
+            fields[n_columns::width].count(u'\n') != n_lines:
+        # Irregular lines, so fall back to splitting them one by one.
+        fields = []
+        for line in text[:-1].split(u'\n'):
+            row = line.rstrip().split(_symbol_sep)
+            if len(row) != n_columns:
+                raise ValueError("expected %d fields on line: %r" % (
+                        n_columns, line))
+            fields.extend(row)
+            fields.append(u'\n')
+
+    columns = [fields[i::width] for i in xrange(n_columns)]
+    if _space_replacement in text:
+        for i in xrange(n_columns - 1):
+            columns[i] = [_unescape_spaces(v) for v in columns[i]]
+    columns[-1] = map(int, columns[-1])
+
+    return columns
+
 def sopen(filename, mode='rb', encoding='utf8'):
     """
     Transparently uses compression on the given file based on file
-    extension.
+    extension. Files ending in .bgz are written block-compressed (see the
+    blocks module), which can be decompressed in parallel and seeked
+    within. The format is this package's own, not the BGZF of bgzip, but
+    both are valid gzip files: block-compressed files are read in parallel
+    under either extension, and others are read as plain gzip.
 
     @param filename: The filename to use for the file handle.
     @param mode: The mode to open the file in, e.g. 'r' for read, 'w' for
@@ -405,8 +834,14 @@ def sopen(filename, mode='rb', encoding='utf8'):
 
     if filename.endswith('.bz2'):
         stream = bz2.BZ2File(filename, mode)
-    elif filename.endswith('.gz'):
-        stream = gzip.GzipFile(filename, mode)
+    elif filename.endswith('.bgz') and not read_mode:
+        stream = BlockWriter(filename, mode)
+    elif filename.endswith('.gz') or filename.endswith('.bgz'):
+        # Other .bgz files, such as BGZF from bgzip, are read as gzip.
+        if read_mode and is_block_file(filename):
+            stream = BlockReader(filename)
+        else:
+            stream = gzip.GzipFile(filename, mode)
     elif filename == '-':
         if read_mode:
             stream = sys.stdin
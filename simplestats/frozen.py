@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+#
+#  frozen.py
+#  simplestats
+#
+
+"""
+Immutable, array-backed versions of frequency distributions for read-only
+serving.
+
+Their arrays can be moved into shared memory with share(), after which
+worker processes forked from this one, such as those of a
+multiprocessing.Pool created afterwards, read the counts in place rather
+than each receiving a copy. Pass the distribution to workers as a global
+or through the pool's initargs, since arguments to map() are pickled.
+
+Only the numeric arrays are shared. The samples, conditions and their
+index dictionaries stay ordinary Python objects, whose pages are copied
+into each worker as reference counts are touched, so share() saves
+little over plain fork when those dominate memory, as with many short
+rows or long sample strings.
+"""
+
+import ctypes
+
+from array import array
+from multiprocessing.sharedctypes import RawArray
+from bisect import bisect_left
+from itertools import izip
+from math import log
+from operator import itemgetter
+
+from freq import FreqDist, ConditionalFreqDist, UnknownSymbolError, \
+        _pack_array, _unpack_array
+
+
+def _share_arrays(obj):
+    "Moves each of the object's arrays into shared memory."
+    for name, typecode in obj._array_types:
+        values = getattr(obj, name)
+        if not isinstance(values, array):
+            continue
+        shared = RawArray(typecode, len(values))
+        if values:
+            ctypes.memmove(shared, values.buffer_info()[0],
+                           len(values) * values.itemsize)
+        setattr(obj, name, shared)
+
+
+def _get_array_state(obj):
+    """
+    Returns the object's state, with arrays packed into strings along with
+    their item size and byte order, so they load on any platform.
+    """
+    state = obj.__dict__.copy()
+    for name, typecode in obj._array_types:
+        values = state[name]
+        if not isinstance(values, array):
+            values = array(typecode, values)
+        state[name] = _pack_array(values)
+    return state
+
+
+def _set_array_state(obj, state):
+    obj.__dict__.update(state)
+    for name, typecode in obj._array_types:
+        setattr(obj, name, _unpack_array(state[name]))
+
+
+class FrozenFreqDist(object):
+    """
+    A read-only frequency distribution, with counts and log probabilities
+    precomputed into compact arrays.
+
+        >>> x = FreqDist()
+        >>> x.inc('a', 3)
+        >>> x.inc('b')
+        >>> y = x.freeze()
+        >>> y.prob('a')
+        0.75
+        >>> y.count('unknown')
+        0
+        >>> sorted(y.candidates()) == sorted(x.candidates())
+        True
+    """
+    _array_types = (('_counts', 'l'), ('_log_probs', 'd'))
+
+    def __init__(self, dist):
+        items = sorted(dist.iteritems(), key=itemgetter(1), reverse=True)
+        total = float(dist.total)
+
+        self._samples = tuple(k for (k, v) in items)
+        self._index = dict((k, i) for (i, k) in enumerate(self._samples))
+        self._counts = array('l', (v for (k, v) in items))
+        self._log_probs = array('d', (log(v / total) for (k, v) in items))
+        self._total = dist.total
+
+    def total():
+        doc = "The total count."  # noqa
+
+        def fget(self):
+            return self._total
+        return locals()
+    total = property(**total())
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __contains__(self, sample):
+        return sample in self._index
+
+    def __iter__(self):
+        return iter(self._samples)
+
+    def __getitem__(self, sample):
+        return self._counts[self._index[sample]]
+
+    def iterkeys(self):
+        return iter(self._samples)
+
+    def keys(self):
+        return list(self._samples)
+
+    def itervalues(self):
+        return iter(self._counts)
+
+    def iteritems(self):
+        return izip(self._samples, self._counts)
+
+    def items(self):
+        return list(self.iteritems())
+
+    #------------------------------------------------------------------------#
+
+    def count(self, sample):
+        """Return the frequency count of the sample."""
+        i = self._index.get(sample)
+        if i is None:
+            return 0
+        return self._counts[i]
+
+    def get(self, sample, default=None):
+        i = self._index.get(sample)
+        if i is None:
+            return default
+        return self._counts[i]
+
+    def prob(self, sample):
+        """Returns the MLE probability of this sample."""
+        i = self._index.get(sample)
+        if i is None:
+            return 0.0
+        return self._counts[i] / float(self._total)
+
+    def log_prob(self, sample):
+        """Returns the log MLE probability of this sample."""
+        i = self._index.get(sample)
+        if i is None:
+            raise ValueError("math domain error")
+        return self._log_probs[i]
+
+    def candidates(self):
+        """
+        Returns a list of (sample, log_prob) pairs, using the log MLE
+        probability of each sample.
+        """
+        return zip(self._samples, self._log_probs)
+
+    def thaw(self):
+        "Returns a mutable FreqDist with the same counts."
+        return FreqDist(self.iteritems())
+
+    def share(self):
+        """
+        Moves the counts into shared memory, for worker processes forked
+        afterwards to read without copying. The samples and their index are
+        not shared (see the module notes). Returns this distribution.
+        """
+        _share_arrays(self)
+        return self
+
+    def __getstate__(self):
+        return _get_array_state(self)
+
+    def __setstate__(self, state):
+        _set_array_state(self, state)
+
+
+#----------------------------------------------------------------------------#
+
+class FrozenConditionalFreqDist(object):
+    """
+    A read-only model for P(Sample|Condition), stored in compressed sparse
+    row form: each condition owns a contiguous run of (sample id, count)
+    entries, sorted by sample id, and its total count is precomputed.
+
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('Lunch', 'Sandwich', 3)
+        >>> x.inc('Lunch', 'Soup')
+        >>> x.inc('Dinner', 'Soup')
+        >>> y = x.freeze()
+        >>> y.prob('Lunch', 'Sandwich')
+        0.75
+        >>> y.invert().prob('Soup', 'Dinner')
+        0.5
+    """
+    _array_types = (('_offsets', 'l'), ('_sample_ids', 'l'),
+                    ('_counts', 'l'), ('_totals', 'l'))
+
+    def __init__(self, cfd=None):
+        self._conditions = ()
+        self._condition_index = {}
+        self._samples = ()
+        self._sample_index = {}
+        self._offsets = array('l', [0])
+        self._sample_ids = array('l')
+        self._counts = array('l')
+        self._totals = array('l')
+
+        if cfd is not None:
+            self._build(cfd)
+
+    def _build(self, cfd):
+        samples = []
+        sample_index = {}
+        offsets = self._offsets
+        sample_ids = self._sample_ids
+        counts = self._counts
+        totals = self._totals
+
+        conditions = []
+        for condition, condition_dist in cfd.iteritems():
+            row = []
+            for sample, count in condition_dist.iteritems():
+                sample_id = sample_index.get(sample)
+                if sample_id is None:
+                    sample_id = sample_index[sample] = len(samples)
+                    samples.append(sample)
+                row.append((sample_id, count))
+            row.sort()
+
+            conditions.append(condition)
+            sample_ids.extend(i for (i, c) in row)
+            counts.extend(c for (i, c) in row)
+            offsets.append(len(sample_ids))
+            totals.append(sum(c for (i, c) in row))
+
+        self._set_index(conditions, samples)
+
+    def _set_index(self, conditions, samples):
+        self._conditions = tuple(conditions)
+        self._condition_index = dict(
+            (c, i) for (i, c) in enumerate(self._conditions)
+        )
+        self._samples = tuple(samples)
+        self._sample_index = dict(
+            (s, i) for (i, s) in enumerate(self._samples)
+        )
+
+    #------------------------------------------------------------------------#
+
+    def __len__(self):
+        return len(self._conditions)
+
+    def __contains__(self, condition):
+        return condition in self._condition_index
+
+    def __iter__(self):
+        return iter(self._conditions)
+
+    def iterkeys(self):
+        return iter(self._conditions)
+
+    def keys(self):
+        return list(self._conditions)
+
+    def __getitem__(self, condition):
+        "Returns a FreqDist copy of the given condition's counts."
+        return FreqDist(self._iterrow(self._row(condition)))
+
+    def _row(self, condition):
+        row = self._condition_index.get(condition)
+        if row is None:
+            raise UnknownSymbolError(condition)
+        return row
+
+    def _iterrow(self, row):
+        "Returns an iterator over (sample, count) pairs in a row."
+        lo = self._offsets[row]
+        hi = self._offsets[row + 1]
+        samples = self._samples
+        return izip(
+            (samples[i] for i in self._sample_ids[lo:hi]),
+            self._counts[lo:hi],
+        )
+
+    def _count(self, row, sample):
+        sample_id = self._sample_index.get(sample)
+        if sample_id is None:
+            return 0
+
+        lo = self._offsets[row]
+        hi = self._offsets[row + 1]
+        i = bisect_left(self._sample_ids, sample_id, lo, hi)
+        if i < hi and self._sample_ids[i] == sample_id:
+            return self._counts[i]
+        return 0
+
+    #------------------------------------------------------------------------#
+
+    def count(self, condition, sample):
+        """
+        Returns the count of (sample|condition). An exception is raised for
+        unseen conditions.
+        """
+        return self._count(self._row(condition), sample)
+
+    def prob(self, condition, sample):
+        """
+        Returns P(sample | condition). An exception is raised for unseen
+        conditions.
+        """
+        row = self._row(condition)
+        c = self._count(row, sample)
+        if c > 0:
+            return c / float(self._totals[row])
+        else:
+            return 0.0
+
+    def log_prob(self, condition, sample):
+        """
+        Returns log(P(sample | condition)). An exception is raised for
+        unseen conditions.
+        """
+        row = self._row(condition)
+        return log(self._count(row, sample) / float(self._totals[row]))
+
+    def candidates(self, condition):
+        "Return candidates for the given condition."
+        row = self._condition_index.get(condition)
+        if row is None:
+            return []
+
+        total = float(self._totals[row])
+        return [(s, log(c / total)) for (s, c) in self._iterrow(row)]
+
+    def itercounts(self):
+        """
+        Returns an interator over all the counts in this model, presented
+        as a sequence of (condition, sample, count) tuples.
+        """
+        for row, condition in enumerate(self._conditions):
+            for sample, count in self._iterrow(row):
+                yield condition, sample, count
+
+    #------------------------------------------------------------------------#
+
+    def invert(self):
+        """
+        Returns a frozen P(condition|sample) model based off the same
+        counts as here, by transposing the count arrays.
+        """
+        n_samples = len(self._samples)
+        n_entries = len(self._sample_ids)
+
+        # Count the entries in each column to find the new row offsets.
+        starts = [0] * (n_samples + 1)
+        for sample_id in self._sample_ids:
+            starts[sample_id + 1] += 1
+        for i in xrange(n_samples):
+            starts[i + 1] += starts[i]
+
+        new_ids = array('l', [0]) * n_entries
+        new_counts = array('l', [0]) * n_entries
+        totals = [0] * n_samples
+        offsets = self._offsets
+        sample_ids = self._sample_ids
+        counts = self._counts
+
+        # Walking rows in order keeps each new row sorted by condition id.
+        next_slot = starts[:]
+        for row in xrange(len(self._conditions)):
+            for i in xrange(offsets[row], offsets[row + 1]):
+                sample_id = sample_ids[i]
+                slot = next_slot[sample_id]
+                next_slot[sample_id] = slot + 1
+                new_ids[slot] = row
+                new_counts[slot] = counts[i]
+                totals[sample_id] += counts[i]
+
+        inverse = FrozenConditionalFreqDist()
+        inverse._set_index(self._samples, self._conditions)
+        inverse._offsets = array('l', starts)
+        inverse._sample_ids = new_ids
+        inverse._counts = new_counts
+        inverse._totals = array('l', totals)
+        return inverse
+
+    def to_condition_dist(self):
+        """Generates a frequency distribution of conditions."""
+        return FreqDist(izip(self._conditions, self._totals))
+
+    def to_sample_dist(self):
+        """Generates a freqency distribution of samples."""
+        totals = [0] * len(self._samples)
+        for sample_id, count in izip(self._sample_ids, self._counts):
+            totals[sample_id] += count
+
+        return FreqDist(izip(self._samples, totals))
+
+    def thaw(self):
+        "Returns a mutable ConditionalFreqDist with the same counts."
+        cfd = ConditionalFreqDist()
+        for row, condition in enumerate(self._conditions):
+            cfd[condition] = FreqDist(self._iterrow(row))
+        return cfd
+
+    def share(self):
+        """
+        Moves the counts into shared memory, for worker processes forked
+        afterwards to read without copying. The conditions, samples and
+        their indexes are not shared (see the module notes). Returns this
+        model.
+        """
+        _share_arrays(self)
+        return self
+
+    def __getstate__(self):
+        return _get_array_state(self)
+
+    def __setstate__(self, state):
+        _set_array_state(self, state)
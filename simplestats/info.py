@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+#  info.py
+#  simplestats
+#
+
+"""
+Information-theoretic measures over frequency distributions. Each measure
+is computed directly from the counts in a single pass, using logs of the
+totals computed once, rather than calling prob() for every sample.
+
+Marginals are taken from to_condition_dist() and to_sample_dist(), which
+are cheap on a ConditionalFreqDist which tracks its marginals. Results are
+in nats unless a log base is given.
+"""
+
+from math import log, exp
+
+
+def _scale(value, base):
+    if base is None:
+        return value
+    return value / log(base)
+
+
+def _sum_c_log_c(counts):
+    return sum([c * log(c) for c in counts if c > 0])
+
+
+def entropy(dist, base=None):
+    """
+    Returns the entropy of a distribution.
+
+        >>> from freq import FreqDist
+        >>> entropy(FreqDist([('a', 1), ('b', 1)]), base=2)
+        1.0
+    """
+    total = float(dist.total)
+    if not total:
+        return 0.0
+
+    return _scale(log(total) - _sum_c_log_c(dist.itervalues()) / total,
+                  base)
+
+
+def perplexity(dist):
+    """
+    Returns the perplexity of a distribution.
+
+        >>> from freq import FreqDist
+        >>> round(perplexity(FreqDist([('a', 1), ('b', 1)])), 6)
+        2.0
+    """
+    return exp(entropy(dist))
+
+
+def cross_entropy(p_dist, q_dist, base=None):
+    """
+    Returns the cross entropy H(p, q), which is infinite if q gives zero
+    probability to any sample of p.
+    """
+    p_total = float(p_dist.total)
+    log_q_total = log(q_dist.total)
+    q_get = q_dist.get
+
+    value = 0.0
+    for sample, count in p_dist.iteritems():
+        if count <= 0:
+            continue
+        q_count = q_get(sample, 0)
+        if q_count <= 0:
+            return float('inf')
+        value -= count * (log(q_count) - log_q_total)
+
+    return _scale(value / p_total, base)
+
+
+def kl_divergence(p_dist, q_dist, base=None):
+    """
+    Returns the Kullback-Leibler divergence D(p || q), which is infinite if
+    q gives zero probability to any sample of p.
+
+        >>> from freq import FreqDist
+        >>> p = FreqDist([('a', 1), ('b', 1)])
+        >>> kl_divergence(p, p)
+        0.0
+    """
+    p_total = float(p_dist.total)
+    log_ratio = log(q_dist.total) - log(p_total)
+    q_get = q_dist.get
+
+    value = 0.0
+    for sample, count in p_dist.iteritems():
+        if count <= 0:
+            continue
+        q_count = q_get(sample, 0)
+        if q_count <= 0:
+            return float('inf')
+        value += count * (log(count / float(q_count)) + log_ratio)
+
+    return _scale(value / p_total, base)
+
+
+def js_divergence(p_dist, q_dist, base=None):
+    """
+    Returns the Jensen-Shannon divergence between two distributions, which
+    is symmetric and always finite.
+
+        >>> from freq import FreqDist
+        >>> js_divergence(FreqDist([('a', 1)]), FreqDist([('b', 1)]), base=2)
+        1.0
+    """
+    p_total = float(p_dist.total)
+    q_total = float(q_dist.total)
+    p_get = p_dist.get
+    q_get = q_dist.get
+
+    value = 0.0
+    for sample in set(p_dist.iterkeys()).union(q_dist.iterkeys()):
+        p = p_get(sample, 0) / p_total
+        q = q_get(sample, 0) / q_total
+        m = 0.5 * (p + q)
+        if p > 0:
+            value += p * log(p / m)
+        if q > 0:
+            value += q * log(q / m)
+
+    return _scale(0.5 * value, base)
+
+
+#----------------------------------------------------------------------------#
+
+def conditional_entropy(cfd, base=None):
+    """
+    Returns H(sample | condition) for a conditional distribution.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('a', 'x')
+        >>> x.inc('a', 'y')
+        >>> x.inc('b', 'x', 2)
+        >>> conditional_entropy(x, base=2)
+        0.5
+    """
+    condition_totals = cfd.to_condition_dist()
+    total = float(condition_totals.total)
+    if not total:
+        return 0.0
+
+    value = _sum_c_log_c(condition_totals.itervalues()) - \
+        _sum_c_log_c(c for (k, s, c) in cfd.itercounts())
+    return _scale(value / total, base)
+
+
+def mutual_information(cfd, base=None):
+    """
+    Returns the mutual information between conditions and samples.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('a', 'x')
+        >>> x.inc('b', 'y')
+        >>> mutual_information(x, base=2)
+        1.0
+    """
+    condition_totals = cfd.to_condition_dist()
+    sample_totals = cfd.to_sample_dist()
+    total = float(condition_totals.total)
+    if not total:
+        return 0.0
+
+    # I = sum n log(n N / (N_c N_s)) / N, with the marginal terms summed
+    # over the marginals rather than over every cell.
+    value = _sum_c_log_c(c for (k, s, c) in cfd.itercounts()) \
+        + total * log(total) \
+        - _sum_c_log_c(condition_totals.itervalues()) \
+        - _sum_c_log_c(sample_totals.itervalues())
+    return _scale(value / total, base)
+
+
+def pointwise_mutual_information(cfd, base=None):
+    """
+    Returns a dictionary mapping each seen (condition, sample) pair to its
+    pointwise mutual information, log(P(c, s) / (P(c) P(s))).
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('a', 'x')
+        >>> x.inc('b', 'y')
+        >>> pointwise_mutual_information(x, base=2)[('a', 'x')]
+        1.0
+    """
+    condition_totals = cfd.to_condition_dist()
+    sample_totals = cfd.to_sample_dist()
+    log_total = log(condition_totals.total)
+
+    log_conditions = dict(
+        (k, log(v)) for (k, v) in condition_totals.iteritems() if v > 0
+    )
+    log_samples = dict(
+        (k, log(v)) for (k, v) in sample_totals.iteritems() if v > 0
+    )
+
+    scale = 1.0 if base is None else 1.0 / log(base)
+    result = {}
+    for condition, sample, count in cfd.itercounts():
+        if count > 0:
+            result[condition, sample] = scale * (
+                log(count) + log_total - log_conditions[condition] -
+                log_samples[sample]
+            )
+
+    return result
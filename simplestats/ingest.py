@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+#  ingest.py
+#  simplestats
+#
+
+"""
+Feeding frequency distributions from many sources without blocking the
+code which produces the data.
+
+Items are put onto a bounded queue in batches, and counted by a single
+worker thread, which is the only writer to the distribution. When the
+worker falls behind the queue fills and producers block, which keeps
+memory bounded. Snapshots are ordered with respect to the batches before
+them, so a snapshot taken after feeding some data always includes it.
+"""
+
+import threading
+import Queue
+
+from freq import FreqDist, ConditionalFreqDist
+from sequences import groups_of_n_iter
+
+_default_batch_size = 1000
+_default_max_pending = 16
+
+# Tells the worker to stop.
+_stop = object()
+
+
+class PendingSnapshot(object):
+    """
+    The result of an ingestion snapshot, which becomes available once the
+    worker has counted every batch queued before it.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def _set(self, value=None, error=None):
+        self._value = value
+        self._error = error
+        self._event.set()
+
+    def ready(self):
+        "Returns True if the snapshot has been taken."
+        return self._event.isSet()
+
+    def wait(self, timeout=None):
+        "Waits for the snapshot, returning True if it has been taken."
+        # Event.wait() only returns the flag from Python 2.7.
+        self._event.wait(timeout)
+        return self._event.isSet()
+
+    def get(self, timeout=None):
+        """
+        Waits for and returns the snapshot. Raises RuntimeError on timeout,
+        or the worker's error if counting failed.
+        """
+        if not self.wait(timeout):
+            raise RuntimeError("timed out waiting for snapshot")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class Ingester(object):
+    """
+    Counts items from any number of sources into a FreqDist, or (condition,
+    sample) pairs into a ConditionalFreqDist, on a worker thread.
+
+        >>> ingester = Ingester()
+        >>> ingester.feed('abracadabra')
+        >>> ingester.snapshot().get()['a']
+        5
+        >>> ingester.add_source(iter('cab'))
+        >>> dist = ingester.close()
+        >>> dist['a'], dist.total
+        (6, 14)
+    """
+    def __init__(self, dist=None, batch_size=_default_batch_size,
+                 max_pending=_default_max_pending):
+        """
+        Counts into the given distribution, or a new FreqDist. At most
+        max_pending batches of batch_size items are queued at once.
+        """
+        if dist is None:
+            dist = FreqDist()
+        self.dist = dist
+        self.batch_size = batch_size
+        self._is_conditional = isinstance(dist, ConditionalFreqDist)
+
+        self._queue = Queue.Queue(max_pending)
+        self._sources = []
+        self._error = None
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    #------------------------------------------------------------------------#
+
+    def feed(self, items):
+        """
+        Queues the items for counting, in batches, blocking whenever the
+        queue is full.
+        """
+        self._check_open()
+        put = self._queue.put
+        for batch in groups_of_n_iter(self.batch_size, items):
+            put(batch)
+
+    def add_source(self, items):
+        """
+        Feeds the items from a producer thread of their own, so that a slow
+        or blocking source does not hold up the caller.
+        """
+        self._check_open()
+        thread = threading.Thread(target=self._feed_source, args=(items,))
+        thread.daemon = True
+        self._sources.append(thread)
+        thread.start()
+
+    def snapshot(self):
+        """
+        Returns a PendingSnapshot which will hold a copy of the distribution
+        once everything fed so far has been counted. Sources added with
+        add_source() may only be partly counted.
+        """
+        self._check_open()
+        pending = PendingSnapshot()
+        self._queue.put(pending)
+        return pending
+
+    def close(self):
+        """
+        Waits for every source to finish and every batch to be counted,
+        then stops the worker and returns the distribution.
+        """
+        if not self._closed:
+            for thread in self._sources:
+                thread.join()
+            self._closed = True
+            self._queue.put(_stop)
+            self._worker.join()
+
+        if self._error is not None:
+            raise self._error
+        return self.dist
+
+    #------------------------------------------------------------------------#
+
+    def _check_open(self):
+        if self._closed:
+            raise ValueError("ingester is closed")
+
+    def _feed_source(self, items):
+        try:
+            self.feed(items)
+        except Exception, e:
+            self._error = self._error or e
+
+    def _run(self):
+        get = self._queue.get
+        while True:
+            item = get()
+            if item is _stop:
+                break
+
+            if isinstance(item, PendingSnapshot):
+                if self._error is not None:
+                    item._set(error=self._error)
+                else:
+                    item._set(value=self._copy())
+                continue
+
+            if self._error is not None:
+                # Keep draining so that producers never block forever.
+                continue
+
+            try:
+                self._count(item)
+            except Exception, e:
+                self._error = e
+
+    def _count(self, batch):
+        dist = self.dist
+        if self._is_conditional:
+            for condition, sample in batch:
+                dist.inc(condition, sample)
+        else:
+            counts = {}
+            for sample in batch:
+                counts[sample] = counts.get(sample, 0) + 1
+            dist._inc_many(counts.keys(), counts.values())
+
+    def _copy(self):
+        if self._is_conditional:
+            cfd = ConditionalFreqDist()
+            for condition, condition_dist in self.dist.iteritems():
+                cfd[condition] = FreqDist(condition_dist.iteritems())
+            return cfd
+
+        return FreqDist(self.dist.iteritems())
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+#
+#  ngram.py
+#  simplestats
+#
+
+"""
+Fast n-gram counting. Tokens are mapped to integer ids, and the last N
+ids are kept packed into a single rolling integer, so that the n-gram of
+every order ending at a token is found by masking off its low bits. No
+tuple is built per window, and counts for every order 1..N are gathered
+in one pass.
+
+Counts can be turned into a standard ConditionalFreqDist, where each
+condition is the tuple of context tokens, or straight into the compact
+FrozenConditionalFreqDist.
+"""
+
+import gc
+import multiprocessing
+
+from array import array
+from contextlib import contextmanager
+
+from freq import FreqDist, ConditionalFreqDist
+from sequences import groups_of_n_iter
+
+_default_id_bits = 21
+_default_shard_size = 1000
+
+# The id of the padding before the start of each sequence.
+_pad_id = 0
+
+
+@contextmanager
+def _paused_gc():
+    """
+    Pauses the cyclic garbage collector, which otherwise rescans every
+    container built so far each time many new ones have been made.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class NgramCounter(object):
+    """
+    Counts the n-grams of every order up to the given one.
+
+        >>> counter = NgramCounter(2)
+        >>> counter.count('abab')
+        >>> counter.ngram_count(('a', 'b'))
+        2
+        >>> counter.to_cfd(2).prob(('a',), 'b')
+        1.0
+        >>> counter.to_cfd(1)[()].total
+        4
+
+    With pad set, n-grams overlapping the start of a sequence are counted,
+    with None standing in for the missing tokens.
+
+        >>> counter.ngram_count((None, 'a'))
+        1
+    """
+    def __init__(self, order=3, pad=True, id_bits=_default_id_bits):
+        """
+        Each token id takes id_bits bits of a packed key, so at most
+        2 ** id_bits - 1 distinct tokens may be counted; keep order *
+        id_bits under 64 for the fastest keys.
+        """
+        if order < 1:
+            raise ValueError("order must be at least 1")
+        self.order = order
+        self.pad = pad
+        self.id_bits = id_bits
+        self.tokens = [None]
+        self.token_ids = {None: _pad_id}
+        self._counts = [None] + [{} for n in xrange(order)]
+
+        self._id_mask = (1 << id_bits) - 1
+        self._masks = [(1 << (n * id_bits)) - 1 for n in xrange(order + 1)]
+
+    #------------------------------------------------------------------------#
+
+    def _ids(self, tokens):
+        "Maps each token to its id, adding new tokens to the vocabulary."
+        token_ids = self.token_ids
+        ids = []
+        append = ids.append
+        for token in tokens:
+            token_id = token_ids.get(token)
+            if token_id is None:
+                token_id = len(self.tokens)
+                if token_id > self._id_mask:
+                    raise ValueError("too many distinct tokens for id_bits")
+                token_ids[token] = token_id
+                self.tokens.append(token)
+            append(token_id)
+        return ids
+
+    def count(self, tokens):
+        "Counts every n-gram in a sequence of tokens."
+        ids = self._ids(tokens)
+        bits = self.id_bits
+        full_mask = self._masks[self.order]
+        orders = zip(self._masks[1:], self._counts[1:])
+
+        key = 0
+        for i, token_id in enumerate(ids):
+            key = ((key << bits) | token_id) & full_mask
+            if not self.pad and i + 1 < self.order:
+                counted = orders[:i + 1]
+            else:
+                counted = orders
+            for mask, counts in counted:
+                ngram = key & mask
+                counts[ngram] = counts.get(ngram, 0) + 1
+
+    def count_all(self, sequences):
+        "Counts the n-grams in each of many token sequences."
+        for tokens in sequences:
+            self.count(tokens)
+
+    #------------------------------------------------------------------------#
+
+    def _unpack(self, key, n):
+        "Returns the tuple of n token ids packed into a key."
+        bits = self.id_bits
+        id_mask = self._id_mask
+        ids = [0] * n
+        for i in xrange(n - 1, -1, -1):
+            ids[i] = key & id_mask
+            key >>= bits
+        return ids
+
+    def _pack(self, ids):
+        key = 0
+        bits = self.id_bits
+        for token_id in ids:
+            key = (key << bits) | token_id
+        return key
+
+    def _check_order(self, n):
+        if not 1 <= n <= self.order:
+            raise ValueError("no counts for order %d" % n)
+
+    def ngram_count(self, ngram):
+        "Returns the count of an n-gram, given as a tuple of tokens."
+        self._check_order(len(ngram))
+        token_ids = self.token_ids
+        try:
+            key = self._pack([token_ids[token] for token in ngram])
+        except KeyError:
+            return 0
+        return self._counts[len(ngram)].get(key, 0)
+
+    def total(self, n=1):
+        "Returns the total count of n-grams of the given order."
+        self._check_order(n)
+        return sum(self._counts[n].itervalues())
+
+    def iteritems(self, n):
+        "Iterates over (ngram, count) pairs of the given order."
+        self._check_order(n)
+        tokens = self.tokens
+        for key, count in self._counts[n].iteritems():
+            yield tuple([tokens[i] for i in self._unpack(key, n)]), count
+
+    #------------------------------------------------------------------------#
+
+    def to_cfd(self, n):
+        """
+        Returns a ConditionalFreqDist of the n-grams of the given order,
+        mapping each context tuple of n - 1 tokens to a distribution over
+        the following token.
+        """
+        self._check_order(n)
+        bits = self.id_bits
+        id_mask = self._id_mask
+        tokens = self.tokens
+
+        cfd = ConditionalFreqDist()
+        contexts = {}
+        with _paused_gc():
+            for key, count in self._counts[n].iteritems():
+                condition_dist = contexts.get(key >> bits)
+                if condition_dist is None:
+                    context = tuple([tokens[i] for i in
+                                     self._unpack(key >> bits, n - 1)])
+                    condition_dist = contexts[key >> bits] = \
+                        cfd[context] = FreqDist()
+                condition_dist[tokens[key & id_mask]] = count
+                condition_dist._total += count
+
+        return cfd
+
+    def freeze(self, n):
+        """
+        Returns the n-grams of the given order as a
+        FrozenConditionalFreqDist, built straight from the packed keys:
+        sorting them orders the entries by context, then token id.
+        """
+        from frozen import FrozenConditionalFreqDist
+        self._check_order(n)
+        bits = self.id_bits
+        id_mask = self._id_mask
+        tokens = self.tokens
+        counts = self._counts[n]
+
+        frozen = FrozenConditionalFreqDist()
+        keys = sorted(counts)
+        frozen._sample_ids = array('l', [key & id_mask for key in keys])
+        frozen._counts = array('l', [counts[key] for key in keys])
+
+        conditions = []
+        offsets = frozen._offsets
+        totals = frozen._totals
+        last_context = None
+        with _paused_gc():
+            for i, key in enumerate(keys):
+                context_key = key >> bits
+                if context_key != last_context:
+                    if conditions:
+                        offsets.append(i)
+                    conditions.append(tuple([
+                        tokens[j] for j in self._unpack(context_key, n - 1)
+                    ]))
+                    totals.append(0)
+                    last_context = context_key
+                totals[-1] += frozen._counts[i]
+            if conditions:
+                offsets.append(len(keys))
+
+            frozen._set_index(conditions, tokens)
+        return frozen
+
+    #------------------------------------------------------------------------#
+
+    def merge(self, rhs):
+        "Adds the counts of another counter, with the same settings."
+        if (rhs.order, rhs.pad, rhs.id_bits) != \
+                (self.order, self.pad, self.id_bits):
+            raise ValueError("can only merge counters with the same settings")
+
+        # Map the other counter's ids onto ours.
+        id_map = self._ids(rhs.tokens)
+        identity = (id_map == range(len(id_map)))
+
+        for n in xrange(1, self.order + 1):
+            counts = self._counts[n]
+            for key, count in rhs._counts[n].iteritems():
+                if not identity:
+                    key = self._pack([id_map[i] for i in
+                                      self._unpack(key, n)])
+                counts[key] = counts.get(key, 0) + count
+
+
+#----------------------------------------------------------------------------#
+
+def _count_shard(args):
+    documents, order, pad, id_bits = args
+    counter = NgramCounter(order, pad, id_bits)
+    counter.count_all(documents)
+    return counter
+
+
+def count_documents(documents, order=3, pad=True, id_bits=_default_id_bits,
+                    processes=None, shard_size=_default_shard_size):
+    """
+    Counts the n-grams in a sequence of documents, each a list of tokens,
+    splitting them into shards of shard_size documents which are counted
+    by a pool of worker processes, and merging the results.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    shards = ((shard, order, pad, id_bits)
+              for shard in groups_of_n_iter(shard_size, documents))
+
+    counter = NgramCounter(order, pad, id_bits)
+    if processes < 2:
+        for args in shards:
+            counter.merge(_count_shard(args))
+        return counter
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for shard_counter in pool.imap_unordered(_count_shard, shards):
+            counter.merge(shard_counter)
+    finally:
+        pool.terminate()
+
+    return counter
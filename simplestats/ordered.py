@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+#  ordered.py
+#  simplestats
+#
+
+"""
+Frequency distributions over ordered samples, which answer cumulative
+count, rank and quantile queries without sorting.
+"""
+
+from bisect import bisect_left, bisect_right
+from math import ceil
+
+from freq import FreqDist, _iter_text_blocks, _parse_columns
+
+
+class OrderedFreqDist(FreqDist):
+    """
+    A FreqDist over ordered samples, which keeps a Fenwick tree of counts
+    in sample order, so that cumulative counts, ranks and quantiles take
+    O(log n) time.
+
+    Incrementing a sample already seen updates the tree in O(log n). A new
+    sample, or an update which bypasses inc(), leaves the tree to be
+    rebuilt in O(n) at the next query; use for_range() when the samples
+    are integers in a known range to avoid this.
+
+        >>> x = OrderedFreqDist()
+        >>> for sample in [3, 1, 4, 1, 5, 9, 2, 6]:
+        ...     x.inc(sample)
+        >>> x.cumulative_count(3)
+        4
+        >>> x.cdf(4)
+        0.625
+        >>> x.quantile(0.5)
+        3
+        >>> x.select(0), x.rank(4)
+        (1, 4)
+    """
+    _tree_version = None
+
+    def __init__(self, pairSeq=None, key_type=None):
+        """
+        Can optionally be given a sequence of (sample, count) pairs to load
+        counts from. If key_type is given, samples read by load() are
+        converted with it, since dumps store every sample as a string.
+        """
+        FreqDist.__init__(self, pairSeq)
+        self.key_type = key_type
+        self._range = None
+        self._domain = []
+        self._index = {}
+        self._tree = [0]
+
+    @staticmethod
+    def for_range(lo, hi, pairSeq=None):
+        """
+        An alternative constructor for integer samples in range(lo, hi),
+        whose tree is sized up front and never needs rebuilding.
+        """
+        dist = OrderedFreqDist(pairSeq, key_type=int)
+        dist._range = (lo, hi)
+        dist._build_tree()
+        return dist
+
+    #------------------------------------------------------------------------#
+
+    def _position(self, sample):
+        "Returns the 1-based tree position of a sample, or None."
+        if self._range is not None:
+            lo, hi = self._range
+            if not (lo <= sample < hi) or sample != int(sample):
+                raise ValueError("sample %r is out of range" % (sample,))
+            return sample - lo + 1
+        return self._index.get(sample)
+
+    def _build_tree(self):
+        "Rebuilds the tree from the counts in O(n)."
+        if self._range is None:
+            self._domain = sorted(self.iterkeys())
+            self._index = dict((k, i + 1)
+                               for (i, k) in enumerate(self._domain))
+            tree = [0] + [self[k] for k in self._domain]
+        else:
+            lo, hi = self._range
+            tree = [0] * (hi - lo + 1)
+            for sample, count in self.iteritems():
+                tree[self._position(sample)] += count
+
+        n = len(tree) - 1
+        for i in xrange(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+
+        self._tree = tree
+        self._tree_version = self._version
+
+    def _update_tree(self, sample, n):
+        """
+        Adds n to the sample's position in the tree, if the tree was up to
+        date before the change just made to the counts.
+        """
+        if self._tree_version != self._version - 1:
+            return
+
+        i = self._position(sample)
+        if i is None:
+            return
+
+        tree = self._tree
+        size = len(tree)
+        while i < size:
+            tree[i] += n
+            i += i & -i
+        self._tree_version = self._version
+
+    def _fresh_tree(self):
+        if self._tree_version != self._version:
+            self._build_tree()
+        return self._tree
+
+    def _prefix(self, i):
+        "Returns the sum of the counts at positions 1..i."
+        tree = self._fresh_tree()
+        result = 0
+        while i > 0:
+            result += tree[i]
+            i -= i & -i
+        return result
+
+    #------------------------------------------------------------------------#
+
+    def inc(self, sample, n=1):
+        if self._range is not None:
+            self._position(sample)
+        FreqDist.inc(self, sample, n)
+        self._update_tree(sample, n)
+
+    def decrement(self, sample, n=1):
+        FreqDist.decrement(self, sample, n)
+        self._update_tree(sample, -n)
+
+    def remove_sample(self, sample):
+        """
+        Removes the sample and its count from the distribution. Returns
+        the count of the sample.
+        """
+        count = FreqDist.remove_sample(self, sample)
+        self._update_tree(sample, -count)
+        return count
+
+    def load(self, filename):
+        """
+        Loads counts from the given filename, converting samples with
+        key_type if set. Can be done for more than one file.
+        """
+        for text in _iter_text_blocks(filename):
+            keys, counts = _parse_columns(text, 2)
+            if self.key_type is not None:
+                keys = map(self.key_type, keys)
+            self._inc_many(keys, counts)
+
+    #------------------------------------------------------------------------#
+
+    def _positions_upto(self, x, inclusive):
+        "Returns the number of tree positions holding samples up to x."
+        if self._range is not None:
+            lo, hi = self._range
+            if inclusive:
+                x = int(x // 1) + 1
+            else:
+                x = int(-(-x // 1))
+            return min(max(x - lo, 0), hi - lo)
+
+        self._fresh_tree()
+        if inclusive:
+            return bisect_right(self._domain, x)
+        return bisect_left(self._domain, x)
+
+    def cumulative_count(self, x):
+        "Returns the total count of samples less than or equal to x."
+        return self._prefix(self._positions_upto(x, True))
+
+    def cdf(self, x):
+        "Returns the probability of a sample less than or equal to x."
+        if not self._total:
+            return 0.0
+        return self.cumulative_count(x) / float(self._total)
+
+    def rank(self, x):
+        "Returns the total count of samples strictly less than x."
+        return self._prefix(self._positions_upto(x, False))
+
+    def select(self, k):
+        """
+        Returns the sample at 0-based position k, were every counted
+        sample laid out in sorted order.
+        """
+        if not 0 <= k < self._total:
+            raise IndexError("position out of range")
+
+        tree = self._fresh_tree()
+        n = len(tree) - 1
+        step = 1
+        while step * 2 <= n:
+            step *= 2
+
+        # Walk down the tree for the last position with prefix sum <= k.
+        i = 0
+        while step:
+            j = i + step
+            if j <= n and tree[j] <= k:
+                i = j
+                k -= tree[j]
+            step //= 2
+
+        if self._range is not None:
+            return self._range[0] + i
+        return self._domain[i]
+
+    def quantile(self, q):
+        """
+        Returns the smallest sample x for which cdf(x) >= q, for q in
+        (0, 1]; a q of 0 gives the smallest sample.
+        """
+        if not 0.0 <= q <= 1.0:
+            raise ValueError("quantile must be between 0 and 1")
+        k = int(ceil(q * self._total)) - 1
+        return self.select(min(max(k, 0), self._total - 1))
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+#  pairwise.py
+#  simplestats
+#
+
+"""
+Applying a function to every unique pair of items, in parallel.
+
+The pair space is tiled into square blocks of block_size by block_size
+items, which are evaluated one at a time, so that each worker touches only
+two short runs of items at once. Workers are forked with the items and
+function already in memory, so only block coordinates and results cross
+between processes, and the items and function need not be picklable.
+
+Unlike comb.iunique_pairs(), items are paired in their given order, and
+pairs are identified by their indices.
+"""
+
+import multiprocessing
+
+from collections import deque
+
+_default_block_size = 256
+
+# Blocks queued or running per worker, bounding the results held at once.
+_blocks_per_worker = 2
+
+# Set in each worker process before any blocks are run; never in the
+# process calling pairwise_map().
+_items = None
+_function = None
+_vectorized = False
+_reducer = None
+_initial = None
+
+
+def _init_worker(items, function, vectorized, reducer, initial):
+    global _items, _function, _vectorized, _reducer, _initial
+    _items = items
+    _function = function
+    _vectorized = vectorized
+    _reducer = reducer
+    _initial = initial
+
+
+def _iter_block(block, items, f, vectorized):
+    "Iterates over (i, j, value) for the pairs in a block."
+    row_start, row_stop, col_start, col_stop = block
+    diagonal = (row_start == col_start)
+
+    if vectorized:
+        values = f(items[row_start:row_stop], items[col_start:col_stop])
+        for r, row in enumerate(values):
+            i = row_start + r
+            if diagonal:
+                row = row[r + 1:]
+                first = i + 1
+            else:
+                first = col_start
+            for c, value in enumerate(row):
+                yield i, first + c, value
+        return
+
+    for i in xrange(row_start, row_stop):
+        a = items[i]
+        first = i + 1 if diagonal else col_start
+        for j in xrange(first, col_stop):
+            yield i, j, f(a, items[j])
+
+
+def _run_block(block, items, f, vectorized, reducer, initial):
+    "Evaluates a block, returning its results or their reduction."
+    pairs = _iter_block(block, items, f, vectorized)
+    if reducer is None:
+        return list(pairs)
+
+    result = initial
+    for i, j, value in pairs:
+        result = reducer(result, value)
+    return result
+
+
+def _run_worker_block(block):
+    "Evaluates a block in a worker, with the state it was forked with."
+    return _run_block(block, _items, _function, _vectorized, _reducer,
+                      _initial)
+
+
+def _iter_blocks(n, block_size):
+    "Tiles the upper triangle of an n by n pair space into blocks."
+    for row_start in xrange(0, n, block_size):
+        row_stop = min(row_start + block_size, n)
+        for col_start in xrange(row_start, n, block_size):
+            yield (row_start, row_stop, col_start,
+                   min(col_start + block_size, n))
+
+
+def _map_blocks(items, f, workers, block_size, vectorized, reducer, initial):
+    "Yields the result of each block, in order."
+    args = (items, f, vectorized, reducer, initial)
+    blocks = _iter_blocks(len(items), block_size)
+    if workers < 2:
+        # Run in this process, without touching the workers' globals, so
+        # that several maps may be under way at once.
+        for block in blocks:
+            yield _run_block(block, *args)
+        return
+
+    # Only a few blocks are in flight at a time, so that a slow consumer
+    # holds back the workers rather than letting results pile up.
+    pool = multiprocessing.Pool(workers, _init_worker, args)
+    try:
+        pending = deque()
+        for block in blocks:
+            if len(pending) >= workers * _blocks_per_worker:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(_run_worker_block, (block,)))
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        # Not terminate(), which can deadlock on workers idle in get(); at
+        # most a few blocks remain, which are left to finish.
+        pool.close()
+        pool.join()
+
+
+def _iter_pairs(block_results):
+    for results in block_results:
+        for result in results:
+            yield result
+
+
+def pairwise_map(f, items, workers=None, block_size=_default_block_size,
+                 vectorized=False, reduce=None, initial=None):
+    """
+    Applies f(items[i], items[j]) to every pair with i < j, across a pool
+    of worker processes.
+
+    By default, returns an iterator which streams out (i, j, value)
+    triples, a block at a time and in block order, without holding every
+    result at once. Workers run only a few blocks ahead of the consumer,
+    and closing the iterator early waits for those blocks to finish. If
+    vectorized is set, f is called once per block
+    with two runs of items, and must return a list of rows of values,
+    one row per item of the first run and one value per item of the
+    second.
+
+    If reduce is given, returns the reduction of every value instead,
+    reducing within each block and then across blocks, starting each time
+    from initial. The reduction must therefore be associative, with
+    initial as its identity (or None, in which case reduce is called with
+    None first).
+
+        >>> sorted(pairwise_map(lambda a, b: a * b, [1, 2, 3], workers=1))
+        [(0, 1, 2), (0, 2, 3), (1, 2, 6)]
+        >>> from operator import add
+        >>> pairwise_map(lambda a, b: a * b, [1, 2, 3], reduce=add,
+        ...              initial=0, block_size=2, workers=2)
+        11
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be positive")
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if not hasattr(items, '__getitem__'):
+        items = list(items)
+
+    block_results = _map_blocks(items, f, workers, block_size, vectorized,
+                                reduce, initial)
+    if reduce is None:
+        return _iter_pairs(block_results)
+
+    result = initial
+    for block_result in block_results:
+        result = reduce(result, block_result)
+    return result
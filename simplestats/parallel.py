@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+#  parallel.py
+#  simplestats
+#
+
+"""
+Building large conditional frequency distributions with many processes.
+
+Events are partitioned by condition, so that each worker process owns a
+disjoint set of conditions. The workers' models never overlap, and are
+combined without merging any counts, or written straight out as the
+shards of an on-disk store (see the store module).
+"""
+
+import os
+import multiprocessing
+
+from freq import FreqDist, ConditionalFreqDist
+from store import shard_for, shard_name, write_shard, write_index
+
+_default_batch_size = 10000
+
+# Batches queued per worker before the reader blocks.
+_max_pending = 8
+
+
+def _count_batches(batches):
+    """
+    Counts batches of (condition, sample) pairs, counting each distinct
+    pair once in a flat dictionary before building the model.
+    """
+    pair_counts = {}
+    get = pair_counts.get
+    for batch in batches:
+        for pair in batch:
+            pair_counts[pair] = get(pair, 0) + 1
+
+    cfd = ConditionalFreqDist()
+    for (condition, sample), count in pair_counts.iteritems():
+        condition_dist = cfd.get(condition)
+        if condition_dist is None:
+            condition_dist = cfd[condition] = FreqDist()
+        condition_dist[sample] = count
+        condition_dist._total += count
+
+    return cfd
+
+
+def _split_shards(cfd, n_shards, shards):
+    "Splits a model into a ConditionalFreqDist for each of the shards."
+    parts = dict((shard, ConditionalFreqDist()) for shard in shards)
+    for condition, condition_dist in cfd.iteritems():
+        dict.__setitem__(parts[shard_for(condition, n_shards)], condition,
+                         condition_dist)
+    return parts
+
+
+def _build_partition(batches, dirname, n_shards, shards, extension):
+    """
+    Counts one partition's events, returning its model, or if dirname is
+    given, writing its shards there and returning their index entries.
+    """
+    cfd = _count_batches(batches)
+    if dirname is None:
+        return cfd
+
+    entries = {}
+    for shard, part in _split_shards(cfd, n_shards, shards).iteritems():
+        filename = os.path.join(dirname, shard_name(shard, extension))
+        entries[shard] = write_shard(part, filename)
+    return entries
+
+
+def _iter_queue(queue):
+    for batch in iter(queue.get, None):
+        yield batch
+
+
+def _worker(worker, queue, results, dirname, n_shards, shards, extension):
+    try:
+        results.put((worker, _build_partition(_iter_queue(queue), dirname,
+                                               n_shards, shards, extension)))
+    except Exception, e:
+        results.put((worker, e))
+        # Keep draining, so that the reader never blocks on us.
+        for batch in _iter_queue(queue):
+            pass
+
+
+def build_cfd(events, processes=None, batch_size=_default_batch_size,
+              dirname=None, n_shards=None, extension=''):
+    """
+    Builds a ConditionalFreqDist from an iterable of (condition, sample)
+    events, counted by a pool of worker processes which each own the
+    conditions hashed to them.
+
+    If dirname is given, the model is instead written there as a sharded
+    store, split into n_shards shards (by default, 16), each written by the
+    worker which owns its conditions; the store can then be opened with
+    store.ShardedConditionalFreqDist. Nothing is returned in that case.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(processes, 1)
+    if dirname is not None:
+        if n_shards is None:
+            n_shards = 16
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+    else:
+        n_shards = processes
+
+    shards_of = [range(i, n_shards, processes) for i in xrange(processes)]
+    if processes == 1:
+        result = _build_partition([events], dirname, n_shards, shards_of[0],
+                                  extension)
+        return _assemble([result], dirname, n_shards, extension)
+
+    queues = [multiprocessing.Queue(_max_pending) for i in xrange(processes)]
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_worker, args=(
+            i, queues[i], results, dirname, n_shards, shards_of[i],
+            extension,
+        ))
+        for i in xrange(processes)
+    ]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    try:
+        _partition(events, queues, processes, n_shards, batch_size)
+
+        # Results must be read before joining, lest large ones block their
+        # workers on a full pipe.
+        partials = [None] * processes
+        for j in xrange(processes):
+            i, result = results.get()
+            if isinstance(result, Exception):
+                raise result
+            partials[i] = result
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+    return _assemble(partials, dirname, n_shards, extension)
+
+
+def _partition(events, queues, processes, n_shards, batch_size):
+    "Sends each event to the worker owning its condition, in batches."
+    owners = {}
+    buffers = [[] for i in xrange(processes)]
+    for event in events:
+        condition = event[0]
+        owner = owners.get(condition)
+        if owner is None:
+            owner = owners[condition] = \
+                shard_for(condition, n_shards) % processes
+
+        buffer = buffers[owner]
+        buffer.append(event)
+        if len(buffer) >= batch_size:
+            queues[owner].put(buffer)
+            buffers[owner] = []
+
+    for owner, buffer in enumerate(buffers):
+        if buffer:
+            queues[owner].put(buffer)
+        queues[owner].put(None)
+
+
+def _assemble(partials, dirname, n_shards, extension):
+    if dirname is None:
+        # Each partial holds different conditions, so no counts are merged.
+        cfd = ConditionalFreqDist()
+        for partial in partials:
+            dict.update(cfd, partial)
+        return cfd
+
+    entries = [None] * n_shards
+    for partial in partials:
+        for shard, shard_entries in partial.iteritems():
+            entries[shard] = shard_entries
+    names = [shard_name(i, extension) for i in xrange(n_shards)]
+    write_index(dirname, names, entries)
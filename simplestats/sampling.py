@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+#  sampling.py
+#  simplestats
+#
+
+"Drawing samples from discrete distributions in constant time."
+
+import random
+
+from array import array
+
+
+class AliasTable(object):
+    """
+    A table for drawing items in proportion to their weights, using Vose's
+    alias method. Building the table takes linear time, after which each
+    draw takes constant time and a single random number.
+
+        >>> table = AliasTable(['a', 'b'], [3, 1])
+        >>> rng = random.Random(1)
+        >>> draws = table.draws(10000, rng)
+        >>> 0.7 < draws.count('a') / 10000.0 < 0.8
+        True
+    """
+    def __init__(self, items, weights):
+        items = list(items)
+        weights = list(weights)
+        n = len(items)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("need at least one item with positive weight")
+        if n != len(weights):
+            raise ValueError("need one weight per item")
+
+        scaled = [w * n / total for w in weights]
+        probs = array('d', [1.0]) * n
+        aliases = array('l', xrange(n))
+
+        small = [i for (i, p) in enumerate(scaled) if p < 1.0]
+        large = [i for (i, p) in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            probs[s] = scaled[s]
+            aliases[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Anything left over is within rounding error of a full column.
+        self.items = items
+        self._probs = probs
+        self._aliases = aliases
+
+    def __len__(self):
+        return len(self.items)
+
+    def draw(self, rng=random):
+        "Draws a single item, using rng as the source of randomness."
+        n = len(self.items)
+        u = rng.random() * n
+        i = int(u)
+        if u - i < self._probs[i]:
+            return self.items[i]
+        return self.items[self._aliases[i]]
+
+    def draws(self, k, rng=random):
+        "Draws a list of k items, independently and with replacement."
+        items = self.items
+        probs = self._probs
+        aliases = self._aliases
+        n = len(items)
+        uniform = rng.random
+
+        result = []
+        append = result.append
+        for u in [uniform() * n for j in xrange(k)]:
+            i = int(u)
+            if u - i < probs[i]:
+                append(items[i])
+            else:
+                append(items[aliases[i]])
+
+        return result
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+#
+#  significance.py
+#  simplestats
+#
+
+"""
+Significance tests: chi-square and G tests of independence over the
+contingency table of a ConditionalFreqDist, and permutation tests for
+comparing two samples.
+"""
+
+import random
+import multiprocessing
+
+from math import exp, log, pi, sin, sqrt
+
+from basic import mean
+from errors import InsufficientData
+
+_default_batch_size = 1000
+
+# How sure we must be that a p-value lies on one side of alpha before
+# stopping early, as a number of standard errors.
+_stopping_z = 3.29
+
+_max_iterations = 1000
+_epsilon = 1e-15
+
+_lanczos_g = 7
+_lanczos_coefficients = (
+    0.99999999999980993, 676.5203681218851, -1259.1392167224028,
+    771.32342877765313, -176.61502916214059, 12.507343278686905,
+    -0.13857109526572012, 9.9843695780195716e-6, 1.5056327351493116e-7,
+)
+
+
+def _lanczos_lgamma(x):
+    "The log of the absolute gamma function, by the Lanczos approximation."
+    if x < 0.5:
+        # By the reflection formula.
+        return log(pi / abs(sin(pi * x))) - _lanczos_lgamma(1.0 - x)
+
+    x -= 1.0
+    total = _lanczos_coefficients[0]
+    for i, c in enumerate(_lanczos_coefficients[1:]):
+        total += c / (x + i + 1)
+    t = x + _lanczos_g + 0.5
+    return 0.5 * log(2 * pi) + (x + 0.5) * log(t) - t + log(total)
+
+
+try:
+    from math import lgamma
+except ImportError:
+    # Python 2.6
+    lgamma = _lanczos_lgamma
+
+
+def _lower_gamma_series(a, x):
+    "The regularized lower incomplete gamma function, by its series."
+    term = total = 1.0 / a
+    n = a
+    for i in xrange(_max_iterations):
+        n += 1
+        term *= x / n
+        total += term
+        if abs(term) < abs(total) * _epsilon:
+            break
+    return total * exp(-x + a * log(x) - lgamma(a))
+
+
+def _upper_gamma_fraction(a, x):
+    "The regularized upper incomplete gamma function, by continued fraction."
+    tiny = 1e-300
+    b = x + 1.0 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for i in xrange(1, _max_iterations):
+        an = -i * (i - a)
+        b += 2.0
+        d = an * d + b
+        if abs(d) < tiny:
+            d = tiny
+        c = b + an / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < _epsilon:
+            break
+    return exp(-x + a * log(x) - lgamma(a)) * h
+
+
+def chi2_sf(x, df):
+    """
+    Returns the survival function of the chi-square distribution: the
+    probability of a value of at least x with df degrees of freedom.
+
+        >>> round(chi2_sf(3.841459, 1), 6)
+        0.05
+    """
+    if df <= 0:
+        raise ValueError("need positive degrees of freedom")
+    if x <= 0:
+        return 1.0
+
+    a = df / 2.0
+    x = x / 2.0
+    if x < a + 1.0:
+        return 1.0 - _lower_gamma_series(a, x)
+    return _upper_gamma_fraction(a, x)
+
+
+#----------------------------------------------------------------------------#
+
+def _contingency(cfd):
+    """
+    Returns the marginals of a model's contingency table, the grand total
+    and its degrees of freedom.
+    """
+    condition_totals = cfd.to_condition_dist()
+    sample_totals = cfd.to_sample_dist()
+    n = float(condition_totals.total)
+    rows = len([c for c in condition_totals.itervalues() if c > 0])
+    columns = len([c for c in sample_totals.itervalues() if c > 0])
+    if rows < 2 or columns < 2:
+        raise InsufficientData
+
+    return condition_totals, sample_totals, n, (rows - 1) * (columns - 1)
+
+
+def chi_square_test(cfd):
+    """
+    Tests the independence of conditions and samples with Pearson's
+    chi-square test, returning (statistic, degrees of freedom, p-value).
+    Only cells with counts are visited, since the statistic equals the
+    sum of O^2 / E over them, less the grand total.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('a', 'x', 10)
+        >>> x.inc('b', 'y', 10)
+        >>> statistic, df, p = chi_square_test(x)
+        >>> statistic, df, p < 0.001
+        (20.0, 1, True)
+    """
+    condition_totals, sample_totals, n, df = _contingency(cfd)
+
+    total = 0.0
+    for condition, condition_dist in cfd.iteritems():
+        r = condition_totals[condition]
+        for sample, o in condition_dist.iteritems():
+            if o > 0:
+                total += o * o / float(r * sample_totals[sample])
+
+    statistic = max(n * total - n, 0.0)
+    return statistic, df, chi2_sf(statistic, df)
+
+
+def g_test(cfd):
+    """
+    Tests the independence of conditions and samples with the G test
+    (log-likelihood ratio), returning (statistic, degrees of freedom,
+    p-value).
+    """
+    condition_totals, sample_totals, n, df = _contingency(cfd)
+
+    total = 0.0
+    for condition, condition_dist in cfd.iteritems():
+        r = condition_totals[condition]
+        for sample, o in condition_dist.iteritems():
+            if o > 0:
+                total += o * log(o * n / (r * sample_totals[sample]))
+
+    statistic = max(2.0 * total, 0.0)
+    return statistic, df, chi2_sf(statistic, df)
+
+
+#----------------------------------------------------------------------------#
+
+def _batch_seed(seed, batch):
+    "Returns a seed for each batch, so results don't depend on scheduling."
+    return seed * 1000003 + batch
+
+
+def _is_extreme(difference, observed, alternative):
+    tolerance = 1e-12 * max(abs(observed), 1.0)
+    if alternative == 'greater':
+        return difference >= observed - tolerance
+    elif alternative == 'less':
+        return difference <= observed + tolerance
+    return abs(difference) >= abs(observed) - tolerance
+
+
+def _run_batch(args):
+    """
+    Runs a batch of permutations, returning how many gave a difference at
+    least as extreme as the observed one.
+    """
+    pooled, n_a, statistic, observed, alternative, seed, size = args
+    rng = random.Random(seed)
+    n_b = len(pooled) - n_a
+    extreme = 0
+
+    if statistic is mean:
+        # Only the sum of the smaller group need be drawn, in O(n) or
+        # better, rather than shuffling everything.
+        grand_total = float(sum(pooled))
+        smaller = min(n_a, n_b)
+        sample = rng.sample
+        for i in xrange(size):
+            drawn = float(sum(sample(pooled, smaller)))
+            if smaller == n_a:
+                sum_a = drawn
+            else:
+                sum_a = grand_total - drawn
+            difference = sum_a / n_a - (grand_total - sum_a) / n_b
+            if _is_extreme(difference, observed, alternative):
+                extreme += 1
+        return extreme
+
+    pooled = list(pooled)
+    shuffle = rng.shuffle
+    for i in xrange(size):
+        shuffle(pooled)
+        difference = statistic(pooled[:n_a]) - statistic(pooled[n_a:])
+        if _is_extreme(difference, observed, alternative):
+            extreme += 1
+    return extreme
+
+
+def _is_resolved(extreme, n, alpha):
+    "Returns True if the p-value is confidently on one side of alpha."
+    p = (extreme + 1.0) / (n + 1.0)
+    error = _stopping_z * sqrt(p * (1.0 - p) / n)
+    return p + error < alpha or p - error > alpha
+
+
+def permutation_test(a, b, statistic=mean, n_permutations=10000,
+                     alternative='two-sided', seed=None, processes=1,
+                     batch_size=_default_batch_size, alpha=0.05,
+                     early_stopping=True):
+    """
+    Tests whether two samples differ in the given statistic (such as mean
+    or stddev from the basic module), by comparing the observed
+    difference statistic(a) - statistic(b) against its value over random
+    relabellings of the pooled samples. The alternative may be
+    'two-sided', 'greater' or 'less'.
+
+    Permutations are run in batches, each seeded from seed and its batch
+    number, across a pool of processes if processes > 1, so results are
+    reproducible whatever the number of processes. With early_stopping,
+    batches stop once the p-value is confidently above or below alpha.
+
+    Returns (observed difference, p-value, permutations run).
+
+        >>> a = [12, 14, 15, 16, 18]
+        >>> b = [1, 2, 3, 4, 5]
+        >>> difference, p, n = permutation_test(a, b, seed=1)
+        >>> difference, p < 0.05
+        (12.0, True)
+    """
+    if alternative not in ('two-sided', 'greater', 'less'):
+        raise ValueError("unknown alternative: %r" % (alternative,))
+    a = list(a)
+    b = list(b)
+    if not a or not b:
+        raise InsufficientData
+
+    if seed is None:
+        seed = random.getrandbits(32)
+    observed = statistic(a) - statistic(b)
+    pooled = a + b
+
+    n_batches = (n_permutations + batch_size - 1) // batch_size
+    batches = (
+        (pooled, len(a), statistic, observed, alternative,
+         _batch_seed(seed, i),
+         min(batch_size, n_permutations - i * batch_size))
+        for i in xrange(n_batches)
+    )
+
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_run_batch, batches)
+    else:
+        results = (_run_batch(args) for args in batches)
+
+    extreme = 0
+    n = 0
+    try:
+        # Batches are tallied in order, so stopping is reproducible too.
+        for i, batch_extreme in enumerate(results):
+            extreme += batch_extreme
+            n += min(batch_size, n_permutations - i * batch_size)
+            if early_stopping and _is_resolved(extreme, n, alpha):
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return observed, (extreme + 1.0) / (n + 1.0), n
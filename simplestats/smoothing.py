@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+#  smoothing.py
+#  simplestats
+#
+
+"""
+Smoothed probability estimates, provided as lightweight views over an
+existing FreqDist or ConditionalFreqDist. Views never copy or modify the
+counts they are built on, so switching between smoothing schemes is cheap.
+"""
+
+from math import log
+
+from freq import UnknownSymbolError
+
+
+class SmoothedView(object):
+    """
+    The base class for smoothed views over a frequency distribution.
+    Subclasses provide prob(); any statistics they need are computed on
+    demand and cached until the underlying distribution changes.
+    """
+    def __init__(self, dist):
+        self.dist = dist
+        self._stats_version = None
+        self._stats = None
+
+    def total():
+        doc = "The total count of the underlying distribution."  # noqa
+
+        def fget(self):
+            return self.dist.total
+        return locals()
+    total = property(**total())
+
+    def count(self, sample):
+        """Return the unsmoothed frequency count of the sample."""
+        return self.dist.count(sample)
+
+    def prob(self, sample):
+        raise NotImplementedError
+
+    def log_prob(self, sample):
+        """Returns the log of the smoothed probability of this sample."""
+        return log(self.prob(sample))
+
+    def stats(self):
+        """
+        Returns the statistics this view needs, recomputing them only if
+        the distribution has been updated since they were last used.
+        """
+        version = self.dist._version
+        if self._stats_version != version:
+            self._stats = self._compute_stats()
+            self._stats_version = version
+        return self._stats
+
+    def _compute_stats(self):
+        return None
+
+
+class LidstoneView(SmoothedView):
+    """
+    Lidstone smoothing, which adds gamma to every count. By default bins is
+    one more than the number of seen samples, so that all unseen samples
+    share a single bin.
+
+        >>> from freq import FreqDist
+        >>> x = FreqDist([('a', 3), ('b', 1)])
+        >>> LidstoneView(x, 0.5, bins=8).prob('a')
+        0.4375
+        >>> LidstoneView(x, 0.5, bins=8).prob('unknown')
+        0.0625
+        >>> x.prob('unknown')
+        0.0
+    """
+    def __init__(self, dist, gamma, bins=None):
+        SmoothedView.__init__(self, dist)
+        self.gamma = gamma
+        self.bins = bins
+
+    def prob(self, sample):
+        bins = self.bins
+        if bins is None:
+            bins = len(self.dist) + 1
+
+        return (self.dist.get(sample, 0) + self.gamma) / \
+            float(self.dist.total + self.gamma * bins)
+
+
+class LaplaceView(LidstoneView):
+    """
+    Laplace, or add-one, smoothing.
+
+        >>> from freq import FreqDist
+        >>> LaplaceView(FreqDist([('a', 3), ('b', 1)])).prob('b')
+        0.2857142857142857
+    """
+    def __init__(self, dist, bins=None):
+        LidstoneView.__init__(self, dist, 1, bins)
+
+
+class GoodTuringView(SmoothedView):
+    """
+    Good-Turing smoothing. Counts below max_count are discounted to
+    (r + 1) N[r + 1] / N[r], where N[r] is the number of samples seen r
+    times, and the mass freed, N[1] / total, is shared between unseen
+    samples. If bins is given, it is split evenly over the bins not yet
+    seen, otherwise unseen samples are treated as a single bin.
+
+        >>> from freq import FreqDist
+        >>> x = FreqDist([('a', 1), ('b', 1), ('c', 2), ('d', 4)])
+        >>> round(GoodTuringView(x).prob('unknown'), 3)
+        0.25
+        >>> GoodTuringView(x).prob('a') < x.prob('a')
+        True
+    """
+    def __init__(self, dist, bins=None, max_count=5):
+        SmoothedView.__init__(self, dist)
+        self.bins = bins
+        self.max_count = max_count
+
+    def _compute_stats(self):
+        count_of_counts = {}
+        for count in self.dist.itervalues():
+            count_of_counts[count] = count_of_counts.get(count, 0) + 1
+
+        adjusted = {}
+        adjusted_total = 0.0
+        for r, n_r in count_of_counts.iteritems():
+            n_next = count_of_counts.get(r + 1, 0)
+            if r < self.max_count and n_next > 0:
+                r_star = (r + 1) * n_next / float(n_r)
+            else:
+                r_star = float(r)
+            adjusted[r] = r_star
+            adjusted_total += r_star * n_r
+
+        total = float(self.dist.total)
+        unseen_mass = count_of_counts.get(1, 0) / total if total else 0.0
+
+        if self.bins is None:
+            unseen_prob = unseen_mass
+        else:
+            n_unseen = self.bins - len(self.dist)
+            unseen_prob = unseen_mass / n_unseen if n_unseen > 0 else 0.0
+
+        seen_scale = (1.0 - unseen_mass) / adjusted_total \
+            if adjusted_total else 0.0
+
+        return adjusted, seen_scale, unseen_prob
+
+    def prob(self, sample):
+        adjusted, seen_scale, unseen_prob = self.stats()
+        count = self.dist.get(sample, 0)
+        if count > 0:
+            return adjusted[count] * seen_scale
+        return unseen_prob
+
+
+class MinimumCountView(SmoothedView):
+    """
+    Gives unseen samples the probability of the least frequent seen
+    sample, as DefaultFreqDist does, without copying the distribution.
+
+        >>> from freq import FreqDist
+        >>> MinimumCountView(FreqDist([('a', 3), ('b', 1)])).prob('c')
+        0.25
+    """
+    def _compute_stats(self):
+        return min(v for v in self.dist.itervalues() if v > 0)
+
+    def count(self, sample):
+        count = self.dist.get(sample, 0)
+        if count > 0:
+            return count
+        return self.stats()
+
+    def prob(self, sample):
+        return self.count(sample) / float(self.dist.total)
+
+
+#----------------------------------------------------------------------------#
+
+class ConditionalView(object):
+    """
+    Applies a smoothed view to each condition of a ConditionalFreqDist,
+    creating the per-condition views lazily.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('Lunch', 'Sandwich', 3)
+        >>> y = ConditionalView(x, LidstoneView, gamma=1)
+        >>> y.prob('Lunch', 'Soup')
+        0.2
+    """
+    def __init__(self, cfd, view_class, **kwargs):
+        self.cfd = cfd
+        self.view_class = view_class
+        self.kwargs = kwargs
+        self._views = {}
+
+    def view(self, condition):
+        "Returns the smoothed view for a single condition."
+        view = self._views.get(condition)
+        if view is None:
+            condition_dist = self.cfd.get(condition)
+            if condition_dist is None:
+                raise UnknownSymbolError(condition)
+
+            view = self.view_class(condition_dist, **self.kwargs)
+            self._views[condition] = view
+
+        return view
+
+    def prob(self, condition, sample):
+        """
+        Returns the smoothed P(sample | condition). An exception is raised
+        for unseen conditions.
+        """
+        return self.view(condition).prob(sample)
+
+    def log_prob(self, condition, sample):
+        """
+        Returns the smoothed log(P(sample | condition)). An exception is
+        raised for unseen conditions.
+        """
+        return self.view(condition).log_prob(sample)
+
+
+class KneserNeyView(object):
+    """
+    Interpolated Kneser-Ney smoothing over a ConditionalFreqDist, where
+    each condition is treated as the context of its samples. The
+    continuation counts are gathered on first use, and again whenever the
+    model's version changes; call refresh() after changing counts directly
+    on its inner distributions.
+
+        >>> from freq import ConditionalFreqDist
+        >>> x = ConditionalFreqDist()
+        >>> x.inc('san', 'francisco', 4)
+        >>> x.inc('the', 'cat')
+        >>> x.inc('a', 'cat')
+        >>> round(KneserNeyView(x).prob('the', 'francisco'), 3)
+        0.25
+    """
+    def __init__(self, cfd, discount=0.75):
+        self.cfd = cfd
+        self.discount = discount
+        self._continuations = None
+        self._n_pairs = None
+        self._continuations_version = None
+
+    def refresh(self):
+        "Recomputes the continuation counts from the current model."
+        continuations = {}
+        n_pairs = 0
+        for condition_dist in self.cfd.itervalues():
+            for sample in condition_dist.iterkeys():
+                continuations[sample] = continuations.get(sample, 0) + 1
+            n_pairs += len(condition_dist)
+
+        self._continuations = continuations
+        self._n_pairs = n_pairs
+        self._continuations_version = self.cfd._version
+
+    def continuation_prob(self, sample):
+        """
+        Returns the share of distinct (condition, sample) pairs which have
+        this sample.
+        """
+        if self._continuations_version != self.cfd._version:
+            self.refresh()
+
+        if not self._n_pairs:
+            return 0.0
+        return self._continuations.get(sample, 0) / float(self._n_pairs)
+
+    def prob(self, condition, sample):
+        """
+        Returns the smoothed P(sample | condition), falling back on the
+        continuation probability for unseen conditions.
+        """
+        p_continuation = self.continuation_prob(sample)
+
+        condition_dist = self.cfd.get(condition)
+        if condition_dist is None or not condition_dist.total:
+            return p_continuation
+
+        total = float(condition_dist.total)
+        discounted = max(condition_dist.get(sample, 0) - self.discount, 0)
+        backoff_weight = self.discount * len(condition_dist) / total
+
+        return discounted / total + backoff_weight * p_continuation
+
+    def log_prob(self, condition, sample):
+        """Returns the smoothed log(P(sample | condition))."""
+        return log(self.prob(condition, sample))
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+#
+#  store.py
+#  simplestats
+#
+
+"""
+An on-disk store for large conditional frequency distributions, split
+into shards by condition, from which single conditions can be loaded on
+demand.
+
+A store is a directory holding shard files in the usual dump format, with
+each condition's lines kept together, a "shards" file listing the shard
+filenames, and an "index" file giving the shard, byte offset, length and
+total count of every condition.
+"""
+
+import os
+import sys
+import zlib
+
+from collections import deque
+from itertools import izip
+
+from freq import FreqDist, ConditionalFreqDist, UnknownSymbolError, sopen, \
+        _parse_columns, _escape_spaces, _iter_text_blocks
+from blocks import BlockReader
+
+_index_name = 'index'
+_shards_name = 'shards'
+_default_budget = 64 << 20
+
+
+def shard_for(condition, n_shards):
+    """
+    Returns the shard a condition is stored in, stable across processes.
+    Byte strings are hashed as they are, and anything else as UTF-8 text.
+    """
+    if isinstance(condition, str):
+        key = condition
+    else:
+        key = unicode(condition).encode('utf8')
+    return (zlib.crc32(key) & 0xffffffff) % n_shards
+
+
+def shard_name(shard, extension=''):
+    return 'shard-%05d%s' % (shard, extension)
+
+
+def write_shard(cfd, filename):
+    """
+    Writes a ConditionalFreqDist as a shard file, in the same order as
+    ConditionalFreqDist.dump(). Returns a list of (condition, offset,
+    length, total) entries for the index, where offsets are in
+    uncompressed bytes.
+    """
+    entries = []
+    offset = 0
+    o_stream = sopen(filename, 'wb', encoding=None)
+    for condition in sorted(cfd.iterkeys()):
+        condition_dist = cfd[condition]
+        escaped = _escape_spaces(unicode(condition))
+        lines = []
+        for sample, count in sorted(condition_dist.iteritems(),
+                                    key=lambda x: (-x[1], x[0])):
+            sample = _escape_spaces(unicode(sample))
+            lines.append(u'%s %s %d\n' % (escaped, sample, count))
+
+        data = u''.join(lines).encode('utf8')
+        o_stream.write(data)
+        entries.append((condition, offset, len(data),
+                        sum(condition_dist.itervalues())))
+        offset += len(data)
+    o_stream.close()
+
+    return entries
+
+
+def write_index(dirname, shard_names, shard_entries):
+    """
+    Writes the index files for a store, given the name of each shard and
+    the entries returned by write_shard() for it.
+    """
+    o_stream = sopen(os.path.join(dirname, _shards_name), 'w')
+    for name in shard_names:
+        print >> o_stream, name
+    o_stream.close()
+
+    o_stream = sopen(os.path.join(dirname, _index_name), 'w')
+    for shard, entries in enumerate(shard_entries):
+        for condition, offset, length, total in entries:
+            print >> o_stream, u'%s %d %d %d %d' % (
+                    _escape_spaces(unicode(condition)), shard, offset,
+                    length, total,
+                )
+    o_stream.close()
+
+
+def dump_sharded(cfd, dirname, n_shards=16, extension=''):
+    """
+    Dumps a ConditionalFreqDist into a sharded store in the given
+    directory. The extension is used for the shard files, and may request
+    compression; use '.bgz' rather than '.gz' or '.bz2' to keep lookups
+    fast.
+    """
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+
+    parts = [ConditionalFreqDist() for i in xrange(n_shards)]
+    for condition, condition_dist in cfd.iteritems():
+        dict.__setitem__(parts[shard_for(condition, n_shards)], condition,
+                         condition_dist)
+
+    names = [shard_name(i, extension) for i in xrange(n_shards)]
+    entries = [write_shard(part, os.path.join(dirname, name))
+               for (part, name) in zip(parts, names)]
+    write_index(dirname, names, entries)
+
+
+def _estimate_size(dist):
+    "Roughly estimates the memory used by a distribution, in bytes."
+    size = sys.getsizeof(dist)
+    for sample in dist.iterkeys():
+        size += sys.getsizeof(sample) + 24
+    return size
+
+
+class _LruCache(object):
+    """
+    A mapping which remembers the order its keys were last used in, since
+    OrderedDict is missing from Python 2.6. Each use appends the key to a
+    queue with a new stamp; stale queue entries are skipped, and dropped
+    once they outnumber the live ones.
+    """
+    def __init__(self):
+        self._items = {}
+        self._order = deque()
+        self._stamp = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def _push(self, key, value):
+        self._stamp += 1
+        self._items[key] = (self._stamp, value)
+        self._order.append((self._stamp, key))
+        if len(self._order) > 2 * len(self._items) + 16:
+            self._order = deque(self._iter_live())
+
+    def _iter_live(self):
+        items = self._items
+        for stamp, key in self._order:
+            if items[key][0] == stamp:
+                yield stamp, key
+
+    def get(self, key, default=None):
+        "Returns the value for the key, marking it most recently used."
+        item = self._items.get(key)
+        if item is None:
+            return default
+        self._push(key, item[1])
+        return item[1]
+
+    def __setitem__(self, key, value):
+        self._push(key, value)
+
+    def popitem(self):
+        "Removes and returns the least recently used (key, value) pair."
+        while True:
+            stamp, key = self._order.popleft()
+            if self._items[key][0] == stamp:
+                return key, self._items.pop(key)[1]
+
+    def keys(self):
+        "Returns the keys, least recently used first."
+        return [key for (stamp, key) in self._iter_live()]
+
+
+class ShardedConditionalFreqDist(object):
+    """
+    A read-only ConditionalFreqDist backed by a sharded store on disk. Only
+    the index is read up front; each condition's distribution is loaded
+    when first needed, and kept in an LRU cache limited to roughly
+    memory_budget bytes.
+    """
+    def __init__(self, dirname, memory_budget=_default_budget):
+        self.dirname = dirname
+        self.memory_budget = memory_budget
+
+        # Both files are split on newlines only, since conditions may hold
+        # other unicode line breaks.
+        self._shard_names = []
+        for text in _iter_text_blocks(os.path.join(dirname, _shards_name)):
+            self._shard_names.extend(text.rstrip(u'\n').split(u'\n'))
+        self._shards = [None] * len(self._shard_names)
+
+        self._index = {}
+        for text in _iter_text_blocks(os.path.join(dirname, _index_name)):
+            conditions, shards, offsets, lengths, totals = \
+                _parse_columns(text, 5)
+            self._index.update(izip(conditions, izip(
+                map(int, shards), map(int, offsets), map(int, lengths),
+                totals,
+            )))
+        self._total = sum(entry[3] for entry in self._index.itervalues())
+
+        self._cache = _LruCache()
+        self._cache_size = 0
+
+    #------------------------------------------------------------------------#
+
+    def _shard(self, shard):
+        "Returns an open file for the given shard."
+        stream = self._shards[shard]
+        if stream is None:
+            filename = os.path.join(self.dirname, self._shard_names[shard])
+            if filename.endswith('.bgz'):
+                stream = BlockReader(filename, workers=1)
+            else:
+                stream = sopen(filename, 'rb', encoding=None)
+            self._shards[shard] = stream
+        return stream
+
+    def _load(self, condition, entry):
+        shard, offset, length, total = entry
+        stream = self._shard(shard)
+        stream.seek(offset)
+        text = stream.read(length).decode('utf8')
+
+        condition_dist = FreqDist()
+        if text:
+            conditions, samples, counts = _parse_columns(text, 3)
+            condition_dist._inc_many(samples, counts)
+        return condition_dist
+
+    def _cache_put(self, condition, condition_dist):
+        size = _estimate_size(condition_dist)
+        self._cache[condition] = (condition_dist, size)
+        self._cache_size += size
+
+        while self._cache_size > self.memory_budget and len(self._cache) > 1:
+            old_condition, (old_dist, old_size) = self._cache.popitem()
+            self._cache_size -= old_size
+
+    def get(self, condition, default=None):
+        cached = self._cache.get(condition)
+        if cached is not None:
+            return cached[0]
+
+        entry = self._index.get(condition)
+        if entry is None:
+            return default
+
+        condition_dist = self._load(condition, entry)
+        self._cache_put(condition, condition_dist)
+        return condition_dist
+
+    def __getitem__(self, condition):
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            raise KeyError(condition)
+        return condition_dist
+
+    def __contains__(self, condition):
+        return condition in self._index
+
+    has_key = __contains__
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def iterkeys(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def iteritems(self):
+        for condition in self._index:
+            yield condition, self[condition]
+
+    def itervalues(self):
+        for condition in self._index:
+            yield self[condition]
+
+    #------------------------------------------------------------------------#
+
+    def count(self, condition, sample):
+        "Returns the count of (sample|condition)."
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            raise UnknownSymbolError(condition)
+        return condition_dist.count(sample)
+
+    def prob(self, condition, sample):
+        """
+        Returns P(sample | condition). An exception is raised for unseen
+        conditions.
+        """
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            raise UnknownSymbolError(condition)
+
+        return condition_dist.prob(sample)
+
+    def log_prob(self, condition, sample):
+        """
+        Returns log(P(sample | condition)). An exception is raised for
+        unseen conditions.
+        """
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            raise UnknownSymbolError(condition)
+
+        return condition_dist.log_prob(sample)
+
+    def candidates(self, condition):
+        "Return candidates for the given condition."
+        condition_dist = self.get(condition)
+        if condition_dist is None:
+            return []
+        return condition_dist.candidates()
+
+    def itercounts(self):
+        """
+        Returns an interator over all the counts in this model, presented
+        as a sequence of (condition, sample, count) tuples.
+        """
+        for condition, condition_dist in self.iteritems():
+            for sample, count in condition_dist.iteritems():
+                yield condition, sample, count
+
+    def to_condition_dist(self):
+        """
+        Generates a frequency distribution of conditions, from the index
+        alone.
+        """
+        return FreqDist(
+            (condition, entry[3])
+            for (condition, entry) in self._index.iteritems()
+        )
+
+    def condition_prob(self, condition):
+        "Returns P(condition), from the index alone."
+        entry = self._index.get(condition)
+        if entry is None:
+            return 0.0
+        return entry[3] / float(self._total)
+
+    def close(self):
+        for stream in self._shards:
+            if stream is not None:
+                stream.close()
+        self._shards = [None] * len(self._shard_names)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+#  test_approx.py
+#  simplestats
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import approx
+import freq
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(CountMinTestCase),
+        unittest.makeSuite(SpaceSavingTestCase),
+        doctest.DocTestSuite(approx),
+    ))
+    return testSuite
+
+
+class CountMinTestCase(unittest.TestCase):
+    def setUp(self):
+        self.words = ['cat'] * 50 + ['dog'] * 20 + [
+            'w%d' % i for i in xrange(500)
+        ]
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _build(self, words, **kwargs):
+        dist = approx.CountMinFreqDist(**kwargs)
+        for word in words:
+            dist.inc(word)
+        return dist
+
+    def testNeverUnderestimates(self):
+        exact = freq.FreqDist()
+        for word in self.words:
+            exact.inc(word)
+
+        dist = self._build(self.words, width=64, depth=3)
+        self.assertEqual(dist.total, exact.total)
+        for word in exact:
+            self.assertTrue(dist.count(word) >= exact.count(word))
+            self.assertTrue(
+                dist.count(word) <= exact.count(word) + dist.error_bound()
+            )
+
+    def testByteStrings(self):
+        dist = approx.CountMinFreqDist(width=64, depth=3)
+        dist.inc('/caf\xc3\xa9?q=\xff', 2)
+        dist.inc(u'caf\xe9')
+        self.assertEqual(dist.count('/caf\xc3\xa9?q=\xff'), 2)
+        self.assertEqual(dist.count('caf\xc3\xa9'), 1)
+        self.assertEqual(dist.count(3), dist.count(u'3'))
+
+    def testFixedSize(self):
+        dist = self._build(self.words[:10], width=32, depth=2)
+        size = len(dist._table)
+        for word in self.words:
+            dist.inc(word)
+        self.assertEqual(len(dist._table), size)
+
+    def testFromError(self):
+        dist = approx.CountMinFreqDist.from_error(0.01, 0.01)
+        self.assertEqual(dist.width, 272)
+        self.assertEqual(dist.depth, 5)
+
+    def testMerge(self):
+        half = len(self.words) // 2
+        a = self._build(self.words[:half], width=128, depth=4)
+        b = self._build(self.words[half:], width=128, depth=4)
+        a.merge(b)
+        self.assertEqual(a.total, len(self.words))
+        self.assertTrue(a.count('cat') >= 50)
+
+        self.assertRaises(ValueError, a.merge,
+                          approx.CountMinFreqDist(width=64, depth=4))
+
+    def testSerialization(self):
+        dist = self._build(self.words, width=128, depth=4, seed=7)
+        copy = approx.CountMinFreqDist.loads(dist.dumps())
+        self.assertEqual(copy.total, dist.total)
+        self.assertEqual(copy.seed, 7)
+        self.assertEqual(list(copy._table), list(dist._table))
+
+        filename = os.path.join(self.tmp_dir, 'sketch.gz')
+        dist.dump(filename)
+        loaded = approx.CountMinFreqDist.from_file(filename)
+        self.assertEqual(loaded.count('dog'), dist.count('dog'))
+
+        loaded.load(filename)
+        self.assertEqual(loaded.total, 2 * dist.total)
+
+        self.assertRaises(ValueError, approx.CountMinFreqDist.loads,
+                          'XXXX' + dist.dumps()[4:])
+
+
+class SpaceSavingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.words = []
+        for i in xrange(200):
+            self.words.extend(['cat', 'dog', 'cat', 'w%d' % i])
+
+        self.exact = freq.FreqDist()
+        for word in self.words:
+            self.exact.inc(word)
+
+    def _build(self, words, capacity=10):
+        dist = approx.SpaceSavingFreqDist(capacity)
+        for word in words:
+            dist.inc(word)
+        return dist
+
+    def testBounds(self):
+        dist = self._build(self.words)
+        self.assertEqual(len(dist), 10)
+        self.assertEqual(dist.total, len(self.words))
+        self.assertTrue(dist.error_bound() <= dist.total / 10.0)
+
+        for word, count in dist.iteritems():
+            true_count = self.exact[word]
+            self.assertTrue(count >= true_count)
+            self.assertTrue(dist.guaranteed_count(word) <= true_count)
+            self.assertTrue(count - dist.error(word) <= true_count)
+
+        self.assertEqual(
+            [k for (k, v) in dist.heavy_hitters(0.1)],
+            ['cat', 'dog'],
+        )
+        self.assertEqual(dist.guaranteed_count('cat'), 400)
+
+    def testFreqDistInterface(self):
+        dist = self._build(self.words)
+        self.assertEqual(dist.prob('cat'), 0.5)
+        self.assertEqual(dist.prob('unseen'), 0.0)
+        self.assertEqual(len(dist.candidates()), 10)
+
+    def testNoRemoval(self):
+        dist = self._build(self.words)
+        self.assertRaises(ValueError, dist.decrement, 'cat')
+        self.assertRaises(ValueError, dist.remove_sample, 'cat')
+        self.assertEqual(dist['cat'], 400)
+        self.assertEqual(dist.total, len(self.words))
+
+    def testMerge(self):
+        half = len(self.words) // 2
+        a = self._build(self.words[:half])
+        b = self._build(self.words[half:])
+        a.merge(b)
+        self.assertEqual(len(a), 10)
+        self.assertEqual(a.total, len(self.words))
+        self.assertEqual(a.guaranteed_count('cat'), 400)
+        for word, count in a.iteritems():
+            self.assertTrue(count >= self.exact[word])
+            self.assertTrue(count - a.error(word) <= self.exact[word])
+
+        # Exact distributions can be merged in as well.
+        a.merge(self.exact)
+        self.assertEqual(a.total, 2 * len(self.words))
+        self.assertEqual(a.guaranteed_count('cat'), 800)
+
+        # The merged summary keeps working as a stream summary.
+        a.inc('cat')
+        self.assertEqual(a['cat'], 801)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+#  test_assoc.py
+#  simplestats
+#
+
+import random
+import unittest
+import doctest
+from math import log, sqrt
+
+import assoc
+import info
+from freq import ConditionalFreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(AssociationTestCase),
+        doctest.DocTestSuite(assoc),
+    ))
+    return testSuite
+
+
+def _table(cfd, condition, sample):
+    "Returns the observed and expected 2x2 tables for a cell, the slow way."
+    n = float(sum(c for (k, s, c) in cfd.itercounts()))
+    o11 = cfd[condition].get(sample, 0)
+    r1 = cfd[condition].total
+    c1 = sum(d.get(sample, 0) for d in cfd.itervalues())
+    observed = [o11, r1 - o11, c1 - o11, n - r1 - c1 + o11]
+    expected = [r1 * c1 / n, r1 * (n - c1) / n, (n - r1) * c1 / n,
+                (n - r1) * (n - c1) / n]
+    return observed, expected
+
+
+class AssociationTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(6)
+        self.cfd = ConditionalFreqDist()
+        for i in xrange(2000):
+            condition = rng.randint(0, 10)
+            sample = rng.choice([condition, rng.randint(0, 30)])
+            self.cfd.inc(condition, sample)
+
+    def testAgainstContingencyTables(self):
+        all_scores = assoc.all_scores(self.cfd)
+        self.assertEqual(len(all_scores), len(list(self.cfd.itercounts())))
+        for (condition, sample), cell in all_scores.iteritems():
+            observed, expected = _table(self.cfd, condition, sample)
+            chi2 = sum((o - e) ** 2 / e for (o, e) in zip(observed, expected))
+            g2 = 2 * sum(o * log(o / e) for (o, e) in zip(observed, expected)
+                         if o > 0)
+            t = (observed[0] - expected[0]) / sqrt(observed[0])
+            self.assertAlmostEqual(cell['chi_square'], chi2)
+            self.assertAlmostEqual(cell['log_likelihood'], g2)
+            self.assertAlmostEqual(cell['t_score'], t)
+            self.assertAlmostEqual(cell['pmi'],
+                                   log(observed[0] / expected[0]))
+
+    def testMatchesInfo(self):
+        pmi = info.pointwise_mutual_information(self.cfd)
+        for cell, score in assoc.scores(self.cfd, 'pmi').iteritems():
+            self.assertAlmostEqual(score, pmi[cell])
+
+    def testTopK(self):
+        for measure in assoc.measures:
+            scores = assoc.scores(self.cfd, measure, min_count=3)
+            self.assert_(min(self.cfd[c][s] for (c, s) in scores) >= 3)
+            best = sorted(scores.values(), reverse=True)[:10]
+            top = assoc.top_k(self.cfd, 10, measure, min_count=3)
+            self.assertEqual([score for (cell, score) in top], best)
+
+        custom = assoc.top_k(self.cfd, 1, lambda o11, r1, c1, n: o11)
+        self.assertEqual(custom[0][1], max(self.cfd.itercounts(),
+                                           key=lambda x: x[2])[2])
+        self.assertRaises(ValueError, assoc.scores, self.cfd, 'dice')
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
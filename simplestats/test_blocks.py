@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+#  test_blocks.py
+#  simplestats
+#
+
+import os
+import gzip
+import zlib
+import struct
+import shutil
+import tempfile
+import unittest
+
+import blocks
+import freq
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(BlockFileTestCase),
+    ))
+    return testSuite
+
+
+def _bgzf_member(data):
+    "Compresses data as one BGZF member, as bgzip would."
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<BBBBIBBH2sHH', 0x1f, 0x8b, 8, 4, 0, 0, 255, 6,
+                         'BC', 2, 18 + len(body) + 8 - 1)
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+    return header + body + trailer
+
+
+class BlockFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'data.bgz')
+        self.lines = ['line %d of the test data\n' % i for i in xrange(2000)]
+        self.data = ''.join(self.lines)
+
+        o_stream = blocks.BlockWriter(self.filename, block_size=1000)
+        for line in self.lines:
+            o_stream.write(line)
+        o_stream.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testReadAll(self):
+        for workers in (1, 3):
+            i_stream = blocks.BlockReader(self.filename, workers=workers)
+            self.assertTrue(len(i_stream) > 10)
+            self.assertEqual(i_stream.size, len(self.data))
+            self.assertEqual(i_stream.read(), self.data)
+            self.assertEqual(i_stream.read(), '')
+            i_stream.close()
+
+    def testBlocksHoldWholeLines(self):
+        i_stream = blocks.BlockReader(self.filename)
+        for block in i_stream.iter_blocks():
+            self.assertTrue(block.endswith('\n'))
+        i_stream.close()
+
+        i_stream = blocks.BlockReader(self.filename)
+        self.assertEqual(list(i_stream), self.lines)
+        i_stream.close()
+
+    def testReadline(self):
+        i_stream = blocks.BlockReader(self.filename, workers=2)
+        self.assertEqual(i_stream.read(5), self.data[:5])
+        self.assertEqual(i_stream.readline(), self.lines[0][5:])
+        self.assertEqual(i_stream.readline(), self.lines[1])
+        i_stream.close()
+
+    def testSeek(self):
+        i_stream = blocks.BlockReader(self.filename, workers=2)
+        for offset in (0, 17, 999, 1000, 20000, len(self.data) - 3):
+            i_stream.seek(offset)
+            self.assertEqual(i_stream.tell(), offset)
+            self.assertEqual(i_stream.read(40), self.data[offset:offset + 40])
+
+        i_stream.seek(-10, 2)
+        self.assertEqual(i_stream.read(), self.data[-10:])
+        i_stream.close()
+
+    def testGzipCompatible(self):
+        i_stream = gzip.GzipFile(self.filename)
+        self.assertEqual(i_stream.read(), self.data)
+        i_stream.close()
+
+        self.assertTrue(blocks.is_block_file(self.filename))
+        plain_gz = os.path.join(self.tmp_dir, 'plain.gz')
+        o_stream = gzip.GzipFile(plain_gz, 'w')
+        o_stream.write(self.data)
+        o_stream.close()
+        self.assertFalse(blocks.is_block_file(plain_gz))
+
+    def testSopen(self):
+        dist = freq.FreqDist()
+        for i in xrange(3000):
+            dist.inc(u'word %d' % (i % 700), i)
+
+        for extension in ('.bgz', '.gz'):
+            filename = os.path.join(self.tmp_dir, 'dist' + extension)
+            dist.dump(filename)
+            loaded = freq.FreqDist.from_file(filename)
+            self.assertEqual(loaded, dist)
+            self.assertEqual(loaded.total, dist.total)
+
+        renamed = os.path.join(self.tmp_dir, 'renamed.gz')
+        os.rename(os.path.join(self.tmp_dir, 'dist.bgz'), renamed)
+        self.assertEqual(freq.FreqDist.from_file(renamed), dist)
+
+    def testSopenBgzf(self):
+        filename = os.path.join(self.tmp_dir, 'other.bgz')
+        o_stream = open(filename, 'wb')
+        o_stream.write(_bgzf_member(self.data[:1000]))
+        o_stream.write(_bgzf_member(self.data[1000:]))
+        o_stream.write(_bgzf_member(''))
+        o_stream.close()
+
+        self.assertFalse(blocks.is_block_file(filename))
+        i_stream = freq.sopen(filename, encoding=None)
+        self.assertEqual(i_stream.read(), self.data)
+        i_stream.close()
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
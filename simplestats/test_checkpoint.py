@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+#  test_checkpoint.py
+#  simplestats
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import checkpoint
+from checkpoint import CheckpointedFreqDist, \
+        CheckpointedConditionalFreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(CheckpointedFreqDistTestCase),
+        unittest.makeSuite(CheckpointedConditionalFreqDistTestCase),
+        doctest.DocTestSuite(checkpoint),
+    ))
+    return testSuite
+
+
+class CheckpointedFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'counts.gz')
+        self.delta = checkpoint.delta_name(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testOnlyChangesLogged(self):
+        dist = CheckpointedFreqDist(self.filename)
+        for i in xrange(100):
+            dist.inc(u'sample %d' % i, i + 1)
+        dist.compact()
+        self.assertFalse(os.path.exists(self.delta))
+
+        dist.inc(u'sample 3')
+        dist.decrement(u'sample 4')
+        dist.remove_sample(u'sample 5')
+        self.assert_(dist.has_changes())
+        dist.checkpoint()
+        self.assertFalse(dist.has_changes())
+        self.assertEqual(len(open(self.delta).read().splitlines()), 4)
+
+        recovered = CheckpointedFreqDist.open(self.filename)
+        self.assertEqual(recovered, dist)
+        self.assertEqual(recovered.total, dist.total)
+        self.assertFalse(u'sample 5' in recovered)
+
+    def testTornCheckpoint(self):
+        dist = CheckpointedFreqDist(self.filename)
+        dist.inc(u'a', 2)
+        dist.checkpoint()
+        dist.inc(u'b')
+        dist.checkpoint()
+        o_stream = open(self.delta, 'ab')
+        o_stream.write('a 10\nb 3')
+        o_stream.close()
+
+        recovered = CheckpointedFreqDist.open(self.filename)
+        self.assertEqual(recovered, {u'a': 2, u'b': 1})
+        self.assertEqual(recovered.total, 3)
+
+        # Later checkpoints still replay cleanly.
+        recovered.inc(u'c')
+        recovered.checkpoint()
+        again = CheckpointedFreqDist.open(self.filename)
+        self.assertEqual(again, {u'a': 2, u'b': 1, u'c': 1})
+
+    def testCompactEvery(self):
+        dist = CheckpointedFreqDist(self.filename, compact_every=3)
+        for i in xrange(5):
+            dist.inc(u'x')
+            dist.checkpoint()
+        self.assert_(os.path.exists(self.filename))
+        self.assertEqual(open(self.delta).read().splitlines().count(''), 2)
+        self.assertEqual(CheckpointedFreqDist.open(self.filename)[u'x'], 5)
+
+    def testCompactSyncsBeforeRemovingLog(self):
+        dist = CheckpointedFreqDist(self.filename)
+        dist.inc(u'a', 4)
+        dist.checkpoint()
+
+        events = []
+        fsync, rename, remove = os.fsync, os.rename, os.remove
+        os.fsync = lambda fd: (events.append('fsync'), fsync(fd))
+        os.rename = lambda a, b: (events.append('rename'), rename(a, b))
+        os.remove = lambda f: (events.append('remove'), remove(f))
+        try:
+            dist.compact()
+        finally:
+            os.fsync, os.rename, os.remove = fsync, rename, remove
+
+        self.assertEqual(events, ['fsync', 'rename', 'fsync', 'rename',
+                                  'fsync', 'remove'])
+        self.assertEqual(CheckpointedFreqDist.open(self.filename), dist)
+
+    def _crash_compaction(self, name, n_calls):
+        """
+        Checkpoints {a: 4}, then changes the counts to {a: 5, b: 1} and
+        compacts, crashing on the n_calls-th call to the named os function.
+        Returns what is recovered.
+        """
+        dist = CheckpointedFreqDist(self.filename)
+        dist.inc(u'a', 4)
+        dist.checkpoint()
+        dist.inc(u'a')
+        dist.inc(u'b')
+
+        original = getattr(os, name)
+        calls = []
+
+        def crash(*args):
+            calls.append(args)
+            if len(calls) == n_calls:
+                raise KeyboardInterrupt
+            return original(*args)
+
+        setattr(os, name, crash)
+        try:
+            self.assertRaises(KeyboardInterrupt, dist.compact)
+        finally:
+            setattr(os, name, original)
+
+        recovered = CheckpointedFreqDist.open(self.filename)
+        for filename in os.listdir(self.tmp_dir):
+            self.assertFalse(filename.endswith('.old') or '.tmp' in filename)
+        return recovered
+
+    def testCrashBeforeCommit(self):
+        # The log was never retired, so the last checkpoint stands.
+        recovered = self._crash_compaction('rename', 1)
+        self.assertEqual(recovered, {u'a': 4})
+        self.assertEqual(recovered.total, 4)
+
+    def testCrashAfterCommit(self):
+        for name, n_calls in [('rename', 2), ('remove', 1)]:
+            recovered = self._crash_compaction(name, n_calls)
+            self.assertEqual(recovered, {u'a': 5, u'b': 1})
+            self.assertEqual(recovered.total, 6)
+            self.assertFalse(os.path.exists(self.delta))
+            os.remove(self.filename)
+
+    def testReplayIsIdempotent(self):
+        dist = CheckpointedFreqDist(self.filename)
+        dist.inc(u'a', 4)
+        dist.checkpoint()
+        dist.dump(self.filename)
+        self.assertEqual(CheckpointedFreqDist.open(self.filename).total, 4)
+
+
+class CheckpointedConditionalFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'model')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testRecover(self):
+        cfd = CheckpointedConditionalFreqDist(self.filename)
+        cfd.inc(u'lunch', u'ham sandwich', 3)
+        cfd.inc(u'dinner', u'soup')
+        cfd.compact()
+        cfd.inc(u'lunch', u'soup')
+        cfd.checkpoint()
+        cfd.inc(u'breakfast', u'eggs')
+        cfd.checkpoint()
+
+        recovered = CheckpointedConditionalFreqDist.open(self.filename)
+        self.assertEqual(recovered, cfd)
+        self.assertEqual(recovered.prob(u'lunch', u'soup'), 0.25)
+        self.assertEqual(recovered[u'lunch'].total, 4)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -64,6 +64,42 @@ class CombinationTest(unittest.TestCase):
             result
         )
 
+    def testUniquePairsRandomAccess(self):
+        for n in (2, 3, 7, 50):
+            items = range(n)
+            pairs = list(comb.iunique_pairs(items))
+            x = comb.UniquePairsIterator(items)
+            self.assertEqual(len(x), len(pairs))
+            for k, (i, j) in enumerate(pairs):
+                self.assertEqual(x.pair_indices(k), (i, j))
+                self.assertEqual(x.pair_at(k), (i, j))
+                self.assertEqual(x.rank(i, j), k)
+                self.assertEqual(x[k], (i, j))
+            self.assertEqual(x[-1], pairs[-1])
+            self.assertRaises(IndexError, x.pair_at, len(pairs))
+            self.assertRaises(IndexError, x.rank, 1, 1)
+
+            for n_chunks in (1, 2, 5, len(pairs) + 3):
+                chunks = x.split(n_chunks)
+                self.assertEqual(len(chunks), n_chunks)
+                self.assertEqual(sum([list(c) for c in chunks], []), pairs)
+
+            self.assertEqual(list(x[2:5]), pairs[2:5])
+            self.assertEqual(list(x[3:][1:4]), pairs[4:7])
+            self.assertEqual(list(x[5:2]), [])
+            self.assertRaises(ValueError, x.__getitem__, slice(0, 4, 2))
+
+    def testUniquePairsLarge(self):
+        n = 10 ** 6
+        x = comb.UniquePairsIterator(xrange(n))
+        last = len(x) - 1
+        self.assertEqual(x.pair_at(last), (n - 2, n - 1))
+        self.assertEqual(x.rank(n - 2, n - 1), last)
+        self.assertEqual(x.pair_indices(x.rank(123456, 654321)),
+                         (123456, 654321))
+        chunk = x.split(1000)[999]
+        self.assertEqual(chunk.next(), x[chunk.start])
+
 
 if __name__ == "__main__":
     unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+#  test_decay.py
+#  simplestats
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import decay
+from freq import FreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(DecayedFreqDistTestCase),
+        doctest.DocTestSuite(decay),
+    ))
+    return testSuite
+
+
+class DecayedFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testMatchesEagerDecay(self):
+        x = decay.DecayedFreqDist(half_life=3.0)
+        expected = {}
+        for step in xrange(2000):
+            sample = step % 7
+            x.inc(sample, 2)
+            expected[sample] = expected.get(sample, 0.0) + 2
+            x.decay(0.5)
+            for key in expected:
+                expected[key] *= 0.5 ** (0.5 / 3.0)
+
+        # Long enough for the counts to be renormalized along the way.
+        self.assertEqual(len(x), 7)
+        total = sum(expected.values())
+        self.assertAlmostEqual(x.total / total, 1.0)
+        for sample, count in expected.iteritems():
+            self.assertAlmostEqual(x.count(sample) / count, 1.0)
+            self.assertAlmostEqual(x.prob(sample), count / total)
+        self.assertEqual(x.top(1), [1999 % 7])
+
+    def testPrune(self):
+        x = decay.DecayedFreqDist(half_life=1.0)
+        x.inc('old')
+        x.decay(10)
+        x.inc('new')
+        self.assertEqual(x.prune(0.01), 1)
+        self.assertEqual(x.keys(), ['new'])
+        self.assertAlmostEqual(x.total, 1.0)
+        self.assertEqual(x.prob('new'), 1.0)
+
+    def testMerge(self):
+        x = decay.DecayedFreqDist(half_life=1.0)
+        x.inc('a', 4)
+        x.decay(1)
+        y = decay.DecayedFreqDist(half_life=5.0)
+        y.inc('a', 8)
+        y.decay(5)
+        x.merge(y)
+        x.merge(FreqDist([('b', 2)]))
+        self.assertAlmostEqual(x.count('a'), 6.0)
+        self.assertAlmostEqual(x.total, 8.0)
+        self.assertEqual(x.to_freq_dist().prob('b'), 0.25)
+
+    def testDumpLoad(self):
+        filename = os.path.join(self.tmp_dir, 'trends.gz')
+        x = decay.DecayedFreqDist(half_life=2.5)
+        x.inc(u'hot topic', 3)
+        x.decay(1.7)
+        x.inc(u'näive')
+        x.inc(u'odd\x85line breaks\x1c', 2)
+        x.dump(filename)
+
+        y = decay.DecayedFreqDist.from_file(filename)
+        self.assertEqual(y.half_life, 2.5)
+        self.assertEqual(sorted(y.items()), sorted(x.items()))
+        y.load(filename)
+        self.assertAlmostEqual(y.total, 2 * x.total)
+
+        plain = os.path.join(self.tmp_dir, 'plain')
+        FreqDist([('a', 1)]).dump(plain)
+        self.assertRaises(ValueError, decay.DecayedFreqDist.from_file, plain)
+
+    def testBadHalfLife(self):
+        self.assertRaises(ValueError, decay.DecayedFreqDist, 0)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
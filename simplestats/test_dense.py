@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+#  test_dense.py
+#  simplestats
+#
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import dense
+from freq import FreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(DenseFreqDistTestCase),
+        doctest.DocTestSuite(dense),
+    ))
+    return testSuite
+
+
+class DenseFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.samples = [rng.randint(0, 20) for i in xrange(5000)]
+        self.expected = FreqDist()
+        for sample in self.samples:
+            self.expected.inc(sample)
+
+    def testMatchesFreqDist(self):
+        x = dense.DenseFreqDist(21)
+        x.inc_many(iter(self.samples[:100]))
+        x.inc_many(self.samples[100:])
+        self.assertEqual(x.to_freq_dist(), self.expected)
+        self.assertEqual(x.total, self.expected.total)
+        self.assertEqual(len(x), len(self.expected))
+        for sample in xrange(-1, 25):
+            self.assertEqual(x.count(sample), self.expected.count(sample))
+            self.assertEqual(x.prob(sample), self.expected.prob(sample))
+        self.assertEqual(list(x.probs([3, 30])),
+                         [self.expected.prob(3), 0.0])
+        self.assertAlmostEqual(sum(x.probs()), 1.0)
+        self.assertEqual(sorted(x.candidates()),
+                         sorted(self.expected.candidates()))
+
+    def testRange(self):
+        x = dense.DenseFreqDist(3)
+        self.assertRaises(IndexError, x.inc, 3)
+        self.assertRaises(IndexError, x.inc, -1)
+        self.assertRaises(IndexError, x.inc_many, [0, 5])
+        self.assertEqual(x.total, 0)
+        self.assertRaises(ValueError, x.decrement, 1)
+
+        x = dense.DenseFreqDist(0, growable=True)
+        x.inc_many([7, 2])
+        x.inc(30)
+        self.assert_(x.size > 30)
+        self.assertEqual(x.items(), [(2, 1), (7, 1), (30, 1)])
+
+    def testConversions(self):
+        x = dense.DenseFreqDist.from_freq_dist(self.expected)
+        self.assertEqual(x.size, 21)
+        self.assertEqual(x.to_freq_dist(), self.expected)
+
+        y = dense.DenseFreqDist(25)
+        y.merge(x)
+        y.merge(FreqDist([(24, 2)]))
+        y.decrement(24)
+        self.assertEqual(y.total, self.expected.total + 1)
+        self.assertEqual(y[24], 1)
+
+    def testDumpLoad(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, 'counts.gz')
+            x = dense.DenseFreqDist.from_freq_dist(self.expected)
+            x.dump(filename)
+            self.assertEqual(FreqDist.from_file(filename).total, x.total)
+            y = dense.DenseFreqDist.from_file(filename)
+            self.assertEqual(y.items(), x.items())
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+#  test_extsort.py
+#  simplestats
+#
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import extsort
+import freq
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(ExternalSortTestCase),
+        doctest.DocTestSuite(extsort),
+    ))
+    return testSuite
+
+
+class ExternalSortTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = random.Random(1)
+        self.items = [(rng.randint(0, 20), i) for i in xrange(1000)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testMatchesSorted(self):
+        for key in (None, lambda x: x[0]):
+            for reverse in (False, True):
+                for run_size in (1, 7, 100, 5000):
+                    self.assertEqual(
+                        list(extsort.external_sorted(
+                            self.items, key=key, reverse=reverse,
+                            run_size=run_size, tmp_dir=self.tmp_dir,
+                        )),
+                        sorted(self.items, key=key, reverse=reverse),
+                    )
+
+    def testSpillsRuns(self):
+        result = extsort.external_sorted(iter(self.items), run_size=100,
+                                         tmp_dir=self.tmp_dir)
+        self.assertEqual(result.next(), min(self.items))
+        result.close()
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def testDumpsMatch(self):
+        dist = freq.FreqDist()
+        model = freq.ConditionalFreqDist()
+        for count, i in self.items:
+            dist.inc(u'w%d' % i, count)
+            model.inc(u'c%d' % (i % 13), u'w%d' % (i % 31), count)
+
+        for obj in (dist, model):
+            expected = os.path.join(self.tmp_dir, 'expected')
+            external = os.path.join(self.tmp_dir, 'external')
+            unsorted = os.path.join(self.tmp_dir, 'unsorted')
+            obj.dump(expected)
+            obj.dump(external, run_size=50)
+            obj.dump(unsorted, sort=False)
+
+            expected_data = open(expected).read()
+            self.assertEqual(open(external).read(), expected_data)
+            self.assertEqual(sorted(open(unsorted).readlines()),
+                             sorted(expected_data.splitlines(True)))
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -4,8 +4,17 @@
 #  simplestats
 #
 
+import os
+import sys
+import random
+import shutil
+import tempfile
 import unittest
 import doctest
+import struct
+import cPickle as pickle
+from math import log
+from array import array
 
 import freq
 
@@ -14,6 +23,7 @@ def suite():
     testSuite = unittest.TestSuite((
         unittest.makeSuite(FreqDistTestCase),
         unittest.makeSuite(CondFreqDistTestCase),
+        unittest.makeSuite(LoadTestCase),
         doctest.DocTestSuite(freq),
     ))
     return testSuite
@@ -29,6 +39,78 @@ class FreqDistTestCase(unittest.TestCase):
         self.assertEqual(x.prob('dog'), 0.5)
         self.assertEqual(x.prob('cat'), 0.5)
 
+    def testCachedCandidates(self):
+        x = freq.FreqDist()
+        x.inc('dog', 3)
+        x.inc('cat')
+        candidates = x.candidates()
+        self.assertEqual(x.log_prob('cat'), log(0.25))
+
+        # Mutating the returned list doesn't corrupt the cache.
+        candidates.pop()
+        self.assertEqual(len(x.candidates()), 2)
+
+        for update in (
+                lambda: x.inc('emu'),
+                lambda: x.decrement('dog'),
+                lambda: x.remove_sample('cat'),
+                lambda: x.merge(freq.FreqDist([('cat', 2)])),
+                ):
+            x.candidates()
+            update()
+            self.assertEqual(
+                sorted(x.candidates()),
+                sorted((k, log(v / float(x.total))) for (k, v) in x.items()),
+            )
+            self.assertEqual(x.log_prob('dog'), log(x.prob('dog')))
+
+    def testSample(self):
+        x = freq.FreqDist()
+        x.inc('dog', 3)
+        x.inc('cat')
+        rng = random.Random(1)
+        draws = x.sample(4000, rng=rng)
+        self.assertTrue(2800 < draws.count('dog') < 3200)
+        self.assertTrue(x.sample(rng=rng) in x)
+
+        # The alias table is rebuilt after updates.
+        x.remove_sample('dog')
+        self.assertEqual(x.sample(10), ['cat'] * 10)
+
+    def testPickle(self):
+        x = freq.FreqDist()
+        x.inc('dog', 3)
+        x.inc('cat', 1 << 40)
+        x.candidates()
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            y = pickle.loads(pickle.dumps(x, protocol))
+            self.assertEqual(type(y), freq.FreqDist)
+            self.assertEqual(y, x)
+            self.assertEqual(y.total, x.total)
+            self.assertFalse('_candidates' in y.__dict__)
+            y.inc('dog')
+            self.assertEqual(y.prob('dog'), 4.0 / y.total)
+
+        # Counts which don't fit an array are kept as they are.
+        x = freq.FreqDist([('a', 0.5), ('b', 1 << 70)])
+        self.assertEqual(pickle.loads(pickle.dumps(x, 2)), x)
+        self.assertEqual(pickle.loads(pickle.dumps(freq.FreqDist())), {})
+
+    def testForeignPackedCounts(self):
+        # As packed on a big-endian platform with 4-byte longs.
+        packed = ('l', 4, 'big', struct.pack('>3i', 1, -2, 1 << 30))
+        self.assertEqual(freq._unpack_counts(packed),
+                         array('l', [1, -2, 1 << 30]))
+
+        # As packed with 8-byte longs, whatever the size of ours.
+        packed = ('l', 8, 'little', struct.pack('<2q', 3, 1 << 40))
+        self.assertEqual(list(freq._unpack_counts(packed)), [3, 1 << 40])
+
+        values = array('d', [0.5, -1.25])
+        packed = freq._pack_array(values)
+        self.assertEqual(packed[:3], ('d', 8, sys.byteorder))
+        self.assertEqual(freq._unpack_array(packed), values)
+
 
 class CondFreqDistTestCase(unittest.TestCase):
     def setUp(self):
@@ -73,6 +155,138 @@ class CondFreqDistTestCase(unittest.TestCase):
         self.assertEqual(sample_dist.prob('Cereal'), (1.0/6.0))
         self.assertEqual(sample_dist.prob('Toast'), (1.0/6.0))
 
+    def testSample(self):
+        rng = random.Random(1)
+        self.assertEqual(self.model.sample('Lunch', 3, rng),
+                         ['Sandwich'] * 3)
+        self.assertTrue(self.model.sample('Dinner', rng=rng) in
+                        ('Spaghetti', 'Stir-fry'))
+        self.assertRaises(freq.UnknownSymbolError, self.model.sample,
+                          'Brunch')
+
+    def testPickle(self):
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            y = pickle.loads(pickle.dumps(self.model, protocol))
+            self.assertEqual(y, self.model)
+            self.assertEqual(y['Dinner'].total, 3)
+            self.assertEqual(y.prob('Dinner', 'Spaghetti'), 2 / 3.0)
+
+        x = freq.ConditionalFreqDist(track_marginals=True)
+        x.inc('Lunch', 'Soup')
+        x['Dinner'] = freq.DefaultFreqDist(freq.FreqDist([('Soup', 2)]))
+        y = pickle.loads(pickle.dumps(x, 2))
+        self.assertEqual(y, x)
+        self.assertEqual(type(y['Dinner']), freq.DefaultFreqDist)
+        self.assertEqual(y.condition_prob('Lunch'), 1.0)
+
+    def testTrackedMarginals(self):
+        tracked = freq.ConditionalFreqDist(track_marginals=True,
+                                           track_inverse=True)
+        for condition, sample, count in self.model.itercounts():
+            tracked.inc(condition, sample, count)
+
+        self.assertEqual(tracked, self.model)
+        for method in ('to_condition_dist', 'to_sample_dist'):
+            expected = getattr(self.model, method)()
+            dist = getattr(tracked, method)()
+            self.assertEqual(dist, expected)
+            self.assertEqual(dist.total, expected.total)
+
+        self.assertEqual(tracked.invert(), self.model.invert())
+        self.assertEqual(tracked.condition_prob('Dinner'), 0.5)
+        self.assertEqual(self.model.condition_prob('Dinner'), 0.5)
+        self.assertEqual(tracked.sample_prob('Toast'), 1 / 6.0)
+        self.assertEqual(self.model.sample_prob('Toast'), 1 / 6.0)
+        self.assertEqual(self.model.sample_prob('Pizza'), 0.0)
+
+        # Returned marginals are copies, the inverse stays live.
+        tracked.to_sample_dist().inc('Pizza')
+        inverse = tracked.invert()
+        tracked.inc('Dinner', 'Pizza')
+        self.assertEqual(tracked.sample_prob('Pizza'), 1 / 7.0)
+        self.assertEqual(inverse.prob('Pizza', 'Dinner'), 1.0)
+
+    def testCopyConstructor(self):
+        copy = freq.ConditionalFreqDist(self.model)
+        self.assertEqual(copy, self.model)
+        self.assertEqual(copy._condition_dist, None)
+        self.assertEqual(copy.prob('Dinner', 'Spaghetti'), 2 / 3.0)
+
+        tracked = freq.ConditionalFreqDist(self.model, track_marginals=True,
+                                           track_inverse=True)
+        self.assertEqual(tracked, self.model)
+        self.assertEqual(tracked.to_sample_dist(),
+                         self.model.to_sample_dist())
+        self.assertEqual(tracked.condition_prob('Dinner'), 0.5)
+        self.assertEqual(tracked.invert(), self.model.invert())
+
+
+class LoadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.chunk_size = freq._load_chunk_size
+        freq._load_chunk_size = 64
+
+    def tearDown(self):
+        freq._load_chunk_size = self.chunk_size
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, data):
+        filename = os.path.join(self.tmp_dir, name)
+        o_stream = open(filename, 'w')
+        o_stream.write(data)
+        o_stream.close()
+        return filename
+
+    def testRoundTrip(self):
+        dist = freq.FreqDist()
+        model = freq.ConditionalFreqDist()
+        for i in xrange(300):
+            dist.inc(u'word %d \u00e9' % (i % 37), i)
+            model.inc(u'cond %d' % (i % 7), u'w\u00e9rd%d' % (i % 11), i)
+
+        for extension in ('', '.gz', '.bgz'):
+            filename = os.path.join(self.tmp_dir, 'dist' + extension)
+            dist.dump(filename)
+            loaded = freq.FreqDist.from_file(filename)
+            self.assertEqual(loaded, dist)
+            self.assertEqual(loaded.total, dist.total)
+
+            filename = os.path.join(self.tmp_dir, 'model' + extension)
+            model.dump(filename)
+            loaded = freq.ConditionalFreqDist.from_file(filename)
+            self.assertEqual(loaded, model)
+            for condition in model:
+                self.assertEqual(loaded[condition].total,
+                                 model[condition].total)
+
+    def testLoadAccumulates(self):
+        filename = self._write('dist', 'dog 3\ncat 1\ndog 2\n')
+        dist = freq.FreqDist.from_file(filename)
+        self.assertEqual(dist, {u'dog': 5, u'cat': 1})
+        dist.load(filename)
+        self.assertEqual(dist.total, 12)
+
+        filename = self._write('model', 'a x 1\nb y 2\na z 3\na x 4\n')
+        model = freq.ConditionalFreqDist.from_file(filename)
+        self.assertEqual(model, {u'a': {u'x': 5, u'z': 3}, u'b': {u'y': 2}})
+        self.assertEqual(model[u'a'].total, 8)
+
+    def testIrregularLines(self):
+        filename = self._write('dist', 'dog 3  \r\ncat 1\r\nemu 2')
+        self.assertEqual(freq.FreqDist.from_file(filename),
+                         {u'dog': 3, u'cat': 1, u'emu': 2})
+
+        for data in ('dog 3\ncat\n', 'dog 3\n\ncat 1\n', 'a b 1\n7\n'):
+            filename = self._write('bad', data)
+            self.assertRaises(ValueError, freq.FreqDist.from_file, filename)
+
+    def testTrackedLoad(self):
+        filename = self._write('model', 'a x 1\nb y 2\na z 3\n')
+        model = freq.ConditionalFreqDist(track_marginals=True)
+        model.load(filename)
+        self.assertEqual(model.sample_prob(u'y'), 2 / 6.0)
+
 
 if __name__ == "__main__":
     unittest.TextTestRunner(verbosity=1).run(suite())
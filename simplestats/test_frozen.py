@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+#  test_frozen.py
+#  simplestats
+#
+
+import sys
+import multiprocessing
+import unittest
+import doctest
+import struct
+import cPickle as pickle
+
+import freq
+import frozen
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(FrozenFreqDistTestCase),
+        unittest.makeSuite(FrozenCondFreqDistTestCase),
+        doctest.DocTestSuite(frozen),
+    ))
+    return testSuite
+
+
+# Set before forking workers, which then read it from shared memory.
+_shared = None
+
+if sys.byteorder == 'little':
+    _other_byteorder, _other_prefix = 'big', '>'
+else:
+    _other_byteorder, _other_prefix = 'little', '<'
+
+
+def _shared_prob(args):
+    return _shared.prob(*args)
+
+
+class FrozenFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dist = freq.FreqDist()
+        self.dist.inc('dog', 3)
+        self.dist.inc('cat')
+        self.frozen = self.dist.freeze()
+
+    def testLookups(self):
+        self.assertEqual(self.frozen.total, 4)
+        self.assertEqual(len(self.frozen), 2)
+        self.assertEqual(self.frozen['dog'], 3)
+        self.assertEqual(self.frozen.prob('cat'), 0.25)
+        self.assertEqual(self.frozen.prob('emu'), 0.0)
+        self.assertEqual(self.frozen.log_prob('dog'),
+                         self.dist.log_prob('dog'))
+        self.assertRaises(ValueError, self.frozen.log_prob, 'emu')
+        self.assertRaises(KeyError, self.frozen.__getitem__, 'emu')
+
+    def testIndependentOfOriginal(self):
+        self.dist.inc('emu')
+        self.assertEqual(self.frozen.total, 4)
+        self.assertFalse('emu' in self.frozen)
+
+    def testThaw(self):
+        self.assertEqual(self.frozen.thaw(), self.dist)
+        self.assertEqual(self.frozen.thaw().total, 4)
+
+    def testPickleAndShare(self):
+        y = pickle.loads(pickle.dumps(self.frozen, 2))
+        self.assertEqual(y.items(), self.frozen.items())
+        self.assertEqual(y.log_prob('dog'), self.frozen.log_prob('dog'))
+
+        self.frozen.share()
+        self.assertEqual(self.frozen['dog'], 3)
+        self.assertEqual(self.frozen.candidates(), y.candidates())
+        z = pickle.loads(pickle.dumps(self.frozen, 2))
+        self.assertEqual(z.items(), y.items())
+
+
+class FrozenCondFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        model = freq.ConditionalFreqDist()
+        model.inc('Breakfast', 'Cereal')
+        model.inc('Breakfast', 'Toast')
+        model.inc('Lunch', 'Sandwich')
+        model.inc('Lunch', 'Toast', 3)
+        model.inc('Dinner', 'Spaghetti', 2)
+        model.inc('Dinner', 'Stir-fry')
+        self.model = model
+        self.frozen = model.freeze()
+
+    def testLookups(self):
+        for condition, sample, count in self.model.itercounts():
+            self.assertEqual(self.frozen.count(condition, sample), count)
+            self.assertEqual(self.frozen.prob(condition, sample),
+                             self.model.prob(condition, sample))
+            self.assertEqual(self.frozen.log_prob(condition, sample),
+                             self.model.log_prob(condition, sample))
+
+        self.assertEqual(self.frozen.prob('Lunch', 'Cereal'), 0.0)
+        self.assertEqual(self.frozen.prob('Lunch', 'Unseen'), 0.0)
+        self.assertRaises(freq.UnknownSymbolError, self.frozen.prob,
+                          'Brunch', 'Toast')
+        self.assertEqual(self.frozen.candidates('Brunch'), [])
+
+        for condition in self.model:
+            self.assertEqual(set(self.frozen.candidates(condition)),
+                             set(self.model.candidates(condition)))
+            self.assertEqual(self.frozen[condition], self.model[condition])
+
+    def testItercounts(self):
+        self.assertEqual(sorted(self.frozen.itercounts()),
+                         sorted(self.model.itercounts()))
+
+    def testInvert(self):
+        inverse = self.frozen.invert()
+        expected = self.model.invert()
+        self.assertEqual(sorted(inverse.itercounts()),
+                         sorted(expected.itercounts()))
+        for condition, sample, count in expected.itercounts():
+            self.assertEqual(inverse.prob(condition, sample),
+                             expected.prob(condition, sample))
+
+        # Inverting twice gives back the original counts.
+        self.assertEqual(inverse.invert().thaw(), self.model)
+
+    def testDerivativeDists(self):
+        self.assertEqual(self.frozen.to_condition_dist(),
+                         self.model.to_condition_dist())
+        self.assertEqual(self.frozen.to_condition_dist().total, 9)
+        self.assertEqual(self.frozen.to_sample_dist(),
+                         self.model.to_sample_dist())
+        self.assertEqual(self.frozen.to_sample_dist().total, 9)
+
+    def testThaw(self):
+        thawed = self.frozen.thaw()
+        self.assertEqual(thawed, self.model)
+        self.assertEqual(thawed['Lunch'].total, 4)
+
+    def testPickleAndShare(self):
+        global _shared
+        y = pickle.loads(pickle.dumps(self.frozen, 2))
+        self.assertEqual(y.thaw(), self.model)
+
+        # As pickled on a platform of the other byte order, with 4-byte
+        # longs.
+        state = self.frozen.__getstate__()
+        for name, typecode in frozen.FrozenConditionalFreqDist._array_types:
+            values = freq._unpack_items(state[name])
+            state[name] = (typecode, 4, _other_byteorder,
+                           struct.pack('%s%di' % (_other_prefix, len(values)),
+                                       *values))
+        y = frozen.FrozenConditionalFreqDist.__new__(
+            frozen.FrozenConditionalFreqDist)
+        y.__setstate__(state)
+        self.assertEqual(y.thaw(), self.model)
+
+        _shared = self.frozen.share()
+        self.assertEqual(_shared.thaw(), self.model)
+        self.assertEqual(_shared.invert().thaw(), self.model.invert())
+
+        queries = list((c, s) for (c, s, n) in self.model.itercounts())
+        pool = multiprocessing.Pool(2)
+        try:
+            probs = pool.map(_shared_prob, queries)
+        finally:
+            pool.terminate()
+        self.assertEqual(probs, [self.model.prob(*q) for q in queries])
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+#  test_info.py
+#  simplestats
+#
+
+import unittest
+import doctest
+from math import log
+
+import freq
+import info
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(DistMeasuresTestCase),
+        unittest.makeSuite(ConditionalMeasuresTestCase),
+        doctest.DocTestSuite(info),
+    ))
+    return testSuite
+
+
+class DistMeasuresTestCase(unittest.TestCase):
+    def setUp(self):
+        self.p = freq.FreqDist([('a', 2), ('b', 1), ('c', 1)])
+        self.q = freq.FreqDist([('a', 1), ('b', 1), ('c', 1), ('d', 1)])
+
+    def _naive_cross_entropy(self, p, q):
+        return -sum(p.prob(s) * q.log_prob(s) for s in p)
+
+    def testEntropy(self):
+        self.assertAlmostEqual(info.entropy(self.p),
+                               self._naive_cross_entropy(self.p, self.p))
+        self.assertAlmostEqual(info.entropy(self.p, base=2), 1.5)
+        self.assertAlmostEqual(info.perplexity(self.q), 4.0)
+        self.assertEqual(info.entropy(freq.FreqDist()), 0.0)
+        self.assertAlmostEqual(info.entropy(self.p.freeze()),
+                               info.entropy(self.p))
+
+    def testCrossEntropy(self):
+        self.assertAlmostEqual(info.cross_entropy(self.p, self.q),
+                               self._naive_cross_entropy(self.p, self.q))
+        self.assertEqual(info.cross_entropy(self.q, self.p), float('inf'))
+
+    def testDivergences(self):
+        self.assertAlmostEqual(
+            info.kl_divergence(self.p, self.q),
+            info.cross_entropy(self.p, self.q) - info.entropy(self.p),
+        )
+        self.assertEqual(info.kl_divergence(self.q, self.p), float('inf'))
+
+        js = info.js_divergence(self.p, self.q)
+        self.assertAlmostEqual(js, info.js_divergence(self.q, self.p))
+        self.assertTrue(0 < js < log(2))
+
+
+class ConditionalMeasuresTestCase(unittest.TestCase):
+    def setUp(self):
+        model = freq.ConditionalFreqDist(track_marginals=True)
+        model.inc('Breakfast', 'Cereal')
+        model.inc('Breakfast', 'Toast', 3)
+        model.inc('Lunch', 'Sandwich')
+        model.inc('Lunch', 'Toast')
+        model.inc('Dinner', 'Spaghetti', 2)
+        self.model = model
+
+    def testConditionalEntropy(self):
+        expected = sum(
+            self.model.condition_prob(c) * info.entropy(self.model[c])
+            for c in self.model
+        )
+        self.assertAlmostEqual(info.conditional_entropy(self.model),
+                               expected)
+
+    def testMutualInformation(self):
+        expected = info.entropy(self.model.to_sample_dist()) - \
+            info.conditional_entropy(self.model)
+        self.assertAlmostEqual(info.mutual_information(self.model), expected)
+        self.assertAlmostEqual(info.mutual_information(self.model.freeze()),
+                               expected)
+
+    def testPointwiseMutualInformation(self):
+        pmi = info.pointwise_mutual_information(self.model)
+        self.assertEqual(len(pmi), 5)
+        expected = log(self.model.prob('Lunch', 'Toast') /
+                       self.model.sample_prob('Toast'))
+        self.assertAlmostEqual(pmi['Lunch', 'Toast'], expected)
+
+        # The mutual information is the expected PMI.
+        total = sum(c for (k, s, c) in self.model.itercounts())
+        self.assertAlmostEqual(
+            sum(c * pmi[k, s] for (k, s, c) in self.model.itercounts())
+            / total,
+            info.mutual_information(self.model),
+        )
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+#  test_ingest.py
+#  simplestats
+#
+
+import threading
+import unittest
+import doctest
+
+import ingest
+from freq import FreqDist, ConditionalFreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(IngesterTestCase),
+        doctest.DocTestSuite(ingest),
+    ))
+    return testSuite
+
+
+class _OldEvent(object):
+    "An event whose wait() returns None, as on Python 2.6."
+    def __init__(self):
+        self._event = threading.Event()
+        self.set = self._event.set
+        self.isSet = self._event.isSet
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+
+
+class IngesterTestCase(unittest.TestCase):
+    def testManySources(self):
+        sources = [[i % 7 for i in xrange(j, j + 500)] for j in xrange(10)]
+        expected = FreqDist()
+        for source in sources:
+            for sample in source:
+                expected.inc(sample)
+
+        ingester = ingest.Ingester(batch_size=16, max_pending=2)
+        for source in sources:
+            ingester.add_source(iter(source))
+        dist = ingester.close()
+        self.assertEqual(dist, expected)
+        self.assertEqual(dist.total, expected.total)
+
+    def testSnapshotOrdering(self):
+        ingester = ingest.Ingester(batch_size=3)
+        ingester.feed(['a'] * 10)
+        first = ingester.snapshot()
+        ingester.feed(['b'] * 5)
+        second = ingester.snapshot()
+
+        self.assertEqual(first.get(5), {'a': 10})
+        self.assertEqual(second.get(5), {'a': 10, 'b': 5})
+        self.assertEqual(second.get().total, 15)
+
+        # Snapshots are copies, unaffected by later counting.
+        ingester.feed(['a'])
+        ingester.close()
+        self.assertEqual(first.get()['a'], 10)
+
+    def testConditional(self):
+        ingester = ingest.Ingester(ConditionalFreqDist(), batch_size=2)
+        ingester.feed([('x', 1), ('x', 2), ('y', 1)])
+        snapshot = ingester.snapshot().get(5)
+        self.assertEqual(snapshot.prob('x', 1), 0.5)
+        cfd = ingester.close()
+        self.assertEqual(cfd['y'].total, 1)
+
+    def testErrors(self):
+        ingester = ingest.Ingester(ConditionalFreqDist())
+        ingester.feed([('x', 1, 'extra')])
+        pending = ingester.snapshot()
+        self.assertRaises(ValueError, pending.get, 5)
+        self.assertRaises(ValueError, ingester.close)
+        self.assertRaises(ValueError, ingester.feed, [])
+
+    def testPendingSnapshot(self):
+        pending = ingest.PendingSnapshot()
+        pending._event = _OldEvent()
+        self.assertFalse(pending.wait(0.01))
+        self.assertRaises(RuntimeError, pending.get, 0.01)
+        pending._set('counts')
+        self.assert_(pending.ready())
+        self.assert_(pending.wait(0.01))
+        self.assertEqual(pending.get(0.01), 'counts')
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
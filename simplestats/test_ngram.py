@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+#  test_ngram.py
+#  simplestats
+#
+
+import random
+import unittest
+import doctest
+
+import ngram
+from freq import ConditionalFreqDist
+from sequences import iwindow
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(NgramCounterTestCase),
+        doctest.DocTestSuite(ngram),
+    ))
+    return testSuite
+
+
+def _window_cfd(documents, n, pad):
+    "Counts n-grams the slow way, for comparison."
+    cfd = ConditionalFreqDist()
+    for tokens in documents:
+        if n == 1:
+            windows = [(t,) for t in tokens]
+        else:
+            windows = iwindow(list(tokens), n, pre_blanks=pad)
+        for window in windows:
+            cfd.inc(window[:-1], window[-1])
+    return cfd
+
+
+class NgramCounterTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        self.documents = [[rng.choice('abcdefg')
+                           for i in xrange(rng.randint(0, 30))]
+                          for j in xrange(40)]
+
+    def testMatchesWindows(self):
+        for pad in (True, False):
+            counter = ngram.NgramCounter(3, pad=pad)
+            counter.count_all(self.documents)
+            for n in (1, 2, 3):
+                expected = _window_cfd(self.documents, n, pad)
+                self.assertEqual(counter.to_cfd(n), expected)
+                self.assertEqual(counter.total(n),
+                                 sum(d.total for d in expected.values()))
+
+    def testFreeze(self):
+        counter = ngram.NgramCounter(3)
+        counter.count_all(self.documents)
+        expected = _window_cfd(self.documents, 3, True)
+        frozen = counter.freeze(3)
+        self.assertEqual(len(frozen), len(expected))
+        for condition, sample, count in expected.itercounts():
+            self.assertEqual(frozen.count(condition, sample), count)
+            self.assertEqual(frozen.prob(condition, sample),
+                             expected.prob(condition, sample))
+        self.assertEqual(frozen.thaw(), expected)
+
+    def testMerge(self):
+        a = ngram.NgramCounter(2)
+        a.count_all(self.documents[:20])
+        b = ngram.NgramCounter(2)
+        b.count_all(reversed(self.documents[20:]))
+        a.merge(b)
+        expected = _window_cfd(self.documents, 2, True)
+        self.assertEqual(a.to_cfd(2), expected)
+        self.assertRaises(ValueError, a.merge, ngram.NgramCounter(3))
+
+    def testCountDocuments(self):
+        expected = _window_cfd(self.documents, 2, True)
+        for processes in (1, 2):
+            counter = ngram.count_documents(self.documents, order=2,
+                                            processes=processes,
+                                            shard_size=7)
+            self.assertEqual(counter.to_cfd(2), expected)
+
+    def testLimits(self):
+        self.assertRaises(ValueError, ngram.NgramCounter, 0)
+        counter = ngram.NgramCounter(2, id_bits=2)
+        counter.count('abc')
+        self.assertRaises(ValueError, counter.count, 'd')
+        self.assertRaises(ValueError, counter.to_cfd, 3)
+        self.assertEqual(counter.ngram_count(('x', 'a')), 0)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+#  test_ordered.py
+#  simplestats
+#
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import ordered
+from freq import FreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(OrderedFreqDistTestCase),
+        doctest.DocTestSuite(ordered),
+    ))
+    return testSuite
+
+
+class OrderedFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _check(self, dist):
+        "Compares every query against sorting the counts."
+        ordered_samples = []
+        for sample in sorted(dist):
+            ordered_samples.extend([sample] * dist[sample])
+        self.assertEqual(len(ordered_samples), dist.total)
+
+        for k, sample in enumerate(ordered_samples):
+            self.assertEqual(dist.select(k), sample)
+        for x in range(-2, 55):
+            below = len([s for s in ordered_samples if s < x])
+            upto = len([s for s in ordered_samples if s <= x])
+            self.assertEqual(dist.rank(x), below)
+            self.assertEqual(dist.cumulative_count(x), upto)
+            self.assertEqual(dist.cumulative_count(x + 0.5), upto)
+        for q in (0.0, 0.1, 0.25, 0.5, 0.9, 1.0):
+            x = dist.quantile(q)
+            self.assert_(dist.cdf(x) >= q)
+            self.assert_(dist.rank(x) / float(dist.total) < q or
+                         x == ordered_samples[0])
+
+    def testUpdates(self):
+        rng = random.Random(5)
+        for dist in (ordered.OrderedFreqDist(),
+                     ordered.OrderedFreqDist.for_range(0, 50)):
+            for i in xrange(300):
+                dist.inc(rng.randint(0, 49), rng.randint(1, 3))
+                if i % 50 == 0:
+                    self._check(dist)
+            dist.decrement(dist.select(0))
+            dist.remove_sample(dist.select(dist.total - 1))
+            dist.merge(FreqDist([(7, 4), (13, 2)]))
+            self._check(dist)
+
+    def testRangeLimits(self):
+        dist = ordered.OrderedFreqDist.for_range(10, 20)
+        self.assertRaises(ValueError, dist.inc, 20)
+        self.assertRaises(ValueError, dist.inc, 9)
+        dist.inc(12)
+        self.assertEqual(dist.cdf(100), 1.0)
+        self.assertEqual(dist.cdf(0), 0.0)
+        self.assertRaises(IndexError, dist.select, 1)
+        self.assertRaises(ValueError, dist.quantile, 1.5)
+
+    def testDumpLoad(self):
+        filename = os.path.join(self.tmp_dir, 'counts')
+        dist = ordered.OrderedFreqDist.for_range(0, 1000)
+        for sample in (5, 100, 20, 20):
+            dist.inc(sample)
+        dist.dump(filename)
+
+        loaded = ordered.OrderedFreqDist.for_range(0, 1000)
+        loaded.load(filename)
+        self.assertEqual(loaded, dist)
+        self.assertEqual(loaded.quantile(0.5), 20)
+
+        # Without a key type, samples sort as the strings they were read as.
+        loaded = ordered.OrderedFreqDist()
+        loaded.load(filename)
+        self.assertEqual(loaded.select(0), u'100')
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
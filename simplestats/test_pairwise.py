@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+#  test_pairwise.py
+#  simplestats
+#
+
+import time
+import random
+import unittest
+import multiprocessing
+import doctest
+from array import array
+from operator import add
+
+import pairwise
+from comb import iunique_pairs
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(PairwiseMapTestCase),
+        doctest.DocTestSuite(pairwise),
+    ))
+    return testSuite
+
+
+def _distance(a, b):
+    return abs(a - b)
+
+
+def _distances(rows, columns):
+    return [[abs(a - b) for b in columns] for a in rows]
+
+
+# Counts the blocks evaluated, across processes.
+_n_blocks = multiprocessing.Value('i', 0)
+
+
+def _counted_distances(rows, columns):
+    with _n_blocks.get_lock():
+        _n_blocks.value += 1
+    return _distances(rows, columns)
+
+
+class PairwiseMapTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(2)
+        self.items = [rng.randint(0, 1000) for i in xrange(103)]
+        n = len(self.items)
+        self.expected = sorted(
+            (i, j, _distance(self.items[i], self.items[j]))
+            for i in xrange(n) for j in xrange(i + 1, n)
+        )
+
+    def testEveryPairOnce(self):
+        for block_size in (1, 7, 50, 103, 500):
+            for workers in (1, 3):
+                result = list(pairwise.pairwise_map(
+                    _distance, self.items, workers=workers,
+                    block_size=block_size))
+                self.assertEqual(sorted(result), self.expected)
+
+    def testVectorized(self):
+        for block_size in (1, 16, 200):
+            for workers in (1, 2):
+                result = list(pairwise.pairwise_map(
+                    _distances, self.items, workers=workers,
+                    block_size=block_size, vectorized=True))
+                self.assertEqual(sorted(result), self.expected)
+
+        # Array items are passed to the block function as arrays.
+        items = array('d', self.items)
+        result = pairwise.pairwise_map(
+            lambda a, b: [[type(a) is array] * len(b)] * len(a),
+            items, workers=1, block_size=10, vectorized=True)
+        self.assert_(all(value for (i, j, value) in result))
+
+    def testReduce(self):
+        total = sum(value for (i, j, value) in self.expected)
+        largest = max(value for (i, j, value) in self.expected)
+        for workers in (1, 4):
+            self.assertEqual(pairwise.pairwise_map(
+                _distance, self.items, workers=workers, block_size=9,
+                reduce=add, initial=0), total)
+            self.assertEqual(pairwise.pairwise_map(
+                _distances, self.items, workers=workers, block_size=9,
+                vectorized=True, reduce=max, initial=0), largest)
+
+    def testMatchesUniquePairs(self):
+        items = sorted(set(self.items))
+        expected = sorted((a, b, a * b) for (a, b) in iunique_pairs(items))
+        result = sorted(
+            (items[i], items[j], value) for (i, j, value) in
+            pairwise.pairwise_map(lambda a, b: a * b, items, workers=2,
+                                  block_size=11)
+        )
+        self.assertEqual(result, expected)
+
+    def testConcurrentSerialMaps(self):
+        first = pairwise.pairwise_map(_distance, self.items, workers=1,
+                                      block_size=5)
+        result = [first.next()]
+        second = pairwise.pairwise_map(add, [1, 2, 3], workers=1)
+        self.assertEqual(second.next(), (0, 1, 3))
+        result.extend(first)
+        self.assertEqual(sorted(result), self.expected)
+        self.assertEqual(pairwise._items, None)
+
+        # The function may itself run a map.
+        nested = lambda a, b: pairwise.pairwise_map(
+            add, [a, b, 1], workers=1, reduce=add, initial=0)
+        self.assertEqual(list(pairwise.pairwise_map(nested, [1, 2, 3],
+                                                    workers=1, block_size=1)),
+                         [(0, 1, 8), (0, 2, 10), (1, 2, 12)])
+
+    def testEarlyClose(self):
+        for workers in (1, 2):
+            result = pairwise.pairwise_map(_distance, range(300),
+                                           workers=workers, block_size=100)
+            self.assertEqual(result.next(), (0, 1, 1))
+            result.close()
+
+            for triple in pairwise.pairwise_map(_distance, range(300),
+                                                workers=workers,
+                                                block_size=100):
+                break
+
+    def testSlowConsumer(self):
+        _n_blocks.value = 0
+        workers = 2
+        result = pairwise.pairwise_map(_counted_distances, range(200),
+                                       workers=workers, block_size=10,
+                                       vectorized=True)
+        result.next()
+        time.sleep(0.5)
+
+        # Only a bounded window of blocks runs ahead of the consumer.
+        ahead = workers * pairwise._blocks_per_worker + 1
+        self.assert_(_n_blocks.value <= ahead)
+        self.assertEqual(sum(1 for triple in result), 200 * 199 / 2 - 1)
+        self.assertEqual(_n_blocks.value, 20 * 21 / 2)
+
+    def testEdgeCases(self):
+        self.assertEqual(list(pairwise.pairwise_map(_distance, [])), [])
+        self.assertEqual(list(pairwise.pairwise_map(_distance, [1])), [])
+        self.assertEqual(pairwise.pairwise_map(_distance, [1], reduce=add,
+                                               initial=0), 0)
+        result = pairwise.pairwise_map(_distance, iter([1, 4, 9]), workers=1)
+        self.assertEqual(list(result), [(0, 1, 3), (0, 2, 8), (1, 2, 5)])
+        self.assertRaises(ValueError, pairwise.pairwise_map, _distance,
+                          self.items, block_size=0)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
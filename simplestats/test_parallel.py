@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+#  test_parallel.py
+#  simplestats
+#
+
+import random
+import shutil
+import tempfile
+import unittest
+
+import parallel
+from freq import ConditionalFreqDist
+from store import ShardedConditionalFreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(BuildCfdTestCase),
+    ))
+    return testSuite
+
+
+class BuildCfdTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(8)
+        self.events = [(u'cond %d' % rng.randint(0, 60),
+                        u'sample %d' % rng.randint(0, 20))
+                       for i in xrange(5000)]
+        self.expected = ConditionalFreqDist()
+        for condition, sample in self.events:
+            self.expected.inc(condition, sample)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testBuild(self):
+        for processes in (1, 3):
+            cfd = parallel.build_cfd(iter(self.events), processes=processes,
+                                     batch_size=100)
+            self.assertEqual(cfd, self.expected)
+            for condition in self.expected:
+                self.assertEqual(cfd[condition].total,
+                                 self.expected[condition].total)
+
+    def testSharded(self):
+        for processes in (1, 3):
+            parallel.build_cfd(self.events, processes=processes,
+                               batch_size=64, dirname=self.tmp_dir,
+                               n_shards=5, extension='.bgz')
+            sharded = ShardedConditionalFreqDist(self.tmp_dir)
+            self.assertEqual(len(sharded), len(self.expected))
+            for condition, condition_dist in self.expected.iteritems():
+                self.assertEqual(sharded[condition], condition_dist)
+            self.assertEqual(sharded.to_condition_dist(),
+                             self.expected.to_condition_dist())
+            sharded.close()
+
+    def testByteStrings(self):
+        events = [('caf\xc3\xa9', 'x'), ('caf\xc3\xa9', 'y'), ('tea', 'x')]
+        expected = parallel.build_cfd(events, processes=1)
+        self.assertEqual(parallel.build_cfd(events, processes=2), expected)
+        self.assertEqual(expected['caf\xc3\xa9'].total, 2)
+
+    def testBadEvents(self):
+        self.assertRaises(ValueError, parallel.build_cfd,
+                          [('a', 'b', 'c')], processes=2)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+#  test_sampling.py
+#  simplestats
+#
+
+import random
+import unittest
+import doctest
+
+import sampling
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(AliasTableTestCase),
+        doctest.DocTestSuite(sampling),
+    ))
+    return testSuite
+
+
+class AliasTableTestCase(unittest.TestCase):
+    def testProportions(self):
+        weights = [1, 2, 3, 4, 0]
+        table = sampling.AliasTable(range(5), weights)
+        rng = random.Random(7)
+        n = 100000
+        draws = table.draws(n, rng)
+        self.assertEqual(len(draws), n)
+        for item, weight in enumerate(weights):
+            self.assertAlmostEqual(draws.count(item) / float(n),
+                                   weight / 10.0, 2)
+
+    def testReproducible(self):
+        table = sampling.AliasTable('abc', [5, 1, 1])
+        a = table.draws(100, random.Random(3))
+        b = [table.draw(random.Random(3))]
+        self.assertEqual(a[0], b[0])
+        self.assertEqual(a, table.draws(100, random.Random(3)))
+
+    def testSingleItem(self):
+        table = sampling.AliasTable(['only'], [3])
+        self.assertEqual(table.draws(5), ['only'] * 5)
+
+    def testBadInput(self):
+        self.assertRaises(ValueError, sampling.AliasTable, [], [])
+        self.assertRaises(ValueError, sampling.AliasTable, ['a'], [0])
+        self.assertRaises(ValueError, sampling.AliasTable, ['a', 'b'], [1])
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+#  test_significance.py
+#  simplestats
+#
+
+import random
+import itertools
+import unittest
+import doctest
+from math import exp, log, pi, sqrt
+
+import significance
+from basic import mean, stddev
+from errors import InsufficientData
+from freq import ConditionalFreqDist
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(ContingencyTestCase),
+        unittest.makeSuite(PermutationTestCase),
+        doctest.DocTestSuite(significance),
+    ))
+    return testSuite
+
+
+class ContingencyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cfd = ConditionalFreqDist()
+        table = {'a': {'x': 20, 'y': 15, 'z': 0},
+                 'b': {'x': 30, 'y': 35, 'z': 12}}
+        for condition, row in table.iteritems():
+            for sample, count in row.iteritems():
+                if count:
+                    self.cfd.inc(condition, sample, count)
+
+    def _expected(self):
+        "Yields (observed, expected) over every cell, the slow way."
+        n = float(self.cfd.to_condition_dist().total)
+        samples = self.cfd.to_sample_dist()
+        for condition, row in self.cfd.iteritems():
+            for sample in samples:
+                yield (row.get(sample, 0),
+                       row.total * samples[sample] / n)
+
+    def testChiSquare(self):
+        statistic, df, p = significance.chi_square_test(self.cfd)
+        expected = sum((o - e) ** 2 / e for (o, e) in self._expected())
+        self.assertAlmostEqual(statistic, expected)
+        self.assertEqual(df, 2)
+        # With two degrees of freedom, the tail is exp(-x / 2).
+        self.assertAlmostEqual(p, exp(-statistic / 2))
+
+    def testGTest(self):
+        statistic, df, p = significance.g_test(self.cfd)
+        expected = 2 * sum(o * log(o / e) for (o, e) in self._expected()
+                           if o > 0)
+        self.assertAlmostEqual(statistic, expected)
+        self.assertAlmostEqual(p, exp(-statistic / 2))
+
+    def testChi2Sf(self):
+        # Critical values from standard tables.
+        for x, df, p in [(3.841, 1, 0.05), (6.635, 1, 0.01),
+                         (18.307, 10, 0.05), (124.342, 100, 0.05),
+                         (0.0158, 1, 0.9)]:
+            self.assertAlmostEqual(significance.chi2_sf(x, df), p, 3)
+        self.assertEqual(significance.chi2_sf(0, 3), 1.0)
+
+    def testLanczosLgamma(self):
+        factorial = 1
+        for n in xrange(1, 60):
+            self.assertAlmostEqual(significance._lanczos_lgamma(n),
+                                   log(factorial), 9)
+            factorial *= n
+
+        # Gamma(1/2) = sqrt(pi), and Gamma(-5/2) = -8 sqrt(pi) / 15.
+        self.assertAlmostEqual(significance._lanczos_lgamma(0.5),
+                               log(sqrt(pi)), 12)
+        self.assertAlmostEqual(significance._lanczos_lgamma(-2.5),
+                               log(8 * sqrt(pi) / 15), 12)
+
+    def testInsufficient(self):
+        cfd = ConditionalFreqDist()
+        cfd.inc('a', 'x')
+        cfd.inc('a', 'y')
+        self.assertRaises(InsufficientData, significance.chi_square_test,
+                          cfd)
+
+
+class PermutationTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(2)
+        self.a = [rng.gauss(0.0, 1.0) for i in xrange(40)]
+        self.b = [rng.gauss(0.8, 1.0) for i in xrange(30)]
+        self.same = [rng.gauss(0.0, 1.0) for i in xrange(30)]
+
+    def testReproducible(self):
+        kwargs = dict(seed=5, n_permutations=3000, batch_size=500,
+                      early_stopping=False)
+        serial = significance.permutation_test(self.a, self.b, **kwargs)
+        pooled = significance.permutation_test(self.a, self.b, processes=2,
+                                               **kwargs)
+        self.assertEqual(serial, pooled)
+        self.assertEqual(serial[2], 3000)
+        self.assertEqual(serial[0], mean(self.a) - mean(self.b))
+        self.assert_(serial[1] < 0.05)
+
+    def testAlternatives(self):
+        greater = significance.permutation_test(
+            self.a, self.b, alternative='greater', seed=1,
+            early_stopping=False, n_permutations=2000)
+        less = significance.permutation_test(
+            self.a, self.b, alternative='less', seed=1,
+            early_stopping=False, n_permutations=2000)
+        self.assert_(greater[1] > 0.95)
+        self.assert_(less[1] < 0.05)
+        self.assertRaises(ValueError, significance.permutation_test,
+                          self.a, self.b, alternative='sideways')
+
+    def testEarlyStopping(self):
+        result = significance.permutation_test(self.a, self.b, seed=3,
+                                               n_permutations=100000,
+                                               batch_size=200)
+        self.assert_(result[2] < 100000)
+        self.assert_(result[1] < 0.05)
+
+        result = significance.permutation_test(self.a, self.same, seed=3,
+                                               n_permutations=100000,
+                                               batch_size=200)
+        self.assert_(result[2] < 100000)
+        self.assert_(result[1] > 0.05)
+
+    def testIntegerMeans(self):
+        a = [0, 1]
+        b = [1, 1, 1, 2]
+        pooled = a + b
+        observed = mean(a) - mean(b)
+        extreme = 0
+        splits = list(itertools.combinations(range(len(pooled)), len(a)))
+        for chosen in splits:
+            sample_a = [pooled[i] for i in chosen]
+            sample_b = [pooled[i] for i in xrange(len(pooled))
+                        if i not in chosen]
+            if abs(mean(sample_a) - mean(sample_b)) >= abs(observed) - 1e-12:
+                extreme += 1
+        exact = extreme / float(len(splits))
+
+        difference, p, n = significance.permutation_test(
+            a, b, seed=1, n_permutations=20000, early_stopping=False)
+        self.assertEqual(difference, observed)
+        self.assertAlmostEqual(p, exact, 1)
+
+    def testOtherStatistics(self):
+        wide = [x * 3 for x in self.same]
+        observed, p, n = significance.permutation_test(
+            self.a, wide, statistic=stddev, seed=4, n_permutations=500)
+        self.assertEqual(observed, stddev(self.a) - stddev(wide))
+        self.assert_(p < 0.05)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+#  test_smoothing.py
+#  simplestats
+#
+
+import unittest
+import doctest
+
+import freq
+import smoothing
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(SmoothedViewTestCase),
+        unittest.makeSuite(ConditionalViewTestCase),
+        doctest.DocTestSuite(smoothing),
+    ))
+    return testSuite
+
+
+class SmoothedViewTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dist = freq.FreqDist()
+        for sample, count in [('a', 1), ('b', 1), ('c', 2), ('d', 4)]:
+            self.dist.inc(sample, count)
+
+    def testNoMutation(self):
+        before = dict(self.dist)
+        for view in (smoothing.LaplaceView(self.dist),
+                     smoothing.GoodTuringView(self.dist),
+                     smoothing.MinimumCountView(self.dist)):
+            view.prob('a')
+            view.prob('unseen')
+        self.assertEqual(dict(self.dist), before)
+        self.assertEqual(self.dist.total, 8)
+
+    def testLaplaceMatchesAddingOne(self):
+        view = smoothing.LaplaceView(self.dist, bins=len(self.dist))
+        smoothed = freq.FreqDist(self.dist.items())
+        freq.smooth_by_adding_one(smoothed)
+        self.assertEqual(smoothed.total, 12)
+        for sample in self.dist:
+            self.assertAlmostEqual(view.prob(sample), smoothed.prob(sample))
+
+    def testGoodTuringSumsToOne(self):
+        view = smoothing.GoodTuringView(self.dist, bins=10)
+        total = sum(view.prob(s) for s in self.dist) + \
+            6 * view.prob('unseen')
+        self.assertAlmostEqual(total, 1.0)
+
+    def testStatsFollowUpdates(self):
+        gt = smoothing.GoodTuringView(self.dist)
+        minimum = smoothing.MinimumCountView(self.dist)
+        self.assertEqual(gt.prob('unseen'), 0.25)
+        self.assertEqual(minimum.count('unseen'), 1)
+
+        self.dist.inc('a')
+        self.dist.inc('b')
+        self.assertEqual(gt.prob('unseen'), 0.0)
+        self.assertEqual(minimum.count('unseen'), 2)
+        self.assertEqual(minimum.prob('unseen'), 0.2)
+
+    def testMatchesDefaultFreqDist(self):
+        default = freq.DefaultFreqDist(self.dist)
+        view = smoothing.MinimumCountView(self.dist)
+        for sample in ('a', 'd', 'unseen'):
+            self.assertEqual(view.prob(sample), default.prob(sample))
+            self.assertEqual(view.log_prob(sample), default.log_prob(sample))
+
+
+class ConditionalViewTestCase(unittest.TestCase):
+    def setUp(self):
+        model = freq.ConditionalFreqDist()
+        model.inc('san', 'francisco', 4)
+        model.inc('the', 'cat', 2)
+        model.inc('the', 'dog')
+        model.inc('a', 'cat')
+        self.model = model
+
+    def testConditionalView(self):
+        view = smoothing.ConditionalView(self.model, smoothing.LaplaceView)
+        self.assertEqual(view.prob('the', 'cat'), 0.5)
+        self.assertEqual(view.prob('the', 'emu'), 1 / 6.0)
+        self.assertRaises(freq.UnknownSymbolError, view.prob, 'an', 'emu')
+
+    def testKneserNey(self):
+        view = smoothing.KneserNeyView(self.model)
+        samples = ['francisco', 'cat', 'dog']
+        for condition in self.model:
+            total = sum(view.prob(condition, s) for s in samples)
+            self.assertAlmostEqual(total, 1.0)
+
+        # Unseen conditions back off to the continuation probability.
+        self.assertEqual(view.prob('an', 'cat'), 0.5)
+
+        # 'francisco' is frequent but only follows one context.
+        self.assertTrue(view.prob('a', 'francisco') <
+                        view.prob('a', 'dog') * 2)
+
+        # Updates through the model are picked up without a refresh.
+        self.model.inc('a', 'francisco')
+        self.assertEqual(view.prob('an', 'francisco'), 0.4)
+
+        # Direct changes to the inner distributions need one.
+        self.model['the'].inc('francisco')
+        self.assertEqual(view.prob('an', 'francisco'), 0.4)
+        view.refresh()
+        self.assertEqual(view.prob('an', 'francisco'), 0.5)
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
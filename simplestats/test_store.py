@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+#  test_store.py
+#  simplestats
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import freq
+import store
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(ShardedStoreTestCase),
+    ))
+    return testSuite
+
+
+class ShardedStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.model = freq.ConditionalFreqDist()
+        for i in xrange(1000):
+            self.model.inc(u'cond %d' % (i % 50), u'sämple %d' % (i % 17),
+                           i % 5 + 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _open(self, extension='', **kwargs):
+        dirname = os.path.join(self.tmp_dir, 'store' + extension)
+        store.dump_sharded(self.model, dirname, n_shards=4,
+                           extension=extension)
+        return store.ShardedConditionalFreqDist(dirname, **kwargs)
+
+    def testLookups(self):
+        for extension in ('', '.bgz'):
+            sharded = self._open(extension)
+            self.assertEqual(len(sharded), 50)
+            self.assertEqual(set(sharded), set(self.model))
+            for condition, sample, count in self.model.itercounts():
+                self.assertEqual(sharded.prob(condition, sample),
+                                 self.model.prob(condition, sample))
+            self.assertEqual(sharded[u'cond 3'], self.model[u'cond 3'])
+            self.assertEqual(sharded[u'cond 3'].total,
+                             self.model[u'cond 3'].total)
+            sharded.close()
+
+    def testMissingConditions(self):
+        sharded = self._open()
+        self.assertFalse(u'cond 99' in sharded)
+        self.assertEqual(sharded.get(u'cond 99'), None)
+        self.assertEqual(sharded.candidates(u'cond 99'), [])
+        self.assertRaises(KeyError, sharded.__getitem__, u'cond 99')
+        self.assertRaises(freq.UnknownSymbolError, sharded.prob,
+                          u'cond 99', u'sämple 1')
+        sharded.close()
+
+    def testLazyLoading(self):
+        sharded = self._open(memory_budget=1)
+        self.assertEqual(len(sharded._cache), 0)
+        sharded.prob(u'cond 1', u'sämple 1')
+        sharded.prob(u'cond 2', u'sämple 1')
+        self.assertEqual(sharded._cache.keys(), [u'cond 2'])
+
+        sharded.memory_budget = 1 << 30
+        sharded.prob(u'cond 1', u'sämple 1')
+        sharded.prob(u'cond 3', u'sämple 1')
+        sharded.prob(u'cond 1', u'sämple 1')
+        self.assertEqual(sharded._cache.keys(),
+                         [u'cond 2', u'cond 3', u'cond 1'])
+        sharded.close()
+
+    def testUnicodeLineBreaks(self):
+        self.model.inc(u'odd\x85cond\u2028', u'sämple 1', 2)
+        sharded = self._open()
+        self.assertEqual(len(sharded), 51)
+        self.assertEqual(sharded.prob(u'odd\x85cond\u2028', u'sämple 1'), 1.0)
+        sharded.close()
+
+    def testLruCache(self):
+        cache = store._LruCache()
+        for i in xrange(100):
+            cache[i % 5] = i
+            cache.get(0)
+        self.assertEqual(cache.keys(), [1, 2, 3, 4, 0])
+        self.assertEqual(cache.get(3), 98)
+        self.assertEqual(cache.popitem(), (1, 96))
+        self.assertEqual(cache.keys(), [2, 4, 0, 3])
+        self.assert_(len(cache._order) <= 2 * len(cache) + 17)
+
+    def testDerivativeDists(self):
+        sharded = self._open()
+        self.assertEqual(sharded.to_condition_dist(),
+                         self.model.to_condition_dist())
+        self.assertEqual(sharded.condition_prob(u'cond 0'),
+                         self.model.condition_prob(u'cond 0'))
+        self.assertEqual(sorted(sharded.itercounts()),
+                         sorted(self.model.itercounts()))
+        sharded.close()
+
+    def testShardsMatchDump(self):
+        dirname = os.path.join(self.tmp_dir, 'single')
+        store.dump_sharded(self.model, dirname, n_shards=1)
+        filename = os.path.join(self.tmp_dir, 'model')
+        self.model.dump(filename)
+        self.assertEqual(
+            open(os.path.join(dirname, store.shard_name(0))).read(),
+            open(filename).read(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+#  test_threadsafe.py
+#  simplestats
+#
+
+import random
+import threading
+import unittest
+import doctest
+
+import threadsafe
+from freq import FreqDist, ConditionalFreqDist, UnknownSymbolError
+
+
+def suite():
+    testSuite = unittest.TestSuite((
+        unittest.makeSuite(ConcurrentFreqDistTestCase),
+        unittest.makeSuite(ConcurrentConditionalFreqDistTestCase),
+        doctest.DocTestSuite(threadsafe),
+    ))
+    return testSuite
+
+
+def _run_threads(target, args_list):
+    threads = [threading.Thread(target=target, args=args)
+               for args in args_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class ConcurrentFreqDistTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(1)
+        self.batches = [[rng.randint(0, 50) for j in xrange(2000)]
+                        for i in xrange(8)]
+        self.expected = FreqDist()
+        for batch in self.batches:
+            for sample in batch:
+                self.expected.inc(sample)
+
+    def testInc(self):
+        dist = threadsafe.ConcurrentFreqDist(n_stripes=4)
+
+        def count(batch):
+            for sample in batch:
+                dist.inc(sample)
+
+        _run_threads(count, [(b,) for b in self.batches])
+        snapshot = dist.snapshot()
+        self.assertEqual(snapshot, self.expected)
+        self.assertEqual(snapshot.total, self.expected.total)
+        self.assertEqual(dist.total, self.expected.total)
+
+    def testIncMany(self):
+        dist = threadsafe.ConcurrentFreqDist()
+        _run_threads(dist.inc_many, [(b,) for b in self.batches])
+        self.assertEqual(dist.snapshot(), self.expected)
+        self.assertEqual(dist.count(7), self.expected[7])
+        self.assertEqual(dist.prob(7), self.expected.prob(7))
+        self.assertEqual(dist.prob('unseen'), 0.0)
+
+    def testRemove(self):
+        dist = threadsafe.ConcurrentFreqDist()
+        dist.inc('a', 3)
+        dist.inc('b', 2)
+        dist.decrement('b')
+        self.assertEqual(dist.remove_sample('a'), 3)
+        self.assertEqual(dist.total, 1)
+        self.assertEqual(dist.snapshot(), {'b': 1})
+
+    def testBadStripes(self):
+        self.assertRaises(ValueError, threadsafe.ConcurrentFreqDist, 0)
+
+
+class ConcurrentConditionalFreqDistTestCase(unittest.TestCase):
+    def testIncMany(self):
+        rng = random.Random(2)
+        batches = [[(rng.randint(0, 9), rng.randint(0, 9))
+                    for j in xrange(1000)] for i in xrange(6)]
+        expected = ConditionalFreqDist()
+        for batch in batches:
+            for condition, sample in batch:
+                expected.inc(condition, sample)
+
+        cfd = threadsafe.ConcurrentConditionalFreqDist(n_stripes=3)
+        half = len(batches) // 2
+
+        def count(batch):
+            for condition, sample in batch:
+                cfd.inc(condition, sample)
+
+        _run_threads(count, [(b,) for b in batches[:half]])
+        _run_threads(cfd.inc_many, [(b,) for b in batches[half:]])
+
+        snapshot = cfd.snapshot()
+        self.assertEqual(snapshot, expected)
+        for condition in expected:
+            self.assertEqual(snapshot[condition].total,
+                             expected[condition].total)
+            self.assertEqual(cfd.prob(condition, 3),
+                             expected.prob(condition, 3))
+
+    def testUnknownCondition(self):
+        cfd = threadsafe.ConcurrentConditionalFreqDist()
+        self.assertRaises(UnknownSymbolError, cfd.prob, 'x', 'y')
+
+
+if __name__ == "__main__":
+    unittest.TextTestRunner(verbosity=1).run(suite())
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#
+#  threadsafe.py
+#  simplestats
+#
+
+"""
+Frequency distributions which can be counted into from many threads at
+once.
+
+Counts are split into stripes by the hash of their sample (or condition),
+each with its own lock, so that threads counting different samples rarely
+wait on one another. Reads which need the whole distribution take every
+lock, giving an exact snapshot.
+"""
+
+import threading
+
+from freq import FreqDist, ConditionalFreqDist, UnknownSymbolError
+
+_default_stripes = 16
+
+
+class _Striped(object):
+    "Lock striping shared by the concurrent distributions."
+    def __init__(self, stripe_class, n_stripes):
+        if n_stripes < 1:
+            raise ValueError("need at least one stripe")
+        self._n_stripes = n_stripes
+        self._stripes = [stripe_class() for i in xrange(n_stripes)]
+        self._locks = [threading.Lock() for i in xrange(n_stripes)]
+
+    def _stripe_of(self, key):
+        return hash(key) % self._n_stripes
+
+    def _lock_all(self):
+        # Always in the same order, to avoid deadlock.
+        for lock in self._locks:
+            lock.acquire()
+
+    def _unlock_all(self):
+        for lock in reversed(self._locks):
+            lock.release()
+
+    def _group(self, keyed_items):
+        "Splits (key, item) pairs into a list of items per stripe."
+        groups = [[] for i in xrange(self._n_stripes)]
+        n_stripes = self._n_stripes
+        for key, item in keyed_items:
+            groups[hash(key) % n_stripes].append(item)
+        return groups
+
+
+class ConcurrentFreqDist(_Striped):
+    """
+    A thread-safe frequency distribution, which never loses updates.
+
+        >>> x = ConcurrentFreqDist()
+        >>> x.inc('a', 3)
+        >>> x.inc_many(['a', 'b'])
+        >>> x.count('a')
+        4
+        >>> x.snapshot().prob('b')
+        0.2
+    """
+    def __init__(self, n_stripes=_default_stripes):
+        _Striped.__init__(self, FreqDist, n_stripes)
+
+    def inc(self, sample, n=1):
+        i = self._stripe_of(sample)
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            self._stripes[i].inc(sample, n)
+        finally:
+            lock.release()
+
+    def inc_many(self, samples):
+        """
+        Increments each of the given samples by one, counting locally
+        first so that each stripe's lock is taken at most once.
+        """
+        local = FreqDist()
+        for sample in samples:
+            local.inc(sample)
+        self.merge(local)
+
+    def merge(self, rhs_dist):
+        "Adds the counts of another distribution to this one."
+        groups = self._group((k, (k, v)) for (k, v) in rhs_dist.iteritems())
+        for i, group in enumerate(groups):
+            if not group:
+                continue
+            samples, counts = zip(*group)
+            lock = self._locks[i]
+            lock.acquire()
+            try:
+                self._stripes[i]._inc_many(samples, counts)
+            finally:
+                lock.release()
+
+    def decrement(self, sample, n=1):
+        i = self._stripe_of(sample)
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            self._stripes[i].decrement(sample, n)
+        finally:
+            lock.release()
+
+    def remove_sample(self, sample):
+        """
+        Removes the sample and its count from the distribution. Returns
+        the count of the sample.
+        """
+        i = self._stripe_of(sample)
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            return self._stripes[i].remove_sample(sample)
+        finally:
+            lock.release()
+
+    #------------------------------------------------------------------------#
+
+    def count(self, sample):
+        """Return the frequency count of the sample."""
+        i = self._stripe_of(sample)
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            return self._stripes[i].get(sample, 0)
+        finally:
+            lock.release()
+
+    def total():
+        doc = "The total count."  # noqa
+
+        def fget(self):
+            self._lock_all()
+            try:
+                return sum(stripe.total for stripe in self._stripes)
+            finally:
+                self._unlock_all()
+        return locals()
+    total = property(**total())
+
+    def prob(self, sample):
+        """Returns the MLE probability of this sample."""
+        self._lock_all()
+        try:
+            c = self._stripes[self._stripe_of(sample)].get(sample, 0)
+            total = sum(stripe.total for stripe in self._stripes)
+        finally:
+            self._unlock_all()
+
+        if c > 0:
+            return c / float(total)
+        else:
+            return 0.0
+
+    def snapshot(self):
+        "Returns a FreqDist copy of the current counts."
+        dist = FreqDist()
+        self._lock_all()
+        try:
+            for stripe in self._stripes:
+                dist.update(stripe)
+                dist._total += stripe.total
+        finally:
+            self._unlock_all()
+
+        return dist
+
+
+class ConcurrentConditionalFreqDist(_Striped):
+    """
+    A thread-safe conditional frequency distribution, striped by
+    condition.
+
+        >>> x = ConcurrentConditionalFreqDist()
+        >>> x.inc('Lunch', 'Sandwich', 3)
+        >>> x.inc_many([('Lunch', 'Soup'), ('Dinner', 'Soup')])
+        >>> x.prob('Lunch', 'Sandwich')
+        0.75
+        >>> sorted(x.snapshot().keys())
+        ['Dinner', 'Lunch']
+    """
+    def __init__(self, n_stripes=_default_stripes):
+        _Striped.__init__(self, ConditionalFreqDist, n_stripes)
+
+    def inc(self, condition, sample, n=1):
+        """Increments a count of (sample|condition)."""
+        i = self._stripe_of(condition)
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            self._stripes[i].inc(condition, sample, n)
+        finally:
+            lock.release()
+
+    def inc_many(self, pairs):
+        """
+        Increments the count of each (condition, sample) pair by one,
+        taking each stripe's lock at most once.
+        """
+        groups = self._group((pair[0], pair) for pair in pairs)
+        for i, group in enumerate(groups):
+            if not group:
+                continue
+            lock = self._locks[i]
+            lock.acquire()
+            try:
+                stripe = self._stripes[i]
+                for condition, sample in group:
+                    stripe.inc(condition, sample)
+            finally:
+                lock.release()
+
+    def prob(self, condition, sample):
+        """
+        Returns P(sample | condition). An exception is raised for unseen
+        conditions.
+        """
+        i = self._stripe_of(condition)
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            condition_dist = self._stripes[i].get(condition)
+            if condition_dist is None:
+                raise UnknownSymbolError(condition)
+            return condition_dist.prob(sample)
+        finally:
+            lock.release()
+
+    def snapshot(self):
+        "Returns a ConditionalFreqDist copy of the current counts."
+        cfd = ConditionalFreqDist()
+        self._lock_all()
+        try:
+            for stripe in self._stripes:
+                for condition, condition_dist in stripe.iteritems():
+                    cfd[condition] = FreqDist(condition_dist.iteritems())
+        finally:
+            self._unlock_all()
+
+        return cfd